@@ -19,6 +19,7 @@ OPTIONS:
   --crossings-output=FILE Output crossings file (default: derived from -o or memory)
   --kerbs-output=FILE     Output kerbs file (default: derived from -o or memory)
   --only_sidewalks        Do not write crossings/kerbs files (keep in memory)
+  --format=FMT            Output format: geojson, gpkg (all layers in one file) or fgb
   --help, -h              Show this help message
 
 COORDINATE PRIORITY:
@@ -54,6 +55,7 @@ USER_SET_OUT=0
 CROSSINGS_SET=0
 KERBS_SET=0
 ONLY_SIDEWALKS=0
+OUTPUT_FORMAT=""
 
 for arg in "$@"; do
   case "$arg" in
@@ -70,6 +72,7 @@ for arg in "$@"; do
     --crossings-output=*) CROSSINGS_OUT="${arg#*=}"; CROSSINGS_SET=1 ;;
     --kerbs-output=*) KERBS_OUT="${arg#*=}"; KERBS_SET=1 ;;
     --only_sidewalks|--only-sidewalks) ONLY_SIDEWALKS=1 ;;
+    --format=*) OUTPUT_FORMAT="${arg#*=}" ;;
   esac
 done
 
@@ -150,6 +153,7 @@ docker run --rm \
   -e OUTPUT_PATH="${OUTPUT_PATH}" \
   -e OUTPUT_CROSSINGS="${CROSSINGS_OUT:-memory:}" \
   -e OUTPUT_KERBS="${KERBS_OUT:-memory:}" \
+  -e OUTPUT_FORMAT="${OUTPUT_FORMAT}" \
   -v "${ROOT_DIR}:/plugins/osm_sidewalkreator" \
   -w / \
   qgis/qgis:latest bash -lc '
@@ -211,6 +215,18 @@ for p in (outp, cr_out, kb_out):
     if p.startswith("memory:"):
         continue
     _os.makedirs(_os.path.dirname(p), exist_ok=True)
+
+# output format (--format=geojson|gpkg|fgb), otherwise taken from the file extensions
+# (GeoPackage: the three layers as tables of the sidewalks file)
+if os.getenv("OUTPUT_FORMAT"):
+    from osm_sidewalkreator.generic_functions import sink_destination
+    out_format = {"geojson": "GeoJSON", "gpkg": "GeoPackage", "fgb": "FlatGeobuf"}[os.environ["OUTPUT_FORMAT"].lower()]
+    if out_format == "GeoPackage":
+        cr_out = cr_out if cr_out.startswith("memory:") else outp
+        kb_out = kb_out if kb_out.startswith("memory:") else outp
+    outp = sink_destination(outp, "sidewalks", out_format)
+    cr_out = sink_destination(cr_out, "crossings", out_format)
+    kb_out = sink_destination(kb_out, "kerbs", out_format)
 params={
   "INPUT_EXTENT": extent,
   "TIMEOUT": 90,
@@ -224,4 +240,15 @@ print("Street class indices:", street_classes)
 print(processing.run(FullSidewalkreatorBboxAlgorithm(), params))
 PY'
 
-echo "Wrote: ${OUTPUT_PATH}"
+# with --format, the extension of the file written follows the format
+# (as "sink_destination" does); with gpkg, crossings and kerbs are tables of it
+WRITTEN_PATH="${OUTPUT_PATH}"
+FORMAT_EXT="$(echo "${OUTPUT_FORMAT}" | tr '[:upper:]' '[:lower:]')"
+if [[ -n "$FORMAT_EXT" && "$WRITTEN_PATH" != memory:* ]]; then
+  if [[ "${WRITTEN_PATH##*/}" == *.* ]]; then
+    WRITTEN_PATH="${WRITTEN_PATH%.*}"
+  fi
+  WRITTEN_PATH="${WRITTEN_PATH}.${FORMAT_EXT}"
+fi
+
+echo "Wrote: ${WRITTEN_PATH}"
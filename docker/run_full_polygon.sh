@@ -21,6 +21,7 @@ USER_SET_OUT=0
 CROSSINGS_SET=0
 KERBS_SET=0
 ONLY_SIDEWALKS=0
+OUTPUT_FORMAT=""
 for arg in "$@"; do
   case "$arg" in
     -i|--input) shift; INPUT_POLYGON="${1:-}"; shift || true ;;
@@ -35,9 +36,10 @@ for arg in "$@"; do
     --no-addresses) FETCH_ADDR_ARG="0" ;;
     --addresses) FETCH_ADDR_ARG="1" ;;
     --only_sidewalks|--only-sidewalks) ONLY_SIDEWALKS=1 ;;
+    --format=*) OUTPUT_FORMAT="${arg#*=}" ;;
     -h|--help)
       cat <<EOF
-Usage: $0 [-i FILE] [-o FILE] [--classes=...] [--no-buildings|--buildings] [--no-addresses|--addresses] [--crossings-output=FILE] [--kerbs-output=FILE] [--only_sidewalks]
+Usage: $0 [-i FILE] [-o FILE] [--classes=...] [--no-buildings|--buildings] [--no-addresses|--addresses] [--crossings-output=FILE] [--kerbs-output=FILE] [--only_sidewalks] [--format=geojson|gpkg|fgb]
 EOF
       exit 0 ;;
   esac
@@ -97,6 +99,7 @@ docker run --rm \
   -e OUTPUT_SIDEWALKS="${SIDEWALKS_OUT}" \
   -e OUTPUT_CROSSINGS="${CROSSINGS_OUT:-memory:}" \
   -e OUTPUT_KERBS="${KERBS_OUT:-memory:}" \
+  -e OUTPUT_FORMAT="${OUTPUT_FORMAT}" \
   -e GET_BUILDINGS=${GET_BUILDINGS_ARG:-1} \
   -e FETCH_ADDRESSES=${FETCH_ADDR_ARG:-1} \
   -e STREET_CLASSES=${CLASSES_ARG:-10} \
@@ -142,6 +145,18 @@ for p in (sw_out, cr_out, kb_out):
     d = _os.path.dirname(p)
     _os.makedirs(d, exist_ok=True)
 
+# output format (--format=geojson|gpkg|fgb), otherwise taken from the file extensions
+# (GeoPackage: the three layers as tables of the sidewalks file)
+if os.getenv("OUTPUT_FORMAT"):
+    from osm_sidewalkreator.generic_functions import sink_destination
+    out_format = {"geojson": "GeoJSON", "gpkg": "GeoPackage", "fgb": "FlatGeobuf"}[os.environ["OUTPUT_FORMAT"].lower()]
+    if out_format == "GeoPackage":
+        cr_out = cr_out if cr_out.startswith("memory:") else sw_out
+        kb_out = kb_out if kb_out.startswith("memory:") else sw_out
+    sw_out = sink_destination(sw_out, "sidewalks", out_format)
+    cr_out = sink_destination(cr_out, "crossings", out_format)
+    kb_out = sink_destination(kb_out, "kerbs", out_format)
+
 # Dissolve features to unary union to ensure single AOI geometry when multiple are provided
 layer = QgsVectorLayer(inp, "input_poly", "ogr")
 if not layer.isValid() or layer.featureCount() == 0:
@@ -174,4 +189,15 @@ print("Street class indices:", street_classes)
 print(processing.run(FullSidewalkreatorPolygonAlgorithm(), params))
 PY'
 
-echo "Wrote: ${SIDEWALKS_OUT}"
+# with --format, the extension of the file written follows the format
+# (as "sink_destination" does); with gpkg, crossings and kerbs are tables of it
+WRITTEN_PATH="${SIDEWALKS_OUT}"
+FORMAT_EXT="$(echo "${OUTPUT_FORMAT}" | tr '[:upper:]' '[:lower:]')"
+if [[ -n "$FORMAT_EXT" && "$WRITTEN_PATH" != memory:* ]]; then
+  if [[ "${WRITTEN_PATH##*/}" == *.* ]]; then
+    WRITTEN_PATH="${WRITTEN_PATH%.*}"
+  fi
+  WRITTEN_PATH="${WRITTEN_PATH}.${FORMAT_EXT}"
+fi
+
+echo "Wrote: ${WRITTEN_PATH}"
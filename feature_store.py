@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compact container for the features of intermediate steps.
+
+Instead of a memory layer (or a list of QgsFeature copies) per step, the geometries
+are kept as WKB blobs and the attributes as columns, typed arrays for the numeric
+fields. Conversion to/from memory layers happens only where a layer is actually
+needed (processing algorithms, the canvas, outputs...).
+"""
+
+from array import array
+
+from PyQt5.QtCore import QVariant
+from qgis.core import QgsFeature, QgsField, QgsFields, QgsGeometry
+
+from .inprocess_geometry_ops import memory_layer
+
+# numeric fields are kept as typed arrays while all their values fit,
+# the first NULL (or non numeric) value turns the column into a plain list
+column_typecodes = {
+    QVariant.Int: "q",
+    QVariant.LongLong: "q",
+    QVariant.Double: "d",
+}
+
+
+class FeatureStore:
+    """
+    features as WKB blobs and attribute columns, with QgsGeometry/QgsFeature
+    objects created only on demand; the feature ids are the positions in the store,
+    the ids they had at their source layer (if any) are kept in "source_ids"
+    """
+
+    __slots__ = ("fields", "wkbtype", "crs", "wkbs", "columns", "source_ids")
+
+    def __init__(self, fields, wkbtype, crs):
+        self.fields = QgsFields()
+
+        for field in fields:
+            self.fields.append(QgsField(field))
+
+        self.wkbtype = wkbtype
+        self.crs = crs
+
+        self.wkbs = []
+        self.source_ids = []
+        self.columns = [
+            (
+                array(column_typecodes[field.type()])
+                if field.type() in column_typecodes
+                else []
+            )
+            for field in self.fields
+        ]
+
+    @classmethod
+    def from_features(cls, featlist, fields, wkbtype, crs):
+        store = cls(fields, wkbtype, crs)
+
+        for feature in featlist:
+            store.append(feature.geometry(), feature.attributes(), feature.id())
+
+        return store
+
+    @classmethod
+    def from_layer(cls, inputlayer, request=None, source_ids=None):
+        """
+        "source_ids" ({layer id: source id}, see "to_layer_with_source_ids") is for copies of
+        another layer: the features keep the ids they have there (new ones have none)
+        """
+
+        features = (
+            inputlayer.getFeatures(request) if request else inputlayer.getFeatures()
+        )
+
+        store = cls.from_features(
+            features, inputlayer.fields(), inputlayer.wkbType(), inputlayer.crs()
+        )
+
+        if source_ids is not None:
+            store.source_ids = [source_ids.get(fid) for fid in store.source_ids]
+
+        return store
+
+    def __len__(self):
+        return len(self.wkbs)
+
+    def append(self, geom, attrs=(), source_id=None):
+        self.wkbs.append(bytes(geom.asWkb()))
+        self.source_ids.append(source_id)
+
+        attrs = list(attrs)
+        attrs += [None] * (len(self.columns) - len(attrs))
+
+        for i, value in enumerate(attrs[: len(self.columns)]):
+            column = self.columns[i]
+
+            if isinstance(column, array):
+                try:
+                    column.append(value)
+                    continue
+                except (TypeError, OverflowError):
+                    column = self.columns[i] = column.tolist()
+
+            column.append(value)
+
+    def geometry(self, i):
+        geom = QgsGeometry()
+        geom.fromWkb(self.wkbs[i])
+
+        return geom
+
+    def attributes(self, i):
+        return [column[i] for column in self.columns]
+
+    def column(self, fieldname):
+        return self.columns[self.fields.indexFromName(fieldname)]
+
+    def feature(self, i):
+        feature = QgsFeature(self.fields, i)
+        feature.setGeometry(self.geometry(i))
+        feature.setAttributes(self.attributes(i))
+
+        return feature
+
+    def features(self):
+        for i in range(len(self)):
+            yield self.feature(i)
+
+    def to_layer(self, layername="output"):
+        """
+        a memory layer with the stored features, filled in a single provider call
+        """
+
+        return self.to_layer_with_source_ids(layername)[0]
+
+    def to_layer_with_source_ids(self, layername="output"):
+        """
+        "to_layer", also giving the source id of each feature by its id at the new layer
+        """
+
+        ret_layer = memory_layer(self.wkbtype, self.fields, self.crs, layername)
+
+        _, added_features = ret_layer.dataProvider().addFeatures(list(self.features()))
+        ret_layer.updateExtents()
+
+        source_ids = {
+            feature.id(): source_id
+            for feature, source_id in zip(added_features, self.source_ids)
+        }
+
+        return ret_layer, source_ids
+
+    def restore(self, inputlayer):
+        """
+        putting the stored fields and features back in "inputlayer" (a memory layer),
+        in place, so the layer object itself (and the references to it) are kept
+
+        the features still there keep their ids, only their geometries and attributes are
+        changed back; the ones added since are deleted, and the ones deleted since are
+        added again (with new ids, as the provider gives them, kept for the next restore)
+
+        Returns
+        -------
+        dict
+            {former id: new id} of the features added again
+        """
+
+        provider = inputlayer.dataProvider()
+
+        # the fields, only if they changed (it keeps the features and their ids anyway):
+        stored_fields = [(field.name(), field.type()) for field in self.fields]
+        current_fields = [(field.name(), field.type()) for field in inputlayer.fields()]
+
+        if stored_fields != current_fields:
+            provider.deleteAttributes(list(range(len(inputlayer.fields()))))
+            provider.addAttributes(list(self.fields))
+            inputlayer.updateFields()
+
+        current_ids = set(inputlayer.allFeatureIds())
+
+        kept = [i for i, fid in enumerate(self.source_ids) if fid in current_ids]
+        lost = [i for i, fid in enumerate(self.source_ids) if fid not in current_ids]
+
+        added_since = current_ids - {self.source_ids[i] for i in kept}
+
+        if added_since:
+            provider.deleteFeatures(list(added_since))
+
+        if kept:
+            provider.changeGeometryValues(
+                {self.source_ids[i]: self.geometry(i) for i in kept}
+            )
+            provider.changeAttributeValues(
+                {self.source_ids[i]: dict(enumerate(self.attributes(i))) for i in kept}
+            )
+
+        new_ids = {}
+
+        if lost:
+            _, added_features = provider.addFeatures([self.feature(i) for i in lost])
+
+            for i, feature in zip(lost, added_features):
+                if self.source_ids[i] is not None:
+                    new_ids[self.source_ids[i]] = feature.id()
+
+                self.source_ids[i] = feature.id()
+
+        inputlayer.updateExtents()
+
+        return new_ids
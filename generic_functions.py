@@ -12,11 +12,13 @@ from qgis.core import (
     QgsApplication,
     QgsCoordinateReferenceSystem,
     QgsCoordinateTransform,
+    QgsExpression,
     QgsFeature,
     QgsFeatureRequest,
     QgsField,
     QgsGeometry,
     QgsGeometryUtils,
+    QgsJsonUtils,
     QgsMultiPoint,
     QgsPoint,
     QgsPointXY,
@@ -26,21 +28,284 @@ from qgis.core import (
     QgsRasterLayer,
     QgsSpatialIndex,
     QgsVector,
+    QgsVectorFileWriter,
     QgsVectorLayer,
+    QgsWkbTypes,
 )  # Added QgsProcessing
 
 # from qgis.core import Qgis
-from qgis.core import QgsProcessingContext  # Qgis was already imported
+from qgis.core import (
+    QgsProcessingContext,
+    QgsProcessingException,
+)  # Qgis was already imported
 
 # from processing.gui.AlgorithmExecutor import execute_in_place # Not used in this file
 
 import os, json  # , random
-from math import isclose, pi
+from collections import deque
+from math import atan2, ceil, hypot, isclose, pi
+
+from .parameters import (
+    default_widths,
+    highway_tag,
+    widths_fieldname,
+    geometry_backend,
+    inprocess_max_features,
+    output_formats,
+    output_coordinate_decimals,
+    output_sort_fields,
+    scratch_parent_dir,
+    scratch_in_memory,
+    keep_scratch_on_failure,
+    cutoff_percent_protoblock,
+)
+from . import inprocess_geometry_ops
+from .osm_fetch import ScratchWorkspace
+
+crs_4326 = QgsCoordinateReferenceSystem("EPSG:4326")
 
-from .parameters import default_widths, highway_tag, widths_fieldname
+# validity records of the layers that went through the validity pre-pass
+# (or were derived only from such layers), keyed by layer id; a record is
+# dropped along with its layer (see "record_geometry_validity")
+geometry_validity_records = {}
 
+# can be changed at runtime, see "set_geometry_backend"
+current_geometry_backend = geometry_backend
 
-crs_4326 = QgsCoordinateReferenceSystem("EPSG:4326")
+
+def set_geometry_backend(backend="auto"):
+    """
+    globally choosing the backend of the geometry helpers: "processing", "inprocess" or "auto"
+    """
+    global current_geometry_backend
+
+    if backend not in ("processing", "inprocess", "auto"):
+        raise ValueError(f"unknown geometry backend: {backend}")
+
+    current_geometry_backend = backend
+
+
+def use_inprocess_backend(outputlayer, *inputlayers):
+    """
+    whether a helper shall run inprocess instead of processing.run
+
+    only for temporary outputs of already loaded layers; with the "auto" backend,
+    only if all of the input layers have up to "inprocess_max_features" features
+    """
+
+    if current_geometry_backend == "processing":
+        return False
+
+    if outputlayer != "TEMPORARY_OUTPUT":
+        return False
+
+    if not all(isinstance(layer, QgsVectorLayer) for layer in inputlayers):
+        return False
+
+    if current_geometry_backend == "inprocess":
+        return True
+
+    # a count of -1 stands for unknown, not for an empty layer:
+    return all(
+        0 <= layer.featureCount() <= inprocess_max_features for layer in inputlayers
+    )
+
+
+def raise_if_canceled(feedback, stepname=""):
+    if feedback and feedback.isCanceled():
+        raise QgsProcessingException(f"Canceled before running {stepname}")
+
+
+def validate_and_repair_layer(inputlayer, layername="validated", feedback=None):
+    """
+    one-time geometry validity pre-pass of an input layer (roads, buildings, input polygon...)
+
+    returns a memory copy of the layer, with the invalid geometries repaired by "makeValid"
+    (keeping only the parts with the layer's geometry type), and the validity record
+    of the input features: {fid: "valid" | "repaired" | "dropped"}; the dropped ones
+    (empty or impossible to repair) are reported through the feedback instead of
+    vanishing silently from the outputs
+
+    the record is cached for the returned layer (see "geometry_validated"),
+    so the downstream steps can skip their own validity checks
+    """
+
+    geometry_type = QgsWkbTypes.geometryType(inputlayer.wkbType())
+
+    validity_record = {}
+    geoms_attrs_list = []
+
+    for feature in inputlayer.getFeatures():
+        geom = feature.geometry()
+
+        if geom.isNull() or geom.isEmpty():
+            validity_record[feature.id()] = "dropped"
+            continue
+
+        if geom.isGeosValid():
+            validity_record[feature.id()] = "valid"
+        else:
+            geom = inprocess_geometry_ops.same_dimension_parts(
+                geom.makeValid(), geometry_type
+            )
+
+            if geom is None or geom.isEmpty():
+                validity_record[feature.id()] = "dropped"
+                continue
+
+            validity_record[feature.id()] = "repaired"
+
+        geoms_attrs_list.append((geom, feature.attributes()))
+
+    # repairing may turn a single geometry into a multipart one
+    wkbtype = inputlayer.wkbType()
+
+    if any(geom.isMultipart() for geom, _ in geoms_attrs_list):
+        wkbtype = QgsWkbTypes.multiType(wkbtype)
+
+    ret_layer = inprocess_geometry_ops.add_features_from_geoms(
+        inprocess_geometry_ops.memory_layer(
+            wkbtype, inputlayer.fields(), inputlayer.crs(), layername
+        ),
+        geoms_attrs_list,
+    )
+
+    record_geometry_validity(ret_layer, validity_record)
+
+    if feedback:
+        statuses = list(validity_record.values())
+
+        feedback.pushInfo(
+            f"{inputlayer.name()}: {statuses.count('valid')} valid geometries, {statuses.count('repaired')} repaired"
+        )
+
+        dropped = [
+            fid for fid, status in validity_record.items() if status == "dropped"
+        ]
+
+        if dropped:
+            feedback.pushWarning(
+                f"{inputlayer.name()}: {len(dropped)} features dropped for invalid geometries (ids: {dropped})"
+            )
+
+    return ret_layer, validity_record
+
+
+def record_geometry_validity(layer, validity_record):
+    """
+    keeping the validity record of a layer for as long as the layer exists
+    """
+
+    layer_id = layer.id()
+
+    if layer_id not in geometry_validity_records:
+        # not the layer itself in the closure, it would be kept alive
+        layer.destroyed.connect(lambda: geometry_validity_records.pop(layer_id, None))
+
+    geometry_validity_records[layer_id] = validity_record
+
+
+def geometry_validated(*inputlayers):
+    """
+    whether all the layers went through "validate_and_repair_layer" (or were derived only from such layers)
+    """
+
+    return bool(inputlayers) and all(
+        isinstance(layer, QgsVectorLayer) and layer.id() in geometry_validity_records
+        for layer in inputlayers
+    )
+
+
+def inherit_geometry_validity(outputlayer, *inputlayers):
+    """
+    marking a layer derived only from validated layers as validated too,
+    as the GEOS operations of the helpers output valid geometries
+    """
+
+    if (
+        isinstance(outputlayer, QgsVectorLayer)
+        and outputlayer.id() not in geometry_validity_records
+        and geometry_validated(*inputlayers)
+    ):
+        record_geometry_validity(outputlayer, {})
+
+    return outputlayer
+
+
+# the algorithms outputting valid geometries out of valid ones, so their outputs
+# are validated too when all their inputs are (see "run_processing_step"); not
+# those whose outputs may become invalid, e.g. reprojecting, snapping, collecting
+validity_preserving_algorithms = (
+    "native:buffer",
+    "native:centroids",
+    "native:clip",
+    "native:convexhull",
+    "native:deleteduplicategeometries",
+    "native:difference",
+    "native:dissolve",
+    "native:intersection",
+    "native:lineintersections",
+    "native:multiparttosingleparts",
+    "native:polygonize",
+    "native:polygonstolines",
+    "native:voronoipolygons",
+    "qgis:extractbylocation",
+)
+
+
+def run_processing_step(
+    algorithm_id,
+    parameter_dict,
+    context=None,
+    feedback=None,
+    invalid_geometry_check=None,
+):
+    """
+    processing.run sharing the caller's context and feedback
+
+    raises right away if the caller was already canceled, so a canceled job
+    does not keep going through the remaining nested steps
+
+    "invalid_geometry_check" is applied to the context only during this step,
+    the caller's setting is restored afterwards; if none was given and all the input
+    layers were already validated (see "validate_and_repair_layer") the check is skipped,
+    and the outputs of "validity_preserving_algorithms" are marked as validated as well
+    """
+
+    raise_if_canceled(feedback, algorithm_id)
+
+    inputlayers = [
+        value for value in parameter_dict.values() if isinstance(value, QgsVectorLayer)
+    ]
+
+    inputs_validated = geometry_validated(*inputlayers)
+
+    if inputs_validated and invalid_geometry_check is None:
+        invalid_geometry_check = Qgis.InvalidGeometryCheck.NoCheck
+
+    if invalid_geometry_check is None:
+        result = processing.run(
+            algorithm_id, parameter_dict, context=context, feedback=feedback
+        )
+    else:
+        if context is None:
+            context = QgsProcessingContext()
+
+        previous_check = context.invalidGeometryCheck()
+        context.setInvalidGeometryCheck(invalid_geometry_check)
+
+        try:
+            result = processing.run(
+                algorithm_id, parameter_dict, context=context, feedback=feedback
+            )
+        finally:
+            context.setInvalidGeometryCheck(previous_check)
+
+    if inputs_validated and algorithm_id in validity_preserving_algorithms:
+        for value in result.values():
+            inherit_geometry_validity(value, *inputlayers)
+
+    return result
 
 
 def create_dir_ifnotexists(folderpath):
@@ -57,6 +322,8 @@ def generate_buffer(
     cap_style="FLAT",
     join_style="ROUND",
     outputlayer="TEMPORARY_OUTPUT",
+    context=None,
+    feedback=None,
 ):
     """
     interfacing qgis processing operation
@@ -65,6 +332,17 @@ def generate_buffer(
     someting like: '( "width" /2)+1.5'
     """
 
+    if isinstance(distance, (int, float)) and use_inprocess_backend(
+        outputlayer, inputlayer
+    ):
+        raise_if_canceled(feedback, "generate_buffer")
+        return inherit_geometry_validity(
+            inprocess_geometry_ops.generate_buffer(
+                inputlayer, distance, segments, dissolve, cap_style, join_style
+            ),
+            inputlayer,
+        )
+
     parameter_dict = {
         "INPUT": inputlayer,
         "DISTANCE": distance,
@@ -86,27 +364,37 @@ def generate_buffer(
     if join_style.upper() in join_styles:
         parameter_dict["JOIN_STYLE"] = join_styles[join_style.upper()]
 
-    return processing.run("native:buffer", parameter_dict)["OUTPUT"]
+    return run_processing_step("native:buffer", parameter_dict, context, feedback)[
+        "OUTPUT"
+    ]
 
 
-def remove_duplicate_geometries(inputlayer, outputlayer):
+def remove_duplicate_geometries(inputlayer, outputlayer, context=None, feedback=None):
     parameter_dict = {"INPUT": inputlayer, "OUTPUT": outputlayer}
 
-    return processing.run("native:deleteduplicategeometries", parameter_dict)["OUTPUT"]
+    return run_processing_step(
+        "native:deleteduplicategeometries", parameter_dict, context, feedback
+    )["OUTPUT"]
 
 
-def remove_duplicate_vertices(inputlayer, tolerance):
+def remove_duplicate_vertices(inputlayer, tolerance, context=None, feedback=None):
     parameter_dict = {
         "INPUT": inputlayer,
         "TOLERANCE": tolerance,
         "OUTPUT": "TEMPORARY_OUTPUT",
     }
 
-    return processing.run("native:removeduplicatevertices", parameter_dict)["OUTPUT"]
+    return run_processing_step(
+        "native:removeduplicatevertices", parameter_dict, context, feedback
+    )["OUTPUT"]
 
 
 def split_lines_by_max_len(
-    inputlayer, len_val_or_expression, outputlayer="TEMPORARY_OUTPUT"
+    inputlayer,
+    len_val_or_expression,
+    outputlayer="TEMPORARY_OUTPUT",
+    context=None,
+    feedback=None,
 ):
 
     parameter_dict = {
@@ -118,10 +406,582 @@ def split_lines_by_max_len(
     if type(len_val_or_expression) == str:
         parameter_dict["LENGTH"] = QgsProperty.fromExpression(len_val_or_expression)
 
-    return processing.run("native:splitlinesbylength", parameter_dict)["OUTPUT"]
+    return run_processing_step(
+        "native:splitlinesbylength", parameter_dict, context, feedback
+    )["OUTPUT"]
 
 
-def vec_layers_intersection(inputlayer, overlay_layer, outputlayer="TEMPORARY_OUTPUT"):
+def cumulative_lengths(coords):
+    """
+    the cumulative length at each vertex of a line, given as (x,y) pairs (starts with 0)
+    """
+
+    ret_list = [0.0]
+
+    for (x0, y0), (x1, y1) in zip(coords[:-1], coords[1:]):
+        ret_list.append(ret_list[-1] + hypot(x1 - x0, y1 - y0))
+
+    return ret_list
+
+
+def split_coords_at_distances(coords, distances):
+    """
+    linear referencing: splitting a line, given as (x,y) pairs, at a sorted list of distances along it
+
+    a single walk through the vertices, so O(vertices + distances)
+    """
+
+    cum_lengths = cumulative_lengths(coords)
+
+    total_length = cum_lengths[-1]
+
+    pieces = []
+    current_piece = [coords[0]]
+
+    i = 1
+
+    for distance in distances:
+        if distance <= 0 or distance >= total_length:
+            continue
+
+        # advancing up to the segment containing the distance
+        while cum_lengths[i] < distance:
+            current_piece.append(coords[i])
+            i += 1
+
+        seg_len = cum_lengths[i] - cum_lengths[i - 1]
+        t = (distance - cum_lengths[i - 1]) / seg_len if seg_len else 0.0
+
+        (x0, y0), (x1, y1) = coords[i - 1], coords[i]
+        cut_point = (x0 + t * (x1 - x0), y0 + t * (y1 - y0))
+
+        current_piece.append(cut_point)
+        pieces.append(current_piece)
+        current_piece = [cut_point]
+
+        # the cut was exactly at a vertex, so it shall not be repeated
+        if cum_lengths[i] == distance:
+            i += 1
+
+    current_piece += coords[i:]
+    pieces.append(current_piece)
+
+    return pieces
+
+
+def split_coords_at_positions(coords, distances, min_gap=0.0):
+    """
+    like "split_coords_at_distances", for unsorted distances that may be too close: cuts closer
+    than "min_gap" to the previous one (or to the ends) are dropped
+
+    a ring is cut into as many pieces as cuts, as its start is not a cut (unless there's one there)
+    """
+
+    total_length = cumulative_lengths(coords)[-1]
+
+    is_ring = len(coords) > 2 and coords[0] == coords[-1]
+
+    cuts = []
+
+    for distance in sorted(distances):
+        if cuts and distance - cuts[-1] < min_gap:
+            continue
+
+        cuts.append(distance)
+
+    cut_at_start = bool(cuts) and (
+        cuts[0] < min_gap or cuts[-1] > total_length - min_gap
+    )
+
+    cuts = [
+        distance for distance in cuts if min_gap <= distance <= total_length - min_gap
+    ]
+
+    pieces = split_coords_at_distances(coords, cuts)
+
+    if is_ring and not cut_at_start and len(pieces) > 1:
+        # the piece at the end goes on through the start
+        pieces = [pieces[-1] + pieces[0][1:]] + pieces[1:-1]
+
+    return pieces
+
+
+def split_lines_at_projected_points(inputlayer, points_by_id, min_length=0.0):
+    """
+    splitting each line only at its own points ({feature id: [QgsPointXY]}), at the positions
+    along it of their projections (linear referencing, see "split_coords_at_positions"),
+    instead of a splitter layer interacting with every line
+
+    the lines are replaced by their pieces in place, in bulk; pieces shorter than "min_length"
+    are dropped, and so are cuts closer than it
+    """
+
+    request = QgsFeatureRequest().setFilterFids(list(points_by_id))
+
+    removed_ids = []
+    new_features = []
+
+    for feature in inputlayer.getFeatures(request):
+        geom = feature.geometry()
+
+        if geom.isMultipart():
+            parts = geom.asMultiPolyline()
+        else:
+            parts = [geom.asPolyline()]
+
+        parts_geoms = [QgsGeometry.fromPolylineXY(part) for part in parts]
+
+        # the position of each point along its nearest part:
+        distances_by_part = [[] for _ in parts]
+
+        for point in points_by_id[feature.id()]:
+            point_geom = QgsGeometry.fromPointXY(point)
+
+            nearest_part = min(
+                range(len(parts)),
+                key=lambda i: parts_geoms[i].distance(point_geom),
+            )
+
+            distances_by_part[nearest_part].append(
+                parts_geoms[nearest_part].lineLocatePoint(point_geom)
+            )
+
+        removed_ids.append(feature.id())
+
+        for part, distances in zip(parts, distances_by_part):
+            pieces = split_coords_at_positions(
+                [(p.x(), p.y()) for p in part], distances, min_length
+            )
+
+            for piece in pieces:
+                piece_geom = QgsGeometry.fromPolylineXY(
+                    [QgsPointXY(x, y) for x, y in piece]
+                )
+
+                if piece_geom.length() < min_length:
+                    continue
+
+                new_feature = QgsFeature(feature)
+                new_feature.setGeometry(piece_geom)
+                new_features.append(new_feature)
+
+    patch_features(inputlayer, removed_ids, new_features)
+
+
+def insert_points_in_coords(coords, points, tolerance=0.0):
+    """
+    linear referencing: inserting points as vertices of a line, given as (x,y) pairs, in a single rebuild
+
+    each point goes at the position along the line of its projection on it: the point itself
+    if it's within "tolerance" of the line (so it's snapped, the line is moved by that at most),
+    otherwise its projection. A point within "tolerance" of a vertex moves that vertex instead
+    (both ends, for a ring), one projecting right onto a vertex adds nothing.
+    """
+
+    cum_lengths = cumulative_lengths(coords)
+
+    is_ring = len(coords) > 2 and coords[0] == coords[-1]
+
+    new_coords = list(coords)
+    insertions = []
+
+    for px, py in points:
+        # the nearest segment, and where the point projects on it
+        nearest = None
+
+        for i in range(1, len(coords)):
+            (x0, y0), (x1, y1) = coords[i - 1], coords[i]
+            dx, dy = x1 - x0, y1 - y0
+
+            seg_len2 = dx * dx + dy * dy
+            t = ((px - x0) * dx + (py - y0) * dy) / seg_len2 if seg_len2 else 0.0
+            t = min(max(t, 0.0), 1.0)
+
+            projected = (x0 + t * dx, y0 + t * dy)
+
+            d = hypot(projected[0] - px, projected[1] - py)
+
+            if nearest is None or d < nearest[0]:
+                nearest = (d, i, t, projected)
+
+        d, i, t, projected = nearest
+
+        # the nearest vertex of that segment:
+        j = i - 1 if t < 0.5 else i
+
+        if hypot(coords[j][0] - px, coords[j][1] - py) <= tolerance:
+            new_coords[j] = (px, py)
+
+            if is_ring and j in (0, len(coords) - 1):
+                new_coords[0] = new_coords[-1] = (px, py)
+        elif projected != coords[j]:
+            position = cum_lengths[i - 1] + t * (cum_lengths[i] - cum_lengths[i - 1])
+            insertions.append((position, (px, py) if d <= tolerance else projected))
+
+    insertions.sort()
+
+    # merging both sorted sequences, vertices and insertions, in a single walk
+    # (at the start of a line, not of a ring, the insertions go before its first vertex):
+    ret_list = []
+    k = 0
+
+    for v, (cum_length, coord) in enumerate(zip(cum_lengths, new_coords)):
+        while k < len(insertions) and (
+            insertions[k][0] < cum_length
+            or (v == 0 and not is_ring and insertions[k][0] <= cum_length)
+        ):
+            ret_list.append(insertions[k][1])
+            k += 1
+
+        ret_list.append(coord)
+
+    ret_list += [coord for _, coord in insertions[k:]]
+
+    return ret_list
+
+
+def insert_points_into_lines(linelayer, points, max_distance=1.0, tolerance=0.1):
+    """
+    inserting points (QgsPointXY) as vertices of their nearest lines, e.g. the crossings'
+    endpoints into the sidewalks, so both are connected
+
+    the points are assigned to the lines with a single spatial index (KNN, up to "max_distance"),
+    then each line is rebuilt once with all of its points (see "insert_points_in_coords")
+    and the geometries are changed in a single provider call; a line is moved by "tolerance"
+    at most (as snapping to the points would do), farther points just add their projection
+
+    Returns
+    -------
+    list
+        the ids of the changed lines
+    """
+
+    index = gen_layer_spatial_index(linelayer)
+
+    points_by_line = {}
+
+    for point in points:
+        nearest_ids = index.nearestNeighbor(point, 1, max_distance)
+
+        if nearest_ids:
+            points_by_line.setdefault(nearest_ids[0], []).append((point.x(), point.y()))
+
+    new_geometries = {}
+
+    for fid, line_points in points_by_line.items():
+        geom = index.geometry(fid)
+
+        if geom.isMultipart():
+            parts = geom.asMultiPolyline()
+        else:
+            parts = [geom.asPolyline()]
+
+        parts_coords = [[(p.x(), p.y()) for p in part] for part in parts]
+
+        # each point to its nearest part:
+        points_by_part = [[] for _ in parts]
+
+        if len(parts) == 1:
+            points_by_part[0] = line_points
+        else:
+            parts_geoms = [QgsGeometry.fromPolylineXY(part) for part in parts]
+
+            for x, y in line_points:
+                point_geom = QgsGeometry.fromPointXY(QgsPointXY(x, y))
+
+                nearest_part = min(
+                    range(len(parts)),
+                    key=lambda i: parts_geoms[i].distance(point_geom),
+                )
+                points_by_part[nearest_part].append((x, y))
+
+        new_parts = [
+            [
+                QgsPointXY(x, y)
+                for x, y in insert_points_in_coords(coords, part_points, tolerance)
+            ]
+            for coords, part_points in zip(parts_coords, points_by_part)
+        ]
+
+        if geom.isMultipart():
+            new_geometries[fid] = QgsGeometry.fromMultiPolylineXY(new_parts)
+        else:
+            new_geometries[fid] = QgsGeometry.fromPolylineXY(new_parts[0])
+
+    if new_geometries:
+        linelayer.dataProvider().changeGeometryValues(new_geometries)
+        linelayer.triggerRepaint()
+
+    return list(new_geometries)
+
+
+def merge_short_coords(lines, min_length, decimals=3):
+    """
+    merging each line shorter than "min_length" ({id: [(x,y),...]}) into its best neighbor,
+    in a single pass over the graph of their endpoints (rounded to "decimals")
+
+    the candidates are the (not short, not closed) lines sharing an endpoint with it: the preferred
+    one goes on through a node of just the two of them (so the same sidewalk around the same
+    protoblock, no other line meets there), then the most collinear one. Shortest lines first;
+    a neighbor absorbing a line keeps its direction and can go on growing from its new end.
+
+    Returns
+    -------
+    tuple
+        ({neighbor id: merged coords}, [ids of the merged short lines])
+    """
+
+    def node_key(point):
+        return (round(point[0], decimals), round(point[1], decimals))
+
+    def heading(p0, p1):
+        return atan2(p1[1] - p0[1], p1[0] - p0[0])
+
+    coords = dict(lines)
+
+    nodes = {}
+
+    for fid, line in coords.items():
+        for endpoint in (line[0], line[-1]):
+            nodes.setdefault(node_key(endpoint), set()).add(fid)
+
+    lengths = {fid: cumulative_lengths(line)[-1] for fid, line in coords.items()}
+
+    short_ids = sorted(
+        (fid for fid in coords if lengths[fid] < min_length), key=lengths.get
+    )
+    short_set = set(short_ids)
+
+    changed = set()
+    removed = []
+
+    for fid in short_ids:
+        line = coords[fid]
+
+        if node_key(line[0]) == node_key(line[-1]):
+            continue
+
+        candidates = []
+
+        for oriented in (line[::-1], line):
+            # the short line oriented towards the shared node
+            node = node_key(oriented[-1])
+            incoming = heading(oriented[-2], oriented[-1])
+
+            for other_id in nodes[node] - {fid}:
+                other = coords[other_id]
+
+                if other_id in short_set or node_key(other[0]) == node_key(other[-1]):
+                    continue
+
+                # towards the far end of the neighbor, flipped back after merging
+                flipped = node_key(other[0]) != node
+
+                if flipped:
+                    other = other[::-1]
+
+                deflection = abs(
+                    (heading(other[0], other[1]) - incoming + pi) % (2 * pi) - pi
+                )
+
+                candidates.append(
+                    (
+                        len(nodes[node]) != 2,
+                        deflection,
+                        other_id,
+                        node,
+                        oriented,
+                        other,
+                        flipped,
+                    )
+                )
+
+        if not candidates:
+            continue
+
+        _, _, other_id, node, oriented, other, flipped = min(
+            candidates, key=lambda c: c[:3]
+        )
+
+        # the neighbor now ends where the short line started
+        nodes[node] -= {fid, other_id}
+        nodes[node_key(oriented[0])].discard(fid)
+        nodes[node_key(oriented[0])].add(other_id)
+
+        merged_line = oriented + other[1:]
+
+        coords[other_id] = merged_line[::-1] if flipped else merged_line
+        del coords[fid]
+
+        changed.add(other_id)
+        removed.append(fid)
+
+    return {fid: coords[fid] for fid in changed}, removed
+
+
+def merge_short_lines(inputlayer, min_length, decimals=3):
+    """
+    merging, in place, the lines shorter than "min_length" into their best touching neighbors
+    (see "merge_short_coords"); the merged lines keep the neighbors' features, the short ones
+    are deleted, each in a single provider call. Multipart lines are left as they are.
+
+    Returns
+    -------
+    int
+        the number of merged short lines
+    """
+
+    lines = {}
+
+    for feature in inputlayer.getFeatures():
+        geom = feature.geometry()
+
+        if geom.isMultipart():
+            parts = geom.asMultiPolyline()
+
+            if len(parts) != 1:
+                continue
+
+            line = parts[0]
+        else:
+            line = geom.asPolyline()
+
+        if len(line) > 1:
+            lines[feature.id()] = [(p.x(), p.y()) for p in line]
+
+    merged, removed = merge_short_coords(lines, min_length, decimals)
+
+    as_multi = QgsWkbTypes.isMultiType(inputlayer.wkbType())
+
+    new_geometries = {}
+
+    for fid, line in merged.items():
+        geom = QgsGeometry.fromPolylineXY([QgsPointXY(x, y) for x, y in line])
+
+        if as_multi:
+            geom.convertToMultiType()
+
+        new_geometries[fid] = geom
+
+    provider = inputlayer.dataProvider()
+
+    if new_geometries:
+        provider.changeGeometryValues(new_geometries)
+
+    if removed:
+        provider.deleteFeatures(removed)
+
+    inputlayer.updateExtents()
+    inputlayer.triggerRepaint()
+
+    return len(removed)
+
+
+def number_of_divisions(f_length, value, isbynumber=False, percent_add=0.01):
+    """
+    in how many equal parts a line shall be divided, by maximum length or by number of divisions
+
+    "percent_add" is a protection against the creation of very tiny segments caused by floating point issues
+    """
+
+    if isbynumber:  # always an integer, so...
+        return max(int(value), 1)
+
+    if value < (f_length + (f_length * percent_add)):
+        return max(round(f_length / value), 1)
+
+    return 1
+
+
+def split_lines_equally(
+    inputlayer, value, isbynumber=False, percent_add=0.01, outputlayer_name="splitted"
+):
+    """
+    splitting each line in equal parts, by maximum length or by number of divisions, keeping attributes
+
+    native alternative to "split_lines_by_max_len" with a per-feature length expression,
+    as no attribute must be written beforehand. As it never merges, any existing
+    breakpoint (e.g. protoblock corners) is kept.
+    """
+
+    ret_layer = QgsVectorLayer(
+        QgsWkbTypes.displayString(inputlayer.wkbType()), outputlayer_name, "memory"
+    )
+    ret_layer.dataProvider().addAttributes(inputlayer.fields())
+    ret_layer.updateFields()
+
+    as_multi = QgsWkbTypes.isMultiType(inputlayer.wkbType())
+
+    featlist = []
+
+    for feature in inputlayer.getFeatures():
+        geom = feature.geometry()
+
+        if geom.isEmpty():
+            continue
+
+        f_length = geom.length()
+
+        n_divisions = number_of_divisions(f_length, value, isbynumber, percent_add)
+
+        if geom.isMultipart():
+            parts = geom.asMultiPolyline()
+        else:
+            parts = [geom.asPolyline()]
+
+        for part in parts:
+            coords = [(point.x(), point.y()) for point in part]
+
+            if len(coords) < 2:
+                continue
+
+            part_length = cumulative_lengths(coords)[-1]
+
+            # the parts of a multipart line are divided proportionally
+            part_divisions = max(ceil(n_divisions * part_length / f_length - 1e-9), 1)
+
+            step = part_length / part_divisions
+
+            distances = [step * k for k in range(1, part_divisions)]
+
+            for piece in split_coords_at_distances(coords, distances):
+                piece_geom = QgsGeometry.fromPolylineXY(
+                    [QgsPointXY(x, y) for x, y in piece]
+                )
+
+                if as_multi:
+                    piece_geom.convertToMultiType()
+
+                new_feature = QgsFeature(ret_layer.fields())
+                new_feature.setGeometry(piece_geom)
+                new_feature.setAttributes(feature.attributes())
+
+                featlist.append(new_feature)
+
+    ret_layer.dataProvider().addFeatures(featlist)
+
+    ret_layer.updateExtents()
+
+    ret_layer.setCrs(inputlayer.crs())
+
+    return ret_layer
+
+
+def vec_layers_intersection(
+    inputlayer,
+    overlay_layer,
+    outputlayer="TEMPORARY_OUTPUT",
+    context=None,
+    feedback=None,
+):
+
+    if use_inprocess_backend(outputlayer, inputlayer, overlay_layer):
+        raise_if_canceled(feedback, "vec_layers_intersection")
+        return inherit_geometry_validity(
+            inprocess_geometry_ops.vec_layers_intersection(inputlayer, overlay_layer),
+            inputlayer,
+            overlay_layer,
+        )
 
     parameter_dict = {
         "INPUT": inputlayer,
@@ -129,10 +989,26 @@ def vec_layers_intersection(inputlayer, overlay_layer, outputlayer="TEMPORARY_OU
         "OUTPUT": outputlayer,
     }
 
-    return processing.run("native:intersection", parameter_dict)["OUTPUT"]
+    return run_processing_step(
+        "native:intersection", parameter_dict, context, feedback
+    )["OUTPUT"]
 
 
-def compute_difference_layer(inputlayer, overlaylayer, outputlayer="TEMPORARY_OUTPUT"):
+def compute_difference_layer(
+    inputlayer,
+    overlaylayer,
+    outputlayer="TEMPORARY_OUTPUT",
+    context=None,
+    feedback=None,
+):
+
+    if use_inprocess_backend(outputlayer, inputlayer, overlaylayer):
+        raise_if_canceled(feedback, "compute_difference_layer")
+        return inherit_geometry_validity(
+            inprocess_geometry_ops.compute_difference_layer(inputlayer, overlaylayer),
+            inputlayer,
+            overlaylayer,
+        )
 
     parameter_dict = {
         "INPUT": inputlayer,
@@ -140,7 +1016,9 @@ def compute_difference_layer(inputlayer, overlaylayer, outputlayer="TEMPORARY_OU
         "OUTPUT": outputlayer,
     }
 
-    return processing.run("native:difference", parameter_dict)["OUTPUT"]
+    return run_processing_step("native:difference", parameter_dict, context, feedback)[
+        "OUTPUT"
+    ]
 
 
 # def difference_inplace(inputlayer,overlaylayer):
@@ -160,36 +1038,75 @@ def compute_difference_layer(inputlayer, overlaylayer, outputlayer="TEMPORARY_OU
 #     inputlayer.commitChanges()
 
 
-def convert_multipart_to_singleparts(inputlayer, outputlayer="TEMPORARY_OUTPUT"):
+def convert_multipart_to_singleparts(
+    inputlayer, outputlayer="TEMPORARY_OUTPUT", context=None, feedback=None
+):
+
+    if use_inprocess_backend(outputlayer, inputlayer):
+        raise_if_canceled(feedback, "convert_multipart_to_singleparts")
+        return inherit_geometry_validity(
+            inprocess_geometry_ops.convert_multipart_to_singleparts(inputlayer),
+            inputlayer,
+        )
 
     parameter_dict = {"INPUT": inputlayer, "OUTPUT": outputlayer}
 
-    return processing.run("native:multiparttosingleparts", parameter_dict)["OUTPUT"]
+    return run_processing_step(
+        "native:multiparttosingleparts", parameter_dict, context, feedback
+    )["OUTPUT"]
 
 
-def mergelayers(inputlayerlist, dest_crs, outputlayer="TEMPORARY_OUTPUT"):
+def mergelayers(
+    inputlayerlist,
+    dest_crs,
+    outputlayer="TEMPORARY_OUTPUT",
+    context=None,
+    feedback=None,
+):
     """
     Will only work for layers of the same geometry type
     """
 
     parameter_dict = {"LAYERS": inputlayerlist, "CRS": dest_crs, "OUTPUT": outputlayer}
 
-    return processing.run("native:mergevectorlayers", parameter_dict)["OUTPUT"]
+    return run_processing_step(
+        "native:mergevectorlayers", parameter_dict, context, feedback
+    )["OUTPUT"]
 
 
 # # # def check_distances_layers(layer_many_features,layer_one_feature,idx=0):
 
 
-def dissolve_tosinglegeom(inputlayer, outputlayer="TEMPORARY_OUTPUT"):
+def dissolve_tosinglegeom(
+    inputlayer, outputlayer="TEMPORARY_OUTPUT", context=None, feedback=None
+):
+    if use_inprocess_backend(outputlayer, inputlayer):
+        raise_if_canceled(feedback, "dissolve_tosinglegeom")
+        return inherit_geometry_validity(
+            inprocess_geometry_ops.dissolve_tosinglegeom(inputlayer), inputlayer
+        )
+
     parameter_dict = {"INPUT": inputlayer, "OUTPUT": outputlayer}
 
-    return processing.run("native:dissolve", parameter_dict)["OUTPUT"]
+    return run_processing_step("native:dissolve", parameter_dict, context, feedback)[
+        "OUTPUT"
+    ]
 
 
-def merge_touching_lines(inputlayer, outputlayer="TEMPORARY_OUTPUT"):
+def merge_touching_lines(
+    inputlayer, outputlayer="TEMPORARY_OUTPUT", context=None, feedback=None
+):
+    if use_inprocess_backend(outputlayer, inputlayer):
+        raise_if_canceled(feedback, "merge_touching_lines")
+        return inherit_geometry_validity(
+            inprocess_geometry_ops.merge_touching_lines(inputlayer), inputlayer
+        )
+
     parameter_dict = {"INPUT": inputlayer, "OUTPUT": outputlayer}
 
-    return processing.run("native:mergelines", parameter_dict)["OUTPUT"]
+    return run_processing_step("native:mergelines", parameter_dict, context, feedback)[
+        "OUTPUT"
+    ]
 
 
 def polygonize_lines(
@@ -200,6 +1117,12 @@ def polygonize_lines(
     feedback=None,
 ):
     """Polygonize line geometries and ensure CRS consistency."""
+    if use_inprocess_backend(outputlayer, inputlines):
+        raise_if_canceled(feedback, "polygonize_lines")
+        return inherit_geometry_validity(
+            inprocess_geometry_ops.polygonize_lines(inputlines, keepfields), inputlines
+        )
+
     # For memory layers, the 'OUTPUT' value returned by processing.run is the
     # QgsVectorLayer instance. Ensure we pass a valid destination string.
     parameter_dict = {
@@ -207,8 +1130,8 @@ def polygonize_lines(
         "OUTPUT": outputlayer,  # e.g., "memory:my_polygonized_layer"
         "KEEP_FIELDS": keepfields,
     }
-    result_layer = processing.run(
-        "native:polygonize", parameter_dict, context=context, feedback=feedback
+    result_layer = run_processing_step(
+        "native:polygonize", parameter_dict, context, feedback
     )["OUTPUT"]
 
     if isinstance(result_layer, QgsVectorLayer) and inputlines.crs().isValid():
@@ -217,14 +1140,22 @@ def polygonize_lines(
     return result_layer
 
 
-def convex_hulls(inputlayer, outputlayer="TEMPORARY_OUTPUT", keepfields=True):
+def convex_hulls(
+    inputlayer,
+    outputlayer="TEMPORARY_OUTPUT",
+    keepfields=True,
+    context=None,
+    feedback=None,
+):
     parameter_dict = {
         "INPUT": inputlayer,
         "OUTPUT": outputlayer,
         "KEEP_FIELDS": keepfields,
     }
 
-    return processing.run("native:convexhull", parameter_dict)["OUTPUT"]
+    return run_processing_step("native:convexhull", parameter_dict, context, feedback)[
+        "OUTPUT"
+    ]
 
 
 def snap_layers(
@@ -234,17 +1165,9 @@ def snap_layers(
     tolerance=0.1,
     outputlayer="TEMPORARY_OUTPUT",
     dontcheckinvalid=False,
+    context=None,
+    feedback=None,
 ):
-    # Commenting out the explicit fixgeometries call as we'll use the context setting
-    # fixed_geometries_output = 'memory:fixed_geometries_for_snapping'
-    # fix_params = {'INPUT': inputlayer, 'OUTPUT': fixed_geometries_output}
-    # try:
-    #     fixed_layer = processing.run('native:fixgeometries', fix_params)['OUTPUT']
-    # except Exception as e:
-    #     print(f"Failed to fix geometries: {e}")
-    #     fixed_layer = inputlayer
-    # parameter_dict = {'INPUT': fixed_layer, 'OUTPUT': outputlayer,'REFERENCE_LAYER':snap_layer,'TOLERANCE':tolerance,'BEHAVIOR':behavior_code}
-
     parameter_dict = {
         "INPUT": inputlayer,
         "OUTPUT": outputlayer,
@@ -253,62 +1176,30 @@ def snap_layers(
         "BEHAVIOR": behavior_code,
     }
 
-    # Create a processing context
-    context = QgsProcessingContext()
-    # Set the invalid geometry handling method.
-    # Qgis.InvalidGeometryCheck.SkipInvalidFeatures is a common option.
-    # Qgis.InvalidGeometryCheck.RepairGeometry might also be suitable.
-    # Based on QgsFeatureRequest, the enum values are likely like QgsFeatureRequest.GeometryNoCheck, etc.
-    # Let's try with a common pattern from QGIS:
-    # For QGIS 3.x, the settings are often on QgsProcessingContext or related to QgsFeatureRequest.
-    # The error message implies a processing setting.
-    # The documentation for QgsProcessingContext shows `setInvalidGeometryCheck`.
-    # The enum is Qgis::InvalidGeometryCheck. In PyQGIS, this translates to Qgis.InvalidGeometryCheck.
-    # Common values for this enum, often seen in QgsFeatureRequest, are:
-    # NoCheck, SkipFeatureWithInvalidGeometry, AbortAlgorithmAndReport, ReportInvalidGeometryAndContinue
-    # Let's try to use `Qgis.InvalidGeometryCheck.SkipFeatureWithInvalidGeometry`
-    # or if that's not the exact name, we might need to find the correct enum member.
-    # A common pattern for processing algorithms is to use QgsProcessingContext.InvalidGeometryCheck
-    # The documentation for QgsProcessingContext.setInvalidGeometryCheck refers to Qgis::InvalidGeometryCheck.
-    # Let's assume Qgis.InvalidGeometryCheck.SkipFeatureWithInvalidGeometry or similar.
-    # A safer bet, often used, is to allow skipping or ignoring.
-    # The error specifically says "change the 'Invalid features filtering' option".
-    # This corresponds to `QgsProcessingParameterFeatureSource.FlagSkipInvalid`.
-    # However, for `processing.run`, the context's `invalidGeometryCheck` is more direct.
-
-    # Let's use `Qgis.InvalidGeometryCheck.SkipFeatureWithInvalidGeometry` if available,
-    # or rely on `dontcheckinvalid` to use `QgsFeatureRequest.GeometryNoCheck` as a fallback if an error persists.
-    # From the QGIS API docs for Qgis (namespace):
-    # enum InvalidGeometryCheck { GeometryNoCheck = ..., SkipFeatureWithInvalidGeometry = ..., AbortAlgorithmAndReport = ..., ReportInvalidGeometryAndContinue = ..., FixInvalidGeometry = ... }
-    # So, `Qgis.InvalidGeometryCheck.SkipFeatureWithInvalidGeometry` should be correct.
-
+    # the default invalid geometry handling aborts the algorithm ("Invalid features filtering" error),
+    # so invalid features are either not checked at all or skipped
     if dontcheckinvalid:
-        # This was the original logic for dontcheckinvalid, using dataobjects.createContext()
-        # which is different from QgsProcessingContext.
-        # We should unify this. If dontcheckinvalid is true, it means "GeometryNoCheck".
-        # Otherwise, we can try a more lenient policy than the default (which seems to be Abort).
-        context.setInvalidGeometryCheck(
-            Qgis.InvalidGeometryCheck.NoCheck
-        )  # Changed GeometryNoCheck to NoCheck
-        # The original code used `dataobjects.createContext()` and then `context.setInvalidGeometryCheck(QgsFeatureRequest.GeometryNoCheck)`
-        # This suggests `QgsFeatureRequest.GeometryNoCheck` is the value for `Qgis.InvalidGeometryCheck.GeometryNoCheck`.
-        # Let's stick to `Qgis.InvalidGeometryCheck` as per `QgsProcessingContext` docs.
+        invalid_geometry_check = Qgis.InvalidGeometryCheck.NoCheck
     else:
-        # If not specifically asked to ignore, let's try skipping invalid features.
-        # This directly addresses the error message's suggestion.
-        context.setInvalidGeometryCheck(
-            Qgis.InvalidGeometryCheck.SkipInvalid
-        )  # Changed SkipFeatureWithInvalidGeometry to SkipInvalid
-
-    return processing.run("native:snapgeometries", parameter_dict, context=context)[
-        "OUTPUT"
-    ]
+        invalid_geometry_check = Qgis.InvalidGeometryCheck.SkipInvalid
+
+    return run_processing_step(
+        "native:snapgeometries",
+        parameter_dict,
+        context,
+        feedback,
+        invalid_geometry_check,
+    )["OUTPUT"]
 
 
-def extract_lines_from_polygons(input_polygons, outputlayer="TEMPORARY_OUTPUT"):
+def extract_lines_from_polygons(
+    input_polygons, outputlayer="TEMPORARY_OUTPUT", context=None, feedback=None
+):
     parameter_dict = {"INPUT": input_polygons, "OUTPUT": outputlayer}
 
-    return processing.run("native:polygonstolines", parameter_dict)["OUTPUT"]
+    return run_processing_step(
+        "native:polygonstolines", parameter_dict, context, feedback
+    )["OUTPUT"]
 
 
 def extract_with_spatial_relation(
@@ -317,6 +1208,8 @@ def extract_with_spatial_relation(
     predicate: list = [5],
     outputlayer="TEMPORARY_OUTPUT",
     dontcheckinvalid=True,
+    context=None,
+    feedback=None,
 ):
     """
     Generic spatial relationship extractor
@@ -337,58 +1230,89 @@ def extract_with_spatial_relation(
     }
 
     if dontcheckinvalid:
-        from processing.tools import dataobjects  # Import here
-
-        # thx: https://gis.stackexchange.com/a/307618
-        context = dataobjects.createContext()
-        context.setInvalidGeometryCheck(QgsFeatureRequest.GeometryNoCheck)
-        return processing.run(
-            "qgis:extractbylocation", parameter_dict, context=context
+        if context is None:
+            from processing.tools import dataobjects  # Import here
+
+            # thx: https://gis.stackexchange.com/a/307618
+            context = dataobjects.createContext()
+
+        return run_processing_step(
+            "qgis:extractbylocation",
+            parameter_dict,
+            context,
+            feedback,
+            QgsFeatureRequest.GeometryNoCheck,
         )["OUTPUT"]
 
     else:
-        return processing.run("qgis:extractbylocation", parameter_dict)["OUTPUT"]
+        return run_processing_step(
+            "qgis:extractbylocation", parameter_dict, context, feedback
+        )["OUTPUT"]
 
 
-def collected_geoms_layer(inputlayer, outputlayer="TEMPORARY_OUTPUT"):
+def collected_geoms_layer(
+    inputlayer, outputlayer="TEMPORARY_OUTPUT", context=None, feedback=None
+):
     """
     interface to
     https://docs.qgis.org/3.22/en/docs/user_manual/processing_algs/qgis/vectorgeometry.html#qgiscollect
     """
     parameter_dict = {"INPUT": inputlayer, "OUTPUT": outputlayer}
 
-    return processing.run("native:collect", parameter_dict)["OUTPUT"]
+    return run_processing_step("native:collect", parameter_dict, context, feedback)[
+        "OUTPUT"
+    ]
 
 
-def gen_centroids_layer(inputlayer, outputlayer="TEMPORARY_OUTPUT", for_allparts=False):
+def gen_centroids_layer(
+    inputlayer,
+    outputlayer="TEMPORARY_OUTPUT",
+    for_allparts=False,
+    context=None,
+    feedback=None,
+):
     parameter_dict = {
         "INPUT": inputlayer,
         "OUTPUT": outputlayer,
         "ALL_PARTS": for_allparts,
     }
 
-    return processing.run("native:centroids", parameter_dict)["OUTPUT"]
+    return run_processing_step("native:centroids", parameter_dict, context, feedback)[
+        "OUTPUT"
+    ]
 
 
 def gen_voronoi_polygons_layer(
-    inputlayer, outputlayer="TEMPORARY_OUTPUT", buffer_perc=300
+    inputlayer,
+    outputlayer="TEMPORARY_OUTPUT",
+    buffer_perc=300,
+    context=None,
+    feedback=None,
 ):
     parameter_dict = {"INPUT": inputlayer, "OUTPUT": outputlayer, "BUFFER": buffer_perc}
 
-    return processing.run("native:voronoipolygons", parameter_dict)["OUTPUT"]
+    return run_processing_step(
+        "native:voronoipolygons", parameter_dict, context, feedback
+    )["OUTPUT"]
 
 
-def get_intersections(inputlayer, intersect_layer, outputlayer):
+def get_intersections(
+    inputlayer, intersect_layer, outputlayer, context=None, feedback=None
+):
     parameter_dict = {
         "INPUT": inputlayer,
         "INTERSECT": intersect_layer,
         "OUTPUT": outputlayer,
     }
 
-    return processing.run("native:lineintersections", parameter_dict)["OUTPUT"]
+    return run_processing_step(
+        "native:lineintersections", parameter_dict, context, feedback
+    )["OUTPUT"]
 
 
-def cliplayer_v2(inputlayer, overlay_lyr, outputlayer="TEMPORARY_OUTPUT"):
+def cliplayer_v2(
+    inputlayer, overlay_lyr, outputlayer="TEMPORARY_OUTPUT", context=None, feedback=None
+):
     """
     the first one was intended for datafiles, not memeory layers
     """
@@ -398,11 +1322,17 @@ def cliplayer_v2(inputlayer, overlay_lyr, outputlayer="TEMPORARY_OUTPUT"):
         "OUTPUT": outputlayer,
     }
 
-    return processing.run("native:clip", parameter_dict)["OUTPUT"]
+    return run_processing_step("native:clip", parameter_dict, context, feedback)[
+        "OUTPUT"
+    ]
 
 
 def reproject_layer(
-    inputlayer, destination_crs="EPSG:4326", output_mode="memory:Reprojected"
+    inputlayer,
+    destination_crs="EPSG:4326",
+    output_mode="memory:Reprojected",
+    context=None,
+    feedback=None,
 ):
     parameter_dict = {
         "INPUT": inputlayer,
@@ -410,7 +1340,9 @@ def reproject_layer(
         "OUTPUT": output_mode,
     }
 
-    return processing.run("native:reprojectlayer", parameter_dict)["OUTPUT"]
+    return run_processing_step(
+        "native:reprojectlayer", parameter_dict, context, feedback
+    )["OUTPUT"]
 
 
 def clean_street_network_data(
@@ -444,7 +1376,9 @@ def clean_street_network_data(
         Cleaned and reprojected road layer in ``local_tm_crs``.
     """
 
-    clipped = cliplayer_v2(osm_layer, clip_polygon_layer)
+    clipped = cliplayer_v2(
+        osm_layer, clip_polygon_layer, context=context, feedback=feedback
+    )
 
     params = {
         "INPUT": clipped,
@@ -452,14 +1386,28 @@ def clean_street_network_data(
         "OUTPUT": f"memory:{layer_name}",
     }
 
-    result = processing.run(
-        "native:reprojectlayer", params, context=context, feedback=feedback
-    )["OUTPUT"]
+    result = run_processing_step("native:reprojectlayer", params, context, feedback)[
+        "OUTPUT"
+    ]
     result.setCrs(local_tm_crs)
     return result
 
 
-def split_lines(inputlayer, splitterlayer, outputlayer="TEMPORARY_OUTPUT"):
+def split_lines(
+    inputlayer,
+    splitterlayer,
+    outputlayer="TEMPORARY_OUTPUT",
+    context=None,
+    feedback=None,
+):
+
+    if use_inprocess_backend(outputlayer, inputlayer, splitterlayer):
+        raise_if_canceled(feedback, "split_lines")
+        return inherit_geometry_validity(
+            inprocess_geometry_ops.split_lines(inputlayer, splitterlayer),
+            inputlayer,
+            splitterlayer,
+        )
 
     parameter_dict = {
         "INPUT": inputlayer,
@@ -467,10 +1415,12 @@ def split_lines(inputlayer, splitterlayer, outputlayer="TEMPORARY_OUTPUT"):
         "OUTPUT": outputlayer,
     }
 
-    return processing.run("qgis:splitwithlines", parameter_dict)["OUTPUT"]
+    return run_processing_step(
+        "qgis:splitwithlines", parameter_dict, context, feedback
+    )["OUTPUT"]
 
 
-def cliplayer(inlayerpath, cliplayerpath, outputpath):
+def cliplayer(inlayerpath, cliplayerpath, outputpath, context=None, feedback=None):
     """
     clip a layer
 
@@ -481,34 +1431,26 @@ def cliplayer(inlayerpath, cliplayerpath, outputpath):
     source: https://opensourceoptions.com/blog/pyqgis-clip-vector-layers/ (thx!!)
     """
     # run the clip tool
-    processing.run(
+    run_processing_step(
         "native:clip",
         {"INPUT": inlayerpath, "OVERLAY": cliplayerpath, "OUTPUT": outputpath},
+        context,
+        feedback,
     )
 
 
 def remove_biggest_polygon(inputlayer, record_area=False, area_fieldname="area"):
-    areas = []
-    ids = []
+    areas = column_from_features(inputlayer, lambda feature: feature.geometry().area())
 
     # if one extracts only boundaries, one can still use the area value
     if record_area:
-        create_new_layerfield(inputlayer, area_fieldname)
-        area_idx = inputlayer.fields().indexOf(area_fieldname)
-
-    with edit(inputlayer):
-        for feature in inputlayer.getFeatures():
-            area_val = feature.geometry().area()
-            areas.append(area_val)
-            ids.append(feature.id())
+        area_idx = create_new_layerfield(inputlayer, area_fieldname)
+        write_layer_column(inputlayer, area_idx, areas)
 
-            if record_area:
-                inputlayer.changeAttributeValue(feature.id(), area_idx, area_val)
-
-        # Check if there are any features before trying to find the max
-        if areas:
-            max_area_idx = areas.index(max(areas))
-            inputlayer.deleteFeature(ids[max_area_idx])
+    # Check if there are any features before trying to find the max
+    if areas:
+        inputlayer.dataProvider().deleteFeatures([max(areas, key=areas.get)])
+        inputlayer.updateExtents()
 
 
 def single_geom_polygonize(inputgeom):
@@ -518,43 +1460,43 @@ def single_geom_polygonize(inputgeom):
 def create_area_field(inputlayer, area_fieldname):
     area_idx = create_new_layerfield(inputlayer, area_fieldname)
 
-    with edit(inputlayer):
+    if inputlayer.geometryType() == 2:
+        areas = column_from_features(
+            inputlayer, lambda feature: feature.geometry().area()
+        )
 
-        if inputlayer.geometryType() == 2:
-            for feature in inputlayer.getFeatures():
-                area_val = feature.geometry().area()
-                inputlayer.changeAttributeValue(feature.id(), area_idx, area_val)
+    elif inputlayer.geometryType() == 1:
+        areas = column_from_features(
+            inputlayer,
+            lambda feature: single_geom_polygonize(feature.geometry()).area(),
+        )
 
-        elif inputlayer.geometryType() == 1:
-            for feature in inputlayer.getFeatures():
-                area_val = single_geom_polygonize(feature.geometry()).area()
-                inputlayer.changeAttributeValue(feature.id(), area_idx, area_val)
+    # for points or not-spatial will leave all NULL
+    else:
+        areas = {}
 
-        # for points or not-spatial will leave all NULL
+    write_layer_column(inputlayer, area_idx, areas)
 
-        return area_idx
+    return area_idx
 
 
 def create_perimeter_field(inputlayer, perimeter_fieldname):
     perimeter_idx = create_new_layerfield(inputlayer, perimeter_fieldname)
 
-    with edit(inputlayer):
-
-        if inputlayer.geometryType() == 1:
-            for feature in inputlayer.getFeatures():
-                perim_val = feature.geometry().length()
-                inputlayer.changeAttributeValue(feature.id(), perimeter_idx, perim_val)
-
-        # TBD for polygons
+    if inputlayer.geometryType() == 1:
+        write_layer_column(
+            inputlayer,
+            perimeter_idx,
+            column_from_features(
+                inputlayer, lambda feature: feature.geometry().length()
+            ),
+        )
 
-        # elif inputlayer.geometryType() == 2:
-        #     for feature in inputlayer.getFeatures():
-        #         perim_val =
-        #         inputlayer.changeAttributeValue(feature.id(),perimeter_idx,perim_val)
+    # TBD for polygons
 
-        # for points or not-spatial will leave all NULL
+    # for points or not-spatial will leave all NULL
 
-        return perimeter_idx
+    return perimeter_idx
 
 
 def path_from_layer(inputlayer, splitcharacter="|", splitposition=0):
@@ -616,7 +1558,9 @@ def custom_local_projection(lgt_0, lat_0=0, mode="TM", return_wkt=False):
         return custom_crs
 
 
-def reproject_layer_localTM(inputlayer, outputpath, layername, lgt_0, lat_0=0):
+def reproject_layer_localTM(
+    inputlayer, outputpath, layername, lgt_0, lat_0=0, context=None, feedback=None
+):
     """Reproject a layer to a custom local Transverse Mercator CRS.
 
     Parameters
@@ -654,9 +1598,11 @@ def reproject_layer_localTM(inputlayer, outputpath, layername, lgt_0, lat_0=0):
     parameter_dict["TARGET_CRS"] = new_crs
 
     if not outputpath:
-        ret_lyr = processing.run("native:reprojectlayer", parameter_dict)["OUTPUT"]
+        ret_lyr = run_processing_step(
+            "native:reprojectlayer", parameter_dict, context, feedback
+        )["OUTPUT"]
     else:
-        processing.run("native:reprojectlayer", parameter_dict)
+        run_processing_step("native:reprojectlayer", parameter_dict, context, feedback)
         ret_lyr = QgsVectorLayer(outputpath, layername, "ogr")
 
     # fixing no set layer crs:
@@ -718,53 +1664,157 @@ def create_new_layerfield(inputlayer, fieldname, datatype=QVariant.Double):
     create a new field for the layer, and also return the index of the new field
     """
 
-    with edit(inputlayer):
-        new_field = QgsField(fieldname, datatype)
-        inputlayer.dataProvider().addAttributes([new_field])
-        inputlayer.updateFields()
+    inputlayer.dataProvider().addAttributes([QgsField(fieldname, datatype)])
+    inputlayer.updateFields()
 
     return inputlayer.fields().indexOf(fieldname)
 
 
+def column_from_features(inputlayer, function):
+    """
+    the values of "function(feature)" for every feature, as {feature id: value}
+    """
+
+    return {feature.id(): function(feature) for feature in inputlayer.getFeatures()}
+
+
+def write_layer_columns(inputlayer, columns):
+    """
+    writing whole attribute columns in a single provider call, without an edit session
+
+    Parameters
+    ----------
+    inputlayer : QgsVectorLayer
+        the layer to be written, must not be in editing mode
+    columns : dict
+        {field index: {feature id: value}}
+
+    Returns
+    -------
+    bool
+        the provider's success flag
+    """
+
+    attr_map = {}
+
+    for field_idx, values_by_id in columns.items():
+        for feature_id, value in values_by_id.items():
+            attr_map.setdefault(feature_id, {})[field_idx] = value
+
+    if not attr_map:
+        return True
+
+    return inputlayer.dataProvider().changeAttributeValues(attr_map)
+
+
+def write_layer_column(inputlayer, field_idx, values_by_id):
+    """
+    a single column version of "write_layer_columns"
+    """
+
+    return write_layer_columns(inputlayer, {field_idx: values_by_id})
+
+
+def fill_empty_from_mapping(inputlayer, fieldname, key_fieldname, mapping):
+    """
+    filling the empty values of a field with "mapping[value of key_fieldname]"
+    (e.g. the widths from the highway values), in a single provider call;
+    features whose key is not in the mapping are left as they are
+
+    Returns
+    -------
+    dict
+        {feature id: value} of the filled features
+    """
+
+    field_idx = inputlayer.fields().indexOf(fieldname)
+    key_idx = inputlayer.fields().indexOf(key_fieldname)
+
+    request = QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry)
+    request.setSubsetOfAttributes([field_idx, key_idx])
+
+    values_by_id = {}
+
+    for feature in inputlayer.getFeatures(request):
+        attrs = feature.attributes()
+
+        if not attrs[field_idx] and attrs[key_idx] in mapping:
+            values_by_id[feature.id()] = mapping[attrs[key_idx]]
+
+    write_layer_column(inputlayer, field_idx, values_by_id)
+
+    return values_by_id
+
+
+def value_counts_and_lengths(inputlayer, fieldname):
+    """
+    the unique values of a field, with the number of features and their total length
+    for each one, in a single pass reading just that field (and the geometries)
+
+    Returns
+    -------
+    dict
+        {value: (count, length)}, the longest first
+    """
+
+    field_idx = inputlayer.fields().indexOf(fieldname)
+
+    request = QgsFeatureRequest().setSubsetOfAttributes([field_idx])
+
+    counts = {}
+    lengths = {}
+
+    for feature in inputlayer.getFeatures(request):
+        value = feature.attributes()[field_idx]
+
+        counts[value] = counts.get(value, 0) + 1
+        lengths[value] = lengths.get(value, 0.0) + feature.geometry().length()
+
+    return {
+        value: (counts[value], lengths[value])
+        for value in sorted(counts, key=lambda value: -lengths[value])
+    }
+
+
 def create_filled_newlayerfield(inputlayer, fieldname, fieldvalue, datatype):
     # creating field
     field_index = create_new_layerfield(inputlayer, fieldname, datatype)
 
     # then filling:
-    with edit(inputlayer):
-        if isinstance(fieldvalue, dict):
-            dkey = next(iter(fieldvalue))
-            # print(dkey,fieldvalue[dkey])
-            # by now only length is implemented
-            if dkey == "geometry":
-                if fieldvalue[dkey] == "length":
-                    for feature in inputlayer.getFeatures():
-                        inputlayer.changeAttributeValue(
-                            feature.id(), field_index, feature.geometry().length()
-                        )
-            if dkey == "attr_by_id":
-                inner_dict = fieldvalue[dkey]
-
-                for feature in inputlayer.getFeatures():
-                    if feature.id() in inner_dict:
-                        inputlayer.changeAttributeValue(
-                            feature.id(), field_index, inner_dict[feature.id()]
-                        )
+    values_by_id = {}
+
+    if isinstance(fieldvalue, dict):
+        dkey = next(iter(fieldvalue))
+        # by now only length is implemented
+        if dkey == "geometry":
+            if fieldvalue[dkey] == "length":
+                values_by_id = column_from_features(
+                    inputlayer, lambda feature: feature.geometry().length()
+                )
+        if dkey == "attr_by_id":
+            feature_ids = set(inputlayer.allFeatureIds())
 
-        else:
-            for feature in inputlayer.getFeatures():
-                inputlayer.changeAttributeValue(feature.id(), field_index, fieldvalue)
+            values_by_id = {
+                feature_id: value
+                for feature_id, value in fieldvalue[dkey].items()
+                if feature_id in feature_ids
+            }
+
+    else:
+        values_by_id = dict.fromkeys(inputlayer.allFeatureIds(), fieldvalue)
+
+    write_layer_column(inputlayer, field_index, values_by_id)
 
 
 def create_fill_id_field(inputlayer, fieldname="id_on_layer"):
 
     created_field_index = create_new_layerfield(inputlayer, fieldname, QVariant.Int)
 
-    with edit(inputlayer):
-        for feature in inputlayer.getFeatures():
-            inputlayer.changeAttributeValue(
-                feature.id(), created_field_index, feature.id()
-            )
+    write_layer_column(
+        inputlayer,
+        created_field_index,
+        {feature_id: feature_id for feature_id in inputlayer.allFeatureIds()},
+    )
 
 
 def remove_layerfields(inputlayer, fieldlist):
@@ -802,11 +1852,24 @@ def get_layer_att_table(inputlayer):
     return att_lists
 
 
-def wipe_folder_files(inputfolderpath):
-    for filename in os.listdir(inputfolderpath):
-        filepath = os.path.join(inputfolderpath, filename)
+def new_scratch_workspace(
+    prefix="sidewalkreator_", keep_on_failure=None, feedback=None
+):
+    """
+    a ScratchWorkspace (unique folder for the intermediate files of a run) with the settings from parameters.py
+    ("keep_on_failure" defaults to "keep_scratch_on_failure"); files kept are reported to "feedback"
+    """
+
+    if keep_on_failure is None:
+        keep_on_failure = keep_scratch_on_failure
 
-        os.remove(filepath)
+    return ScratchWorkspace(
+        prefix,
+        parentdir=scratch_parent_dir,
+        in_memory=scratch_in_memory,
+        keep_on_failure=keep_on_failure,
+        feedback=feedback,
+    )
 
 
 # def remove_layer(layername):
@@ -856,66 +1919,121 @@ def qgs_point_geom_from_line_at(inputlinefeature, index=0):
     return QgsGeometry.fromPointXY(inputlinefeature.geometry().asPolyline()[index])
 
 
-def remove_lines_from_no_block(inputlayer, layer_to_check_culdesac=None):
+def prune_dangling_lines(line_ends, iterations=1, keep=None):
+    """
+    degree-based pruning of the lines with a dangling end (no other line ending there),
+    given as {id: (start node, end node)}, like a k-core peeling
+
+    the lines dangling at first are the first round, the ones left dangling by a removal
+    are the next one... up to "iterations" rounds (None: until there's no dangling line),
+    all in a single queue-driven run; "keep(id)" may spare a line (and so its neighbors)
+
+    Returns
+    -------
+    list
+        the ids of the removed lines, round by round
+    """
+
+    nodes = {}
+
+    for fid, ends in line_ends.items():
+        for node in ends:
+            nodes.setdefault(node, set()).add(fid)
+
+    def is_dangling(fid):
+        return any(nodes[node] == {fid} for node in line_ends[fid])
+
+    queue = deque((fid, 1) for fid in line_ends if is_dangling(fid))
+
+    removed = []
+    removed_set = set()
+    kept = {}
+
+    while queue:
+        fid, level = queue.popleft()
+
+        if iterations and level > iterations:
+            break
+
+        if fid in removed_set:
+            continue
+
+        if keep:
+            if fid not in kept:
+                kept[fid] = keep(fid)
+
+            if kept[fid]:
+                continue
+
+        removed.append(fid)
+        removed_set.add(fid)
+
+        for node in line_ends[fid]:
+            nodes[node].discard(fid)
+
+            for other_id in nodes[node]:
+                if is_dangling(other_id):
+                    queue.append((other_id, level + 1))
+
+    return removed
+
+
+def remove_lines_from_no_block(
+    inputlayer, layer_to_check_culdesac=None, iterations=1, decimals=6
+):
     """
     remove lines in wich one of its ends
     are not connected to any other segment
 
     the "layer_to_check_culdesac" is a whole layer (dissolved) that should be checked for 'within' condition
-    """
 
-    # TODO: check if will work with multilinestrings
-
-    check_for_culdesacs = False
+    "iterations" rounds of removal (see "prune_dangling_lines"), as the removed lines may leave
+    others dangling, over a table of the line ends (rounded to "decimals") instead of
+    geometric checks against the neighbors; the removal is a single provider call
+    """
 
-    if layer_to_check_culdesac:
-        check_for_culdesacs = True
-        checker_geom = get_first_feature_or_geom(layer_to_check_culdesac, True)
+    line_ends = {}
 
-    feature_ids_to_be_removed = []
+    for feature in inputlayer.getFeatures():
+        geom = feature.geometry()
 
-    index = QgsSpatialIndex(inputlayer.getFeatures())
+        if geom.isMultipart():
+            parts = geom.asMultiPolyline()
+            P0, PF = parts[0][0], parts[-1][-1]
+        else:
+            line = geom.asPolyline()
+            P0, PF = line[0], line[-1]
 
-    for i, feature_A in enumerate(inputlayer.getFeatures()):
+        line_ends[feature.id()] = tuple(
+            (round(point.x(), decimals), round(point.y(), decimals))
+            for point in (P0, PF)
+        )
 
-        P0 = qgs_point_geom_from_line_at(feature_A)  # first point
-        PF = qgs_point_geom_from_line_at(feature_A, -1)  # last point
+    culdesac_check = None
 
-        P0_count = 0
-        PF_count = 0
+    if layer_to_check_culdesac:
+        checker_geom = get_first_feature_or_geom(layer_to_check_culdesac, True)
 
-        # THE OPTIMIZATION PATROL:
-        # for j,feature_B in enumerate(inputlayer.getFeatures()):
-        #     # if not i == j:
-        #     if P0.intersects(feature_B.geometry()):
-        #         P0_count += 1
-        #     if PF.intersects(feature_B.geometry()):
-        #         PF_count += 1
+        # a dangling line is kept if it's within it (a 'culdesac'):
+        engine = QgsGeometry.createGeometryEngine(checker_geom.constGet())
+        engine.prepareGeometry()
 
-        intersect_ids = index.intersects(feature_A.geometry().boundingBox())
+        def is_culdesac(fid):
+            geom = inputlayer.getFeature(fid).geometry()
 
-        for id in intersect_ids:
-            if id != feature_A.id():
-                if P0.intersects(inputlayer.getFeature(id).geometry()):
-                    P0_count += 1
-                if PF.intersects(inputlayer.getFeature(id).geometry()):
-                    PF_count += 1
+            return engine.contains(geom.constGet())
 
-        # print(P0_count,PF_count)
+        culdesac_check = is_culdesac
 
-        if any(count == 0 for count in [P0_count, PF_count]):
-            # after checking, only add if its not a "culdesac"
-            if check_for_culdesacs:
-                if not feature_A.geometry().within(checker_geom):
-                    feature_ids_to_be_removed.append(feature_A.id())
+    feature_ids_to_be_removed = prune_dangling_lines(
+        line_ends, iterations, culdesac_check
+    )
 
-            # if no "checker geometry", then just add directly
-            else:
-                feature_ids_to_be_removed.append(feature_A.id())
+    if feature_ids_to_be_removed:
+        inputlayer.dataProvider().deleteFeatures(feature_ids_to_be_removed)
+        inputlayer.updateExtents()
 
-    with edit(inputlayer):
-        for feature_id in feature_ids_to_be_removed:
-            inputlayer.deleteFeature(feature_id)
+    return feature_ids_to_be_removed
 
 
 def remove_features_byattr(inputlayer, attrname, attrvalue):
@@ -1094,21 +2212,64 @@ def layer_from_featlist(
 
     ret_layer = QgsVectorLayer(geomtype, lname, output_type)
 
-    with edit(ret_layer):
-        if attrs_dict:
-            attrs_list = []
+    # straight to the provider, in a single call: no edit buffer/undo stack needed for new layers
+    provider = ret_layer.dataProvider()
+
+    if attrs_dict:
+        provider.addAttributes([QgsField(key, attrs_dict[key]) for key in attrs_dict])
+
+        ret_layer.updateFields()
+
+    provider.addFeatures(list(featlist))
+
+    ret_layer.updateExtents()
+
+    if CRS:
+        ret_layer.setCrs(CRS)
+
+    return ret_layer
+
+
+def layer_from_coords_arrays(
+    coords_arrays, layername, geomtype="Point", attrs_dict=None, CRS=None
+):
+    """
+    creating a memory layer directly from coordinate arrays, in a single provider call
 
-            for key in attrs_dict:
-                attrs_list.append(QgsField(key, attrs_dict[key]))
+    each item of "coords_arrays" is a (x,y) pair for Points or a sequence of (x,y) pairs for LineStrings
 
-            ret_layer.dataProvider().addAttributes(attrs_list)
+    "attrs_dict" maps fieldname to a constant (string) value, filled for every feature
+    """
+
+    ret_layer = QgsVectorLayer(geomtype, layername, "memory")
+    provider = ret_layer.dataProvider()
+
+    if attrs_dict:
+        provider.addAttributes([QgsField(key, QVariant.String) for key in attrs_dict])
+        ret_layer.updateFields()
+
+    fields = ret_layer.fields()
+    attrs_values = list(attrs_dict.values()) if attrs_dict else []
+
+    featlist = []
+
+    for coords in coords_arrays:
+        feature = QgsFeature(fields)
+
+        if geomtype.lower() == "point":
+            feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(*coords)))
+        else:
+            feature.setGeometry(
+                QgsGeometry.fromPolylineXY([QgsPointXY(x, y) for x, y in coords])
+            )
 
-            ret_layer.updateFields()
+        feature.setAttributes(attrs_values)
+        featlist.append(feature)
 
-        for feature in featlist:
-            ret_layer.dataProvider().addFeature(feature)
+    if featlist:
+        provider.addFeatures(featlist)
 
-        ret_layer.updateExtents()
+    ret_layer.updateExtents()
 
     if CRS:
         ret_layer.setCrs(CRS)
@@ -1116,6 +2277,67 @@ def layer_from_featlist(
     return ret_layer
 
 
+def crossings_coords_array(inputlayer, n_vertices=5):
+    """
+    reading the crossings as a (n,5,2) array (a list of 5-tuples of (x,y) pairs)
+
+    crossings with another vertex count are skipped
+    """
+
+    ret_list = []
+
+    for feature in inputlayer.getFeatures():
+        as_polyline = feature.geometry().asPolyline()
+
+        if len(as_polyline) == n_vertices:
+            ret_list.append(tuple((point.x(), point.y()) for point in as_polyline))
+
+    return ret_list
+
+
+def derive_layers_from_crossings_coords(crossings_coords, CRS=None):
+    """
+    deriving kerbs, alt_crossings_ends and alt_crossings_centers (ALT_SCHEMA) from the crossings coordinates.
+
+    Vertex indexes 0 1 2 3 4: 1 and 3 are kerbs, 0-1 and 3-4 are the ends and 1-2-3 is the center part.
+
+    Returns
+    -------
+    tuple of 3 memory layers: (kerbs, alt_crossings_ends, alt_crossings_centers)
+    """
+
+    kerbs_coords = []
+    ends_coords = []
+    centers_coords = []
+
+    for pA, pB, pC, pD, pE in crossings_coords:
+        kerbs_coords += [pB, pD]
+        ends_coords += [(pA, pB), (pD, pE)]
+        centers_coords.append((pB, pC, pD))
+
+    kerbs_layer = layer_from_coords_arrays(
+        kerbs_coords, "temp", "Point", {"barrier": "kerb"}, CRS
+    )
+
+    alt_crossings_ends_layer = layer_from_coords_arrays(
+        ends_coords,
+        "alt_crossings_ends",
+        "LineString",
+        {"highway": "footway", "footway": "sidewalk"},
+        CRS,
+    )
+
+    alt_crossings_centers_layer = layer_from_coords_arrays(
+        centers_coords,
+        "alt_crossings_centers",
+        "LineString",
+        {"highway": "footway", "footway": "crossing"},
+        CRS,
+    )
+
+    return kerbs_layer, alt_crossings_ends_layer, alt_crossings_centers_layer
+
+
 def items_minor_than_inlist(value, inpulist):
     # thx: https://stackoverflow.com/a/10543316/4436950
     return sum(entry < value for entry in inpulist)
@@ -1300,109 +2522,255 @@ def check_sidewalk_intersection(intersectiongeom, referencepoint):
                     points[distances.index(min(distances))]
                 )
 
-            elif intersectiongeom.wkbType() == 7:
+            elif intersectiongeom.wkbType() == 7:
+
+                points = []
+
+                for entity in as_geomcollection:
+                    if entity.wkbType() == 2:
+                        for point in entity.asPolyline():
+                            points.append(point)
+                    elif entity.wkbType() == 1:
+                        points.append(entity.asPoint())
+                    else:
+                        print(entity.wkbType())
+
+                distances = [referencepoint.distance(point) for point in points]
+
+                # print(points,'\n')
+                # print(distances,'\n')
+
+                return True, pointXY_to_geometry(
+                    points[distances.index(min(distances))]
+                )
+
+    else:
+        # if there's no intersection point it's because the vector length big isn't enough in order to make it, so we need to enlarge that vector
+        return False, None
+
+
+def interpolate_by_percent(inputline, percent):
+    len = inputline.length()
+
+    len_at_perc = (len / 100) * percent
+
+    return inputline.interpolate(len_at_perc)
+
+
+def get_bbox4326_currCRS(inputbbox, current_crs):
+    # thx: https://kartoza.com/en/blog/how-to-quickly-transform-a-bounding-box-from-one-crs-to-another-using-qgis/
+    dest_crs = QgsCoordinateReferenceSystem(current_crs)
+    source_crs = QgsCoordinateReferenceSystem("EPSG:4326")
+
+    transformer = QgsCoordinateTransform(source_crs, dest_crs, QgsProject.instance())
+
+    return transformer.transformBoundingBox(inputbbox)
+
+
+def ring_turning_angles(ring_coords):
+    """
+    the angles (in degrees, 0-360) at every vertex of a ring, all at once
+
+    "ring_coords" is a sequence of (x,y) pairs without the repeated closing vertex;
+    same convention of QgsGeometryUtils.angleBetweenThreePoints (previous, current, next)
+    """
+
+    n = len(ring_coords)
+
+    if n < 3:
+        return []
+
+    xs = [coord[0] for coord in ring_coords]
+    ys = [coord[1] for coord in ring_coords]
+
+    # the previous and next vertex of each one, as shifted "arrays"
+    xs_prev, ys_prev = xs[-1:] + xs[:-1], ys[-1:] + ys[:-1]
+    xs_next, ys_next = xs[1:] + xs[:1], ys[1:] + ys[:1]
+
+    two_pi = 2 * pi
+
+    return [
+        ((atan2(yp - y, xp - x) - atan2(yn - y, xn - x)) % two_pi) * (180 / pi)
+        for xp, yp, x, y, xn, yn in zip(xs_prev, ys_prev, xs, ys, xs_next, ys_next)
+    ]
+
+
+def ring_corner_vertices(ring_coords, minC_angle=160, maxC_angle=200):
+    """
+    keeping only the actual corners of a ring: vertices whose angle is not between "minC_angle" and "maxC_angle"
+    """
+
+    angles = ring_turning_angles(ring_coords)
+
+    return [
+        QgsPointXY(*coord)
+        for coord, angle in zip(ring_coords, angles)
+        if not (angle > minC_angle and angle < maxC_angle)
+    ]
+
+
+def polygon_outer_ring_coords(inputgeom):
+    """
+    the (x,y) pairs of the outer ring of a polygon geometry, without the repeated closing vertex
+    """
+
+    ring = inputgeom.asPolygon()[0]
+
+    return [(point.x(), point.y()) for point in ring[:-1]]
+
+
+def select_vertex_pol_nodes(inputpolygonfeature, minC_angle=160, maxC_angle=200):
+    # there are some points at protoblocks that are irrelevant, i.e. they're not actual corners
+
+    return ring_corner_vertices(
+        polygon_outer_ring_coords(inputpolygonfeature.geometry()),
+        minC_angle,
+        maxC_angle,
+    )
+
+
+def protoblocks_corner_vertices(inputlayer, minC_angle=160, maxC_angle=200):
+    """
+    the corner vertices of every polygon of the layer, computed only once per feature
+
+    Returns
+    -------
+    dict
+        {feature id: [QgsPointXY]}
+    """
+
+    return {
+        feature.id(): ring_corner_vertices(
+            polygon_outer_ring_coords(feature.geometry()), minC_angle, maxC_angle
+        )
+        for feature in inputlayer.getFeatures()
+    }
 
-                points = []
 
-                for entity in as_geomcollection:
-                    if entity.wkbType() == 2:
-                        for point in entity.asPolyline():
-                            points.append(point)
-                    elif entity.wkbType() == 1:
-                        points.append(entity.asPoint())
-                    else:
-                        print(entity.wkbType())
+def incidence_mapping_layers_A_B(inputlayer, incident_layer, with_lengths=False):
+    """
+    sparse incidence between two layers, as a single spatial join
 
-                distances = [referencepoint.distance(point) for point in points]
+    each feature of "inputlayer" is prepared once and tested only against the
+    spatial index candidates from "incident_layer" (not disjoint = incident)
 
-                # print(points,'\n')
-                # print(distances,'\n')
+    Parameters
+    ----------
+    inputlayer : QgsVectorLayer
+        the layer whose features are the keys (e.g. protoblocks)
+    incident_layer : QgsVectorLayer
+        the layer whose features are tested against (e.g. sidewalks)
+    with_lengths : bool
+        if True, the values are dicts of {incident id: incident length}
 
-                return True, pointXY_to_geometry(
-                    points[distances.index(min(distances))]
-                )
+    Returns
+    -------
+    dict
+        {inputlayer feature id: [incident ids]} (or dicts, see "with_lengths"),
+        every feature of "inputlayer" is a key, even if nothing is incident
+    """
 
-    else:
-        # if there's no intersection point it's because the vector length big isn't enough in order to make it, so we need to enlarge that vector
-        return False, None
+    index = gen_layer_spatial_index(incident_layer)
 
+    ret_dict = {}
 
-def interpolate_by_percent(inputline, percent):
-    len = inputline.length()
+    for feature in inputlayer.getFeatures():
 
-    len_at_perc = (len / 100) * percent
+        featuregeom = feature.geometry()
 
-    return inputline.interpolate(len_at_perc)
+        incidents = {} if with_lengths else []
 
+        candidate_ids = index.intersects(featuregeom.boundingBox())
 
-def get_bbox4326_currCRS(inputbbox, current_crs):
-    # thx: https://kartoza.com/en/blog/how-to-quickly-transform-a-bounding-box-from-one-crs-to-another-using-qgis/
-    dest_crs = QgsCoordinateReferenceSystem(current_crs)
-    source_crs = QgsCoordinateReferenceSystem("EPSG:4326")
+        if candidate_ids:
+            # thx: https://gis.stackexchange.com/a/396393/49900
+            engine = QgsGeometry.createGeometryEngine(featuregeom.constGet())
+            engine.prepareGeometry()
 
-    transformer = QgsCoordinateTransform(source_crs, dest_crs, QgsProject.instance())
+            for id in sorted(candidate_ids):
+                tested_geom = index.geometry(id)
 
-    return transformer.transformBoundingBox(inputbbox)
+                # with not disjointed one can go back and forth
+                if not engine.disjoint(tested_geom.constGet()):
+                    if with_lengths:
+                        incidents[id] = tested_geom.length()
+                    else:
+                        incidents.append(id)
 
+        ret_dict[feature.id()] = incidents
 
-def select_vertex_pol_nodes(inputpolygonfeature, minC_angle=160, maxC_angle=200):
-    # there are some points at protoblocks that are irrelevant, i.e. they're not actual corners
+    return ret_dict
 
-    polygon_vertex_list = inputpolygonfeature.geometry().asPolygon()[0]
-    del polygon_vertex_list[-1]  # as the polygon list repeats the first node
 
-    centroid = inputpolygonfeature.geometry().centroid()  # .asPoint()
-    # print(centroid)
-    prev_size = len(polygon_vertex_list)
+def points_by_polygon(polygon_layer, points_geom):
+    """
+    assigning the points of a (multi)point geometry to the polygons of a layer, with a single spatial index
+
+    Returns
+    -------
+    dict
+        {polygon feature id: [QgsPointXY]}, every polygon is a key
+    """
 
-    # anglelist = []
+    if points_geom.isMultipart():
+        points = points_geom.asMultiPoint()
+    elif not points_geom.isEmpty():
+        points = [points_geom.asPoint()]
+    else:
+        points = []
 
-    idx_to_remove = []
+    index = QgsSpatialIndex()
 
-    for i, node in enumerate(polygon_vertex_list):
+    for i, point in enumerate(points):
+        index.addFeature(i, QgsGeometry.fromPointXY(point).boundingBox())
 
-        prev = i - 1
-        next = i + 1
+    ret_dict = {}
 
-        if i == len(polygon_vertex_list) - 1:
-            next = 0
+    for feature in polygon_layer.getFeatures():
+        featuregeom = feature.geometry()
 
-        pA = polygon_vertex_list[prev]
-        pB = node
-        pC = polygon_vertex_list[next]
+        candidate_ids = index.intersects(featuregeom.boundingBox())
 
-        angle = QgsGeometryUtils.angleBetweenThreePoints(*pA, *pB, *pC) * (180 / pi)
+        contained = []
 
-        # print(pA,pB,pC)
+        if candidate_ids:
+            engine = QgsGeometry.createGeometryEngine(featuregeom.constGet())
+            engine.prepareGeometry()
 
-        if angle > minC_angle and angle < maxC_angle:
-            idx_to_remove.append(i)
+            contained = [
+                points[i]
+                for i in sorted(candidate_ids)
+                if engine.intersects(QgsPoint(points[i]))
+            ]
 
-        # anglelist.append(int(angle))
+        ret_dict[feature.id()] = contained
 
-    for idx in sorted(idx_to_remove, reverse=True):
-        # TODO: a missing thx here!!!
-        del polygon_vertex_list[idx]
+    return ret_dict
 
-    return polygon_vertex_list
 
-    # print(prev_size,len(polygon_vertex_list))
+def clipped_voronoi_cells(pointlist, polygon_geom):
+    """
+    the voronoi cells of a list of QgsPointXY, clipped by the polygon they belong to
 
-    # for i,node in enumerate(polygon_vertex_list):
+    cells completely inside the polygon are kept as they are, without an intersection
+    """
 
-    #     prev = i-1
-    #     next = i+1
+    voronoi_polygons = QgsGeometry.fromMultiPointXY(pointlist).voronoiDiagram(
+        polygon_geom
+    )
 
-    #     if i == len(polygon_vertex_list)-1:
-    #         next = 0
+    engine = QgsGeometry.createGeometryEngine(polygon_geom.constGet())
+    engine.prepareGeometry()
 
-    #     pA = polygon_vertex_list[prev]
-    #     pB = node
-    #     pC = polygon_vertex_list[next]
+    ret_list = []
 
-    #     angle = QgsGeometryUtils.angleBetweenThreePoints(*pA,*pB,*pC) * (180/pi)
+    for polygon in voronoi_polygons.asGeometryCollection():
+        if engine.contains(polygon.constGet()):
+            ret_list.append(polygon)
+        else:
+            ret_list.append(polygon_geom.intersection(polygon))
 
-    #     print(angle)
+    return ret_list
 
 
 def create_incidence_field_layers_A_B(
@@ -1432,37 +2800,164 @@ def create_incidence_field_layers_A_B(
     else:
         field_id = create_new_layerfield(inputlayer, fieldname, QVariant.String)
 
-    index = QgsSpatialIndex(incident_layer.getFeatures())
+    incidence = incidence_mapping_layers_A_B(
+        inputlayer, incident_layer, with_lengths=total_length_instead
+    )
 
-    with edit(inputlayer):
+    if total_length_instead:
+        values_by_id = {
+            feature_id: sum(incidents.values())
+            for feature_id, incidents in incidence.items()
+        }
+    else:
+        values_by_id = {
+            feature_id: " ".join(str(id) for id in incidents)
+            for feature_id, incidents in incidence.items()
+        }
 
-        for feature in inputlayer.getFeatures():
+    write_layer_column(inputlayer, field_id, values_by_id)
+
+    return field_id
 
-            contained_list = []
-            sum = 0
 
-            intersecting_ids = index.intersects(feature.geometry().boundingBox())
+def clipped_lengths_by_polygon(polygon_layer, line_layer):
+    """
+    the length of the lines inside each polygon, clipped by it (a line crossing several
+    polygons counts only its part in each one), as a single spatial join
 
-            # for tested_feature in incident_layer.getFeatures():
-            for id in intersecting_ids:
+    each polygon is prepared once; lines completely inside count whole, only the
+    ones crossing the boundary are actually clipped
 
-                tested_feature = incident_layer.getFeature(id)
-                # with not disjointed one can go back and forth
-                if not feature.geometry().disjoint(tested_feature.geometry()):
+    Returns
+    -------
+    dict
+        {polygon feature id: length}, every polygon is a key
+    """
 
-                    if total_length_instead:
-                        sum += tested_feature.geometry().length()
-                    else:
-                        contained_list.append(str(tested_feature.id()))
+    index = gen_layer_spatial_index(line_layer)
 
-            if total_length_instead:
-                inputlayer.changeAttributeValue(feature.id(), field_id, sum)
-            else:
-                inputlayer.changeAttributeValue(
-                    feature.id(), field_id, " ".join(contained_list)
-                )
+    ret_dict = {}
+
+    for feature in polygon_layer.getFeatures():
+        featuregeom = feature.geometry()
+
+        length = 0.0
+
+        candidate_ids = index.intersects(featuregeom.boundingBox())
+
+        if candidate_ids:
+            engine = QgsGeometry.createGeometryEngine(featuregeom.constGet())
+            engine.prepareGeometry()
+
+            for id in candidate_ids:
+                tested_geom = index.geometry(id)
+
+                if engine.contains(tested_geom.constGet()):
+                    length += tested_geom.length()
+                elif engine.intersects(tested_geom.constGet()):
+                    length += featuregeom.intersection(tested_geom).length()
+
+        ret_dict[feature.id()] = length
+
+    return ret_dict
+
+
+def mapped_ratio(length, area):
+    """
+    how much of a protoblock is surrounded by mapped sidewalks of a given total length, in percent:
+    the area of a square with a quarter of the length as side, over the protoblock area
+    """
+
+    if area > 0 and length > 0:
+        return (((length / 4.0) ** 2) / area) * 100.0
+
+    return 0.0
+
+
+def already_mapped_ratios(protoblocks, existing_sidewalks):
+    """
+    the "mapped_ratio" of each protoblock, with the length of the existing sidewalks inside it
+    (see "clipped_lengths_by_polygon")
+    """
+
+    lengths = clipped_lengths_by_polygon(protoblocks, existing_sidewalks)
+
+    return {
+        feature.id(): mapped_ratio(
+            lengths[feature.id()],
+            feature.geometry().area() if feature.hasGeometry() else 0.0,
+        )
+        for feature in protoblocks.getFeatures()
+    }
 
-    return field_id
+
+def filter_already_mapped_protoblocks(
+    protoblocks,
+    existing_sidewalks,
+    cutoff=cutoff_percent_protoblock,
+    ratio_fieldname=None,
+):
+    """
+    removing the protoblocks whose sidewalks are already mapped (see "already_mapped_ratios"),
+    optionally storing the ratios in a field; returns the ids of the removed ones
+    """
+
+    ratios = already_mapped_ratios(protoblocks, existing_sidewalks)
+
+    if ratio_fieldname:
+        field_id = create_new_layerfield(protoblocks, ratio_fieldname, QVariant.Double)
+        write_layer_column(protoblocks, field_id, ratios)
+
+    removed_ids = [feature_id for feature_id, ratio in ratios.items() if ratio > cutoff]
+
+    if removed_ids:
+        protoblocks.dataProvider().deleteFeatures(removed_ids)
+        protoblocks.updateExtents()
+
+    return removed_ids
+
+
+def protoblocks_around(protoblocks, geometries, halo=1):
+    """
+    the protoblocks touched by some geometries (e.g. edited streets) and the ones around them:
+    "halo" rings of neighbors, each one with the protoblocks touching the previous ring
+
+    Returns
+    -------
+    tuple
+        (set of the touched protoblock ids, set of the ids of their neighbors within the halo)
+    """
+
+    index = gen_layer_spatial_index(protoblocks)
+
+    def touched_by(geom):
+        engine = QgsGeometry.createGeometryEngine(geom.constGet())
+        engine.prepareGeometry()
+
+        return {
+            id
+            for id in index.intersects(geom.boundingBox())
+            if not engine.disjoint(index.geometry(id).constGet())
+        }
+
+    core_ids = set()
+
+    for geom in geometries:
+        core_ids |= touched_by(geom)
+
+    halo_ids = set()
+    ring = core_ids
+
+    for _ in range(halo):
+        neighbors = set()
+
+        for id in ring:
+            neighbors |= touched_by(index.geometry(id))
+
+        ring = neighbors - core_ids - halo_ids
+        halo_ids |= ring
+
+    return core_ids, halo_ids
 
 
 def pointlist_to_multipoint(inputpointgeomlist):
@@ -1558,20 +3053,96 @@ def rejoin_splitted_lines(
     )
 
 
+def features_adapted_to_layer(inputlayer, featlist):
+    """
+    copies of the features with the layer's single/multi geometry type and its attribute count
+    """
+
+    as_multi = QgsWkbTypes.isMultiType(inputlayer.wkbType())
+    fields = inputlayer.fields()
+    n_fields = fields.count()
+
+    ret_list = []
+
+    for feature in featlist:
+        geom = QgsGeometry(feature.geometry())
+
+        if as_multi and not geom.isMultipart():
+            geom.convertToMultiType()
+        elif not as_multi and geom.isMultipart():
+            geom.convertToSingleType()
+
+        attrs = feature.attributes()[:n_fields]
+        attrs += [None] * (n_fields - len(attrs))
+
+        new_feature = QgsFeature(fields)
+        new_feature.setGeometry(geom)
+        new_feature.setAttributes(attrs)
+
+        ret_list.append(new_feature)
+
+    return ret_list
+
+
 def swap_features_layer_another(inputdesiredlayer, layer_with_newfeatures):
     """
     swapping features, presuming same type and same fields
+
+    done directly at the provider, in bulk (truncate/deleteFeatures and a single addFeatures),
+    so there's no edit buffer nor undo stack involved
+    """
+
+    provider = inputdesiredlayer.dataProvider()
+
+    # first deleting all features (not every provider supports truncating)
+    if not provider.truncate():
+        provider.deleteFeatures(inputdesiredlayer.allFeatureIds())
+
+    # then inserting from the other
+    provider.addFeatures(
+        features_adapted_to_layer(
+            inputdesiredlayer, layer_with_newfeatures.getFeatures()
+        )
+    )
+
+    inputdesiredlayer.updateExtents()
+    inputdesiredlayer.triggerRepaint()
+
+
+def feature_ids_in_region(inputlayer, region_geom, within=False):
+    """
+    ids of the features intersecting (or within, see "within") a region, with a single prepared geometry
+    """
+
+    engine = QgsGeometry.createGeometryEngine(region_geom.constGet())
+    engine.prepareGeometry()
+
+    test = engine.contains if within else engine.intersects
+
+    request = QgsFeatureRequest().setFilterRect(region_geom.boundingBox())
+
+    return [
+        feature.id()
+        for feature in inputlayer.getFeatures(request)
+        if feature.hasGeometry() and test(feature.geometry().constGet())
+    ]
+
+
+def patch_features(inputlayer, removed_ids, featlist):
+    """
+    replacing some features of a layer by others, like "swap_features_layer_another"
+    but just for a part of the layer: in place and in bulk, at the provider
     """
 
-    with edit(inputdesiredlayer):
+    provider = inputlayer.dataProvider()
 
-        # first deleting all features
-        for old_feature in inputdesiredlayer.getFeatures():
-            inputdesiredlayer.deleteFeature(old_feature.id())
+    if removed_ids:
+        provider.deleteFeatures(list(removed_ids))
 
-        # then inserting from the other
-        for new_feature in layer_with_newfeatures.getFeatures():
-            inputdesiredlayer.addFeature(new_feature)
+    provider.addFeatures(features_adapted_to_layer(inputlayer, featlist))
+
+    inputlayer.updateExtents()
+    inputlayer.triggerRepaint()
 
 
 def read_json(inputpath):
@@ -1586,24 +3157,266 @@ def dump_json(inputdict, outputpath):
         json.dump(inputdict, json_handle)
 
 
-def merge_geojsons(input_pathlist, outputpath):
+def stable_order_request(inputlayer, key_fields=output_sort_fields, decimals=7):
+    """
+    a request for the features in an order that doesn't depend on the feature ids:
+    by the "key_fields" present in the layer, then by the geometry (as rounded WKT)
+    """
+
+    clauses = [
+        QgsFeatureRequest.OrderByClause(QgsExpression.quotedColumnRef(fieldname))
+        for fieldname in key_fields
+        if inputlayer.fields().indexOf(fieldname) != -1
+    ]
+
+    clauses.append(
+        QgsFeatureRequest.OrderByClause(f"geom_to_wkt($geometry, {decimals})")
+    )
+
+    request = QgsFeatureRequest()
+    request.setOrderBy(QgsFeatureRequest.OrderBy(clauses))
+
+    return request
+
+
+def compact_features(
+    inputlayer,
+    decimals=output_coordinate_decimals,
+    sort_features=True,
+    transform=None,
+):
     """
-    simple function to merge geojsons without using any library.
+    copies of the features, optionally transformed, with the coordinates snapped to a grid of
+    "decimals" places (None to keep them) and in a stable order (see "stable_order_request"),
+    so the same input always gives byte-identical outputs
 
-    Same CRS for all files is assumed.
+    features whose geometry collapses at the grid are dropped
     """
 
-    ref_dict = None
+    if sort_features:
+        request = stable_order_request(
+            inputlayer, decimals=17 if decimals is None else decimals
+        )
+    else:
+        request = QgsFeatureRequest()
 
-    for i, path in enumerate(input_pathlist):
+    for feature in inputlayer.getFeatures(request):
+        geom = QgsGeometry(feature.geometry())
 
-        if i == 0:
-            ref_dict = read_json(path)
+        if transform is not None:
+            geom.transform(transform)
 
-        else:
-            ref_dict["features"] += read_json(path)["features"]
+        if decimals is not None:
+            geom = geom.snappedToGrid(10**-decimals, 10**-decimals)
+
+            if geom.isEmpty():
+                continue
+
+        new_feature = QgsFeature(feature)
+        new_feature.setGeometry(geom)
+
+        yield new_feature
+
+
+def geojson_feature_string(feature, transform=None, precision=17, rfc7946=True):
+    """
+    a single feature as a GeoJSON "Feature" string, optionally transformed
+
+    with "rfc7946", polygon exterior rings are counterclockwise (and the holes clockwise)
+    """
+
+    geom = QgsGeometry(feature.geometry())
+
+    if transform is not None:
+        geom.transform(transform)
+
+    if rfc7946 and geom.type() == QgsWkbTypes.PolygonGeometry:
+        geom.forcePolygonCounterClockwise()
+
+    # not using "QgsJsonExporter", since it adds the feature id, that would be repeated between layers
+    return json.dumps(
+        {
+            "type": "Feature",
+            "properties": json.loads(QgsJsonUtils.exportAttributes(feature)),
+            "geometry": json.loads(geom.asJson(precision)),
+        },
+        ensure_ascii=False,
+    )
+
+
+def write_layers_to_geojson(
+    inputlayers, outputpath, precision=17, rfc7946=True, sort_features=False
+):
+    """
+    streaming the features of many layers into a single GeoJSON FeatureCollection.
+
+    One feature at a time is held in memory, so it can handle large outputs.
+    Layers of different geometry types can be mixed, as GeoJSON supports it (and QGIS layers don't).
+
+    Parameters
+    ----------
+    inputlayers : list of QgsVectorLayer
+        the layers, in the order that their features shall be written
+    outputpath : str
+        path of the GeoJSON file to be (over)written
+    precision : int, optional
+        number of decimal places of the coordinates, by default 17 (no truncation)
+    rfc7946 : bool, optional
+        RFC 7946 compliance, by default True: coordinates in EPSG:4326 and
+        counterclockwise exterior rings. If False, the coordinates are kept in the layers' CRS
+        (that must be the same for all of them), declared by a "crs" member.
+    sort_features : bool, optional
+        write each layer's features in a stable order (see "stable_order_request"),
+        by default False (the order of the feature ids)
+
+    Returns
+    -------
+    int
+        the number of written features
+    """
+
+    n_features = 0
+
+    with open(outputpath, "w", encoding="utf-8") as writer:
+        writer.write('{\n"type": "FeatureCollection",\n')
+
+        if not rfc7946 and inputlayers:
+            crs_urn = (
+                f"urn:ogc:def:crs:{inputlayers[0].crs().authid().replace(':', '::')}"
+            )
+            writer.write(
+                f'"crs": {{ "type": "name", "properties": {{ "name": "{crs_urn}" }} }},\n'
+            )
+
+        writer.write('"features": [\n')
+
+        for layer in inputlayers:
+            transform = None
+
+            if rfc7946 and layer.crs() != crs_4326:
+                transform = QgsCoordinateTransform(
+                    layer.crs(), crs_4326, QgsProject.instance()
+                )
+
+            if sort_features:
+                request = stable_order_request(layer, decimals=precision)
+            else:
+                request = QgsFeatureRequest()
+
+            for feature in layer.getFeatures(request):
+                if not feature.hasGeometry():
+                    continue
+
+                if n_features:
+                    writer.write(",\n")
+
+                writer.write(
+                    geojson_feature_string(feature, transform, precision, rfc7946)
+                )
+
+                n_features += 1
+
+        writer.write("\n]\n}\n")
+
+    return n_features
+
+
+def export_layer(
+    inputlayer,
+    outputpath,
+    layername=None,
+    output_format="GeoJSON",
+    destination_crs=crs_4326,
+    decimals=None,
+    sort_features=False,
+):
+    """
+    writes the layer (reprojected) to a file of one of the "output_formats" (see parameters.py)
+
+    For GeoPackage, many layers can go to the same file, each one with its own "layername".
+    FlatGeobuf files are written with their spatial index.
+    With "decimals" and/or "sort_features" the written features are the "compact_features".
+
+    Returns
+    -------
+    str
+        the path of the written file
+    """
+
+    _, driver_name = output_formats[output_format]
+
+    options = QgsVectorFileWriter.SaveVectorOptions()
+    options.driverName = driver_name
+    options.fileEncoding = "UTF-8"
+    transform = QgsCoordinateTransform(
+        inputlayer.crs(), destination_crs, QgsProject.instance()
+    )
+
+    if decimals is not None or sort_features:
+        # an already transformed copy, in the order of its feature ids
+        compacted = inprocess_geometry_ops.memory_layer(
+            inputlayer.wkbType(),
+            inputlayer.fields(),
+            destination_crs,
+            inputlayer.name(),
+        )
+        compacted.dataProvider().addFeatures(
+            list(compact_features(inputlayer, decimals, sort_features, transform))
+        )
+        inputlayer = compacted
+    else:
+        options.ct = transform
+
+    if layername:
+        options.layerName = layername
+
+    # adding a layer to an already existing GeoPackage, instead of overwriting the file
+    if output_format == "GeoPackage" and os.path.exists(outputpath):
+        options.actionOnExistingFile = QgsVectorFileWriter.CreateOrOverwriteLayer
+
+    if output_format == "FlatGeobuf":
+        options.layerOptions = ["SPATIAL_INDEX=YES"]
+
+    error, error_message, written_path, _ = QgsVectorFileWriter.writeAsVectorFormatV3(
+        inputlayer, outputpath, QgsProject.instance().transformContext(), options
+    )
+
+    if error != QgsVectorFileWriter.NoError:
+        raise QgsProcessingException(
+            f"Could not write {outputpath} ({output_format}): {error_message}"
+        )
+
+    return written_path or outputpath
+
+
+def output_filepath(folderpath, filename, output_format="GeoJSON"):
+    """
+    path of an output file, with the extension of the format
+    """
+
+    extension, _ = output_formats[output_format]
+
+    return os.path.join(folderpath, f"{filename}.{extension}")
+
+
+def sink_destination(outputpath, layername, output_format="GeoJSON"):
+    """
+    a processing sink destination for one of the "output_formats", derived from "outputpath"
+
+    GeoPackage destinations point to a table inside the same file, so many sinks
+    (e.g. sidewalks, crossings and kerbs) end in a single GeoPackage
+    """
+
+    if outputpath.startswith("memory:"):
+        return outputpath
+
+    extension, _ = output_formats[output_format]
+    root = os.path.splitext(outputpath)[0]
+
+    if output_format == "GeoPackage":
+        return f"ogr:dbname='{root}.{extension}' table=\"{layername}\" (geom)"
 
-    dump_json(ref_dict, outputpath)
+    return f"{root}.{extension}"
 
 
 def write_generic_file(outpath: str, inputlist: list, mode="w+"):
@@ -1800,4 +3613,4 @@ def assign_street_widths(source_road_layer, output_layer_name, feedback=None):
             f"Processed street widths. Input: {source_road_layer.featureCount()} features, Output: {output_layer.featureCount()} features."
         )
 
-    return output_layer
+    return inherit_geometry_validity(output_layer, source_road_layer)
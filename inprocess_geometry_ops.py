@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+
+"""
+In-process counterparts of some processing.run wrappers from generic_functions.
+
+They operate directly on the layer geometries (QgsGeometry/GEOS calls), skipping
+algorithm lookup, parameter validation and context creation, which dominate the
+cost for small intermediate layers. Same arguments as the generic_functions
+helpers (except "outputlayer": the output is always a memory layer), and output
+geometry types mirroring the respective processing algorithm.
+
+The choice between both is made at generic_functions (see "use_inprocess_backend").
+"""
+
+from qgis.core import (
+    Qgis,
+    QgsFeature,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsPointXY,
+    QgsSpatialIndex,
+    QgsVectorLayer,
+    QgsWkbTypes,
+)
+
+
+def memory_layer(wkbtype, fields, crs, layername="output"):
+    ret_layer = QgsVectorLayer(QgsWkbTypes.displayString(wkbtype), layername, "memory")
+
+    ret_layer.dataProvider().addAttributes(fields)
+    ret_layer.updateFields()
+
+    ret_layer.setCrs(crs)
+
+    return ret_layer
+
+
+def add_features_from_geoms(outputlayer, geoms_attrs_list):
+    """
+    filling the layer with a list of (geometry, attributes list) in a single provider call,
+    converting each geometry to the layer's single/multi type
+    """
+
+    as_multi = QgsWkbTypes.isMultiType(outputlayer.wkbType())
+
+    featlist = []
+
+    for geom, attrs in geoms_attrs_list:
+        if geom is None or geom.isEmpty():
+            continue
+
+        geom = QgsGeometry(geom)
+
+        if as_multi:
+            geom.convertToMultiType()
+
+        feature = QgsFeature(outputlayer.fields())
+        feature.setGeometry(geom)
+        feature.setAttributes(attrs)
+
+        featlist.append(feature)
+
+    outputlayer.dataProvider().addFeatures(featlist)
+    outputlayer.updateExtents()
+
+    return outputlayer
+
+
+def same_dimension_parts(geom, geometry_type):
+    """
+    only the parts of a (possibly collection) geometry with the desired geometry type (point, line, polygon)
+    """
+
+    if geom.type() == geometry_type and not geom.isNull():
+        if QgsWkbTypes.flatType(geom.wkbType()) != QgsWkbTypes.GeometryCollection:
+            return geom
+
+    parts = [
+        part for part in geom.asGeometryCollection() if part.type() == geometry_type
+    ]
+
+    if not parts:
+        return None
+
+    return QgsGeometry.collectGeometry(parts)
+
+
+def generate_buffer(
+    inputlayer,
+    distance,
+    segments=5,
+    dissolve=True,
+    cap_style="FLAT",
+    join_style="ROUND",
+):
+    # same codes of "native:buffer", shifted by one in the Qgis enums
+    cap_styles = {"ROUND": 1, "FLAT": 2, "SQUARE": 3}
+    join_styles = {"ROUND": 1, "MITER": 2, "BEVEL": 3}
+
+    end_cap = Qgis.EndCapStyle(cap_styles.get(cap_style.upper(), 1))
+    join = Qgis.JoinStyle(join_styles.get(join_style.upper(), 1))
+
+    geoms_attrs_list = [
+        (
+            feature.geometry().buffer(distance, segments, end_cap, join, 2),
+            feature.attributes(),
+        )
+        for feature in inputlayer.getFeatures()
+    ]
+
+    if dissolve and geoms_attrs_list:
+        geoms_attrs_list = [
+            (
+                QgsGeometry.unaryUnion([geom for geom, _ in geoms_attrs_list]),
+                geoms_attrs_list[0][1],
+            )
+        ]
+
+    ret_layer = memory_layer(
+        QgsWkbTypes.MultiPolygon, inputlayer.fields(), inputlayer.crs(), "Buffered"
+    )
+
+    return add_features_from_geoms(ret_layer, geoms_attrs_list)
+
+
+def dissolve_tosinglegeom(inputlayer):
+    geoms = []
+    first_attrs = None
+
+    for feature in inputlayer.getFeatures():
+        if first_attrs is None:
+            first_attrs = feature.attributes()
+
+        if feature.hasGeometry():
+            geoms.append(feature.geometry())
+
+    ret_layer = memory_layer(
+        QgsWkbTypes.multiType(inputlayer.wkbType()),
+        inputlayer.fields(),
+        inputlayer.crs(),
+        "Dissolved",
+    )
+
+    if first_attrs is None:
+        return ret_layer
+
+    dissolved = QgsGeometry.unaryUnion(geoms)
+
+    if dissolved.type() == QgsWkbTypes.LineGeometry:
+        dissolved = dissolved.mergeLines()
+
+    return add_features_from_geoms(ret_layer, [(dissolved, first_attrs)])
+
+
+def merge_touching_lines(inputlayer):
+    geoms_attrs_list = [
+        (feature.geometry().mergeLines(), feature.attributes())
+        for feature in inputlayer.getFeatures()
+        if feature.hasGeometry()
+    ]
+
+    ret_layer = memory_layer(
+        QgsWkbTypes.MultiLineString, inputlayer.fields(), inputlayer.crs(), "Merged"
+    )
+
+    return add_features_from_geoms(ret_layer, geoms_attrs_list)
+
+
+def convert_multipart_to_singleparts(inputlayer):
+    geoms_attrs_list = []
+
+    for feature in inputlayer.getFeatures():
+        geom = feature.geometry()
+
+        if geom.isMultipart():
+            geoms_attrs_list += [
+                (part, feature.attributes()) for part in geom.asGeometryCollection()
+            ]
+        else:
+            geoms_attrs_list.append((geom, feature.attributes()))
+
+    ret_layer = memory_layer(
+        QgsWkbTypes.singleType(inputlayer.wkbType()),
+        inputlayer.fields(),
+        inputlayer.crs(),
+        "Single parts",
+    )
+
+    return add_features_from_geoms(ret_layer, geoms_attrs_list)
+
+
+def combined_fields(input_fields, overlay_fields):
+    """
+    input fields followed by the overlay ones, renaming repeated names like processing does ("_2")
+    """
+
+    ret_fields = QgsFields(input_fields)
+
+    for field in overlay_fields:
+        field = QgsField(field)
+
+        if ret_fields.lookupField(field.name()) != -1:
+            field.setName(f"{field.name()}_2")
+
+        ret_fields.append(field)
+
+    return ret_fields
+
+
+def vec_layers_intersection(inputlayer, overlay_layer):
+    geometry_type = QgsWkbTypes.geometryType(inputlayer.wkbType())
+
+    index = QgsSpatialIndex(
+        overlay_layer.getFeatures(), flags=QgsSpatialIndex.FlagStoreFeatureGeometries
+    )
+
+    overlay_attrs = {
+        feature.id(): feature.attributes() for feature in overlay_layer.getFeatures()
+    }
+
+    geoms_attrs_list = []
+
+    for feature in inputlayer.getFeatures():
+        geom = feature.geometry()
+
+        candidate_ids = index.intersects(geom.boundingBox())
+
+        if not candidate_ids:
+            continue
+
+        engine = QgsGeometry.createGeometryEngine(geom.constGet())
+        engine.prepareGeometry()
+
+        for id in sorted(candidate_ids):
+            overlay_geom = index.geometry(id)
+
+            if not engine.intersects(overlay_geom.constGet()):
+                continue
+
+            intersection = same_dimension_parts(
+                geom.intersection(overlay_geom), geometry_type
+            )
+
+            if intersection is not None:
+                geoms_attrs_list.append(
+                    (intersection, feature.attributes() + overlay_attrs[id])
+                )
+
+    ret_layer = memory_layer(
+        QgsWkbTypes.multiType(inputlayer.wkbType()),
+        combined_fields(inputlayer.fields(), overlay_layer.fields()),
+        inputlayer.crs(),
+        "Intersection",
+    )
+
+    return add_features_from_geoms(ret_layer, geoms_attrs_list)
+
+
+def compute_difference_layer(inputlayer, overlaylayer):
+    geometry_type = QgsWkbTypes.geometryType(inputlayer.wkbType())
+
+    index = QgsSpatialIndex(
+        overlaylayer.getFeatures(), flags=QgsSpatialIndex.FlagStoreFeatureGeometries
+    )
+
+    geoms_attrs_list = []
+
+    for feature in inputlayer.getFeatures():
+        geom = feature.geometry()
+
+        candidate_ids = index.intersects(geom.boundingBox())
+
+        if candidate_ids:
+            engine = QgsGeometry.createGeometryEngine(geom.constGet())
+            engine.prepareGeometry()
+
+            overlapping = [
+                index.geometry(id)
+                for id in sorted(candidate_ids)
+                if engine.intersects(index.geometry(id).constGet())
+            ]
+
+            if overlapping:
+                geom = same_dimension_parts(
+                    geom.difference(QgsGeometry.unaryUnion(overlapping)),
+                    geometry_type,
+                )
+
+        if geom is not None:
+            geoms_attrs_list.append((geom, feature.attributes()))
+
+    ret_layer = memory_layer(
+        QgsWkbTypes.multiType(inputlayer.wkbType()),
+        inputlayer.fields(),
+        inputlayer.crs(),
+        "Difference",
+    )
+
+    return add_features_from_geoms(ret_layer, geoms_attrs_list)
+
+
+def polygonize_lines(inputlines, keepfields=True):
+    lines = [
+        feature.geometry()
+        for feature in inputlines.getFeatures()
+        if feature.hasGeometry()
+    ]
+
+    fields = inputlines.fields() if keepfields else QgsFields()
+
+    ret_layer = memory_layer(QgsWkbTypes.Polygon, fields, inputlines.crs(), "Polygons")
+
+    if not lines:
+        return ret_layer
+
+    # noding the lines before polygonizing, as "native:polygonize" does
+    noded = QgsGeometry.unaryUnion(lines)
+
+    polygons = QgsGeometry.polygonize([noded]).asGeometryCollection()
+
+    return add_features_from_geoms(
+        ret_layer, [(polygon, [None] * fields.count()) for polygon in polygons]
+    )
+
+
+def split_lines(inputlayer, splitterlayer):
+    # the splitting points as distances along each line, then cut by linear referencing
+    from .generic_functions import split_coords_at_distances
+
+    same_layer = inputlayer.id() == splitterlayer.id()
+
+    index = QgsSpatialIndex(
+        splitterlayer.getFeatures(), flags=QgsSpatialIndex.FlagStoreFeatureGeometries
+    )
+
+    geoms_attrs_list = []
+
+    for feature in inputlayer.getFeatures():
+        geom = feature.geometry()
+
+        if geom.isEmpty():
+            continue
+
+        splitters = [
+            index.geometry(id)
+            for id in sorted(index.intersects(geom.boundingBox()))
+            if not (same_layer and id == feature.id())
+        ]
+
+        if geom.isMultipart():
+            parts = [
+                QgsGeometry.fromPolylineXY(part) for part in geom.asMultiPolyline()
+            ]
+        else:
+            parts = [geom]
+
+        for part in parts:
+            cut_points = []
+
+            for splitter in splitters:
+                crossing = part.intersection(splitter)
+
+                if crossing.isEmpty():
+                    continue
+
+                for crossing_part in crossing.asGeometryCollection():
+                    if crossing_part.type() == QgsWkbTypes.PointGeometry:
+                        cut_points.append(crossing_part)
+
+            distances = sorted({part.lineLocatePoint(point) for point in cut_points})
+
+            coords = [(point.x(), point.y()) for point in part.asPolyline()]
+
+            for piece in split_coords_at_distances(coords, distances):
+                geoms_attrs_list.append(
+                    (
+                        QgsGeometry.fromPolylineXY([QgsPointXY(*xy) for xy in piece]),
+                        feature.attributes(),
+                    )
+                )
+
+    ret_layer = memory_layer(
+        QgsWkbTypes.multiType(inputlayer.wkbType()),
+        inputlayer.fields(),
+        inputlayer.crs(),
+        "Split",
+    )
+
+    return add_features_from_geoms(ret_layer, geoms_attrs_list)
@@ -2,23 +2,24 @@
 osm_fetch.py created for import and convert the desired OSM data
 """
 
-import requests, os, time, json, tempfile
+import requests, os, time, json, tempfile, shutil, uuid
 
 # import codecs
 # import geopandas as gpd
 # from geopandas import read_file
-from osgeo import ogr
+from osgeo import gdal, ogr
 import re  # For parsing other_tags
 from itertools import cycle
 
 # from qgis.core import QgsApplication # Keep QgsApplication for now, path logic was adjusted
 try:
-    from qgis.core import QgsApplication
+    from qgis.core import Qgis, QgsApplication, QgsMessageLog
 except ImportError:
     # This allows the module to be imported outside QGIS, e.g. for standalone scripts or tests
     # However, functionality relying on QgsApplication (like profile path) will not work.
     # A default basepath is set below in that case.
     QgsApplication = None
+    QgsMessageLog = None
 
 # doing some stuff again to avoid circular imports:
 # homepath = os.path.expanduser('~')
@@ -52,11 +53,95 @@ def delete_filelist_that_exists(filepathlist):
 
 
 def join_to_a_outfolder(filename, foldername="temporary"):
+    """
+    path at a folder shared by every run, prefer a "ScratchWorkspace" for intermediate files
+    """
     outfolder = os.path.join(basepath, foldername)
     os.makedirs(outfolder, exist_ok=True)
     return os.path.join(outfolder, filename)
 
 
+class ScratchWorkspace:
+    """
+    A per-run folder for the intermediate files, so concurrent runs on the same host don't collide.
+
+    It can be placed on RAM-backed storage: at a tmpfs "parentdir" (e.g. "/dev/shm") or
+    at GDAL's "/vsimem/" ("in_memory"; then files must be written with "write_file" and read through GDAL/OGR,
+    as QGIS "ogr" layers do).
+
+    As a context manager it's removed at the exit, unless an exception happened and
+    "keep_on_failure" is set, so the files can be inspected (reported to "feedback", if given).
+    """
+
+    def __init__(
+        self,
+        prefix="sidewalkreator_",
+        parentdir=None,
+        in_memory=False,
+        keep_on_failure=False,
+        feedback=None,
+    ):
+        self.in_memory = in_memory
+        self.keep_on_failure = keep_on_failure
+        self.feedback = feedback
+
+        if in_memory:
+            self.path = f"/vsimem/{prefix}{uuid.uuid4().hex}"
+        else:
+            if parentdir:
+                os.makedirs(parentdir, exist_ok=True)
+            self.path = tempfile.mkdtemp(prefix=prefix, dir=parentdir)
+
+    def filepath(self, filename):
+        if self.in_memory:
+            return f"{self.path}/{filename}"
+
+        return os.path.join(self.path, filename)
+
+    def write_file(self, filename, content):
+        """
+        writes a text file into the workspace, returning its path
+        """
+        filepath = self.filepath(filename)
+
+        if self.in_memory:
+            gdal.FileFromMemBuffer(filepath, content.encode("utf-8"))
+        else:
+            with open(filepath, "w", encoding="utf-8") as writer:
+                writer.write(content)
+
+        return filepath
+
+    def cleanup(self):
+        if self.in_memory:
+            gdal.RmdirRecursive(self.path)
+        else:
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    def keep(self, feedback=None):
+        """
+        keeping the files of a failed run, reporting where they are (to the processing
+        feedback, if given, otherwise to the QGIS message log)
+        """
+        message = f"Run failed, intermediate files kept at: {self.path}"
+
+        if feedback is not None:
+            feedback.reportError(message)
+        elif QgsMessageLog is not None:
+            QgsMessageLog.logMessage(message, "SidewalKreator", Qgis.Warning)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None and self.keep_on_failure:
+            self.keep(self.feedback)
+        else:
+            self.cleanup()
+
+        return False
+
+
 def osm_query_string_by_bbox(
     min_lat,
     min_lgt,
@@ -121,9 +206,13 @@ def get_osm_data(
     print_response=False,
     timeout=30,
     return_as_string=False,
+    workspace=None,
 ):
     """
     get the osmdata and stores in files or in a geojson string, also generates temporary files
+
+    the files go to "workspace" (a ScratchWorkspace) if given, otherwise to the system's temporary folder
+    (.osm file) and to the shared "temporary" plugin folder (.geojson output)
     """
 
     overpass_url_list = [
@@ -204,11 +293,16 @@ def get_osm_data(
         # Save xml_filecontent to a temporary .osm file
         # delete=False is important because GDAL needs to open it by path.
         # We will manually delete it in the finally block.
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".osm", delete=False, encoding="utf-8"
-        ) as tmp_osm:
-            tmp_osm.write(xml_filecontent)
-            temp_osm_file_path = tmp_osm.name
+        if workspace is not None:
+            temp_osm_file_path = workspace.write_file(
+                tempfilesname + ".osm", xml_filecontent
+            )
+        else:
+            with tempfile.NamedTemporaryFile(
+                mode="w", suffix=".osm", delete=False, encoding="utf-8"
+            ) as tmp_osm:
+                tmp_osm.write(xml_filecontent)
+                temp_osm_file_path = tmp_osm.name
 
         datasource = ogr.Open(temp_osm_file_path)
         if datasource is None:
@@ -312,8 +406,12 @@ def get_osm_data(
             # datasource.Release() # Generally not needed for ogr.Open with Python bindings
             datasource = None
 
-        # Ensure temporary file is deleted
-        if temp_osm_file_path and os.path.exists(temp_osm_file_path):
+        # Ensure temporary file is deleted (the workspace takes care of its own files)
+        if (
+            workspace is None
+            and temp_osm_file_path
+            and os.path.exists(temp_osm_file_path)
+        ):
             try:
                 os.remove(temp_osm_file_path)
             except OSError as e:
@@ -331,6 +429,10 @@ def get_osm_data(
 
     if return_as_string:
         return json.dumps(geojson_datadict)
+    elif workspace is not None:
+        return workspace.write_file(
+            tempfilesname + "_osm.geojson", json.dumps(geojson_datadict)
+        )
     else:
         geojsonfilepath = join_to_a_outfolder(tempfilesname + "_osm.geojson")
         print(
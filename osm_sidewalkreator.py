@@ -25,20 +25,19 @@ Plugin designated to create the Geometries of Sidewalks (separated from streets)
 """
 
 # import os.path
-import os, codecs, time
+import os, codecs
 
 # from os import environ
 
 # standard libraries
 # import codecs # for osm2geojson
 
-from qgis.PyQt.QtCore import QSettings, QTranslator, QCoreApplication
+from qgis.PyQt.QtCore import Qt, QSettings, QTranslator, QCoreApplication
 from qgis.PyQt.QtGui import QIcon
 from qgis.gui import QgsMapLayerComboBox, QgsMapCanvas
 from qgis.PyQt.QtWidgets import QAction
 
 # additional qgis/qt imports:
-from processing.gui.AlgorithmExecutor import execute_in_place
 from qgis.core import (
     QgsMapLayerProxyModel,
     QgsFeature,
@@ -53,6 +52,7 @@ from qgis.core import (
     QgsMessageLog,
     NULL,
     QgsStatisticalSummary,
+    QgsMapLayer,
 )
 from qgis.utils import iface
 
@@ -102,6 +102,14 @@ import math
 
 # # internal dependencies, part1:
 from .generic_functions import *
+from .feature_store import FeatureStore
+from .stage_tasks import StageTask
+from .pipeline import (
+    SidewalkPipeline,
+    PipelineResult,
+    parameter_stages,
+    results_changed_by,
+)
 from .parameters import *
 
 
@@ -170,8 +178,33 @@ class sidewalkreator:
     # if the plugin is ready to export results (avoid the problem when user click again at the plugin icon)
     export_ready = False
 
-    # a pre-declaration
-    already_existing_sidewalks_layer = None
+    # the intermediate results, kept in the pipeline of the current run (see "new_pipeline"):
+    only_inputfeature_layer = PipelineResult("input_polygon")
+    custom_localTM_crs = PipelineResult("crs")
+    clipped_reproj_datalayer = PipelineResult("roads")
+    reproj_buildings = PipelineResult("buildings")
+    reproj_addrs = PipelineResult("addresses")
+    POIs_for_splitting_layer = PipelineResult("splitting_pois")
+    already_existing_sidewalks_layer = PipelineResult("existing_sidewalks")
+    already_existing_crossings_layer = PipelineResult("existing_crossings")
+    protoblocks = PipelineResult("protoblocks")
+    dissolved_protoblocks_0 = PipelineResult("dissolved_protoblocks")
+    dissolved_protoblocks_buff = PipelineResult("dissolved_protoblocks_buffer")
+    splitted_lines = PipelineResult("streets")
+    street_table_widths = PipelineResult("street_table_widths")
+    filtered_intersection_points = PipelineResult("intersections")
+    road_intersection_voronois = PipelineResult("intersection_voronois")
+    whole_sidewalks = PipelineResult("sidewalks")
+    street_width_adjustments = PipelineResult("street_width_adjustments")
+    drawn_street_states = PipelineResult("drawn_streets")
+    proto_undissolved_buffer_step1 = PipelineResult("raw_buffers")
+    exclusion_zones = PipelineResult("exclusion_zones")
+    sure_zones = PipelineResult("sure_zones")
+    dissolved_sidewalks = PipelineResult("dissolved_sidewalks")
+    inner_crossings_layer = PipelineResult("crossing_centers")
+    crossings_layer = PipelineResult("crossings")
+    kerbs_layer = PipelineResult("kerbs")
+    voronois_as_layer = PipelineResult("voronois")
 
     # hint texts:
     en_hint = "Sometimes it's better to\ncorrect errors on OSM data first!"
@@ -208,6 +241,9 @@ class sidewalkreator:
         # Must be set in initGui() to survive plugin reloads
         self.first_start = None
         self.processing_provider = None  # Initialize processing provider attribute
+        self.workspace = None  # scratch workspace of the current run
+        self.stage_task = None  # the stage running in the background, if any
+        self.pipeline = self.new_pipeline()  # stages and intermediate results of the run
 
         ###############################################
         ####    My code on __init__
@@ -390,6 +426,16 @@ class sidewalkreator:
                 traceback.print_exc()  # Keep traceback for this
         self.processing_provider = None
 
+        # a stage still running in the background
+        if self.stage_task is not None:
+            self.stage_task.cancel()
+            self.stage_task = None
+
+        # intermediate files of the last run
+        if self.workspace is not None:
+            self.workspace.cleanup()
+            self.workspace = None
+
     def run(self):
         """Run method that performs all the real work"""
 
@@ -426,6 +472,7 @@ class sidewalkreator:
                 self.reset_fields
             )
             self.dlg.button_box.button(QDialogButtonBox.Ok).setEnabled(False)
+            self.dlg.finished.connect(self.dialog_finished)
 
             # language stuff
             self.dlg.opt_ptbr.clicked.connect(self.change_language_ptbr)
@@ -445,18 +492,24 @@ class sidewalkreator:
         for folderpath in basic_folderpathlist:
             create_dir_ifnotexists(folderpath)
 
-        # show the dialog
+        # show the dialog, not modal: the stages run in the background and
+        # QGIS (the canvas, namely) shall stay usable meanwhile
         self.dlg.show()
-        # Run the dialog event loop
-        result = self.dlg.exec_()
-        # See if OK was pressed
+        self.dlg.raise_()
+        self.dlg.activateWindow()
+
+    def dialog_finished(self, result):
+        """
+        the dialog was closed, by "OK" if "result" is set
+        """
         if result:
             self.ok_ready = True
 
             if self.export_ready:
+                # it resets the fields itself, once the files are written
                 self.outputting_files()
-
-            self.reset_fields()  # so "rebooting" for next execution
+            else:
+                self.reset_fields()  # so "rebooting" for next execution
 
     ##################################
     ##### THE CLASS SCOPE
@@ -468,16 +521,32 @@ class sidewalkreator:
 
     def add_layer_canvas(self, layer):
         # canvas = QgsMapCanvas()
+        # a re-run may add again a layer that is still there
+        if QgsProject.instance().mapLayer(layer.id()):
+            return
+
         QgsProject.instance().addMapLayer(layer)
         QgsMapCanvas().setExtent(layer.extent())
         # canvas.setLayerSet([QgsMapCanvasLayer(layer)])
 
     def remove_layer_canvas(self, layername):
         # canvas = QgsMapCanvas()
-        id = QgsProject.instance().mapLayersByName(layername)[0]
-        QgsProject.instance().removeMapLayer(id)
+        layers = QgsProject.instance().mapLayersByName(layername)
+
+        if layers:
+            QgsProject.instance().removeMapLayer(layers[0])
         # canvas.setLayerSet([QgsMapCanvasLayer(layer)])
 
+    def take_layer_off_canvas(self, layer):
+        """
+        removing a layer from the project without deleting it, as the pipeline still holds it
+        """
+
+        if isinstance(layer, QgsMapLayer) and QgsProject.instance().mapLayer(
+            layer.id()
+        ):
+            QgsProject.instance().takeMapLayer(layer)
+
     def change_language_ptbr(self):
         self.current_lang = "ptbr"
 
@@ -629,23 +698,7 @@ class sidewalkreator:
     def data_clean(self):
 
         # getting table values, before table deactivation
-        highway_valuestable_dict = {}
-
-        for i, val in enumerate(self.unique_highway_values):
-            # self.dlg.higway_values_table
-            try:
-                width_value = float(self.dlg.higway_values_table.item(i, 1).text())
-            except:
-                # if the user input value not convertible to float, just use the value from
-                print(
-                    "invalid input value: ",
-                    self.dlg.higway_values_table.item(i, 1).text(),
-                    ", using default: ",
-                    default_widths.get(val, fallback_default_width),
-                )
-                width_value = default_widths.get(val, fallback_default_width)
-
-            highway_valuestable_dict[val] = width_value
+        params = self.stage_parameters()
 
         # disabling what should not be used afterwards
         self.dlg.clean_data.setEnabled(False)
@@ -653,9 +706,21 @@ class sidewalkreator:
         self.dlg.dead_end_iters_box.setEnabled(False)
         self.dlg.higway_values_table.setEnabled(False)
 
+        self.run_stage(
+            self.string_according_language("Cleaning data", "Limpando dados"),
+            ("clean", "protoblocks"),
+            params,
+        )
+
+    def data_clean_work(self, params, feedback):
+        """
+        the part of "data_clean" running in the background
+        """
+
         # removing undesired tag values:
         ids_to_delete_in_clipped_layer = set()  # Use a set to avoid duplicate IDs
-        values_for_deletion_criteria = set()
+        # the values with width < 0.5 in the table:
+        values_for_deletion_criteria = set(params["removed_highway_values"])
 
         for value in self.unique_highway_values:
             # Check for existing sidewalks and crossings first, regardless of width criteria
@@ -694,10 +759,6 @@ class sidewalkreator:
                 else:
                     self.already_existing_crossings_layer = None  # Ensure it's None
 
-            # Accumulate values that meet the deletion criteria (width < 0.5)
-            if highway_valuestable_dict.get(value, float("inf")) < 0.5:
-                values_for_deletion_criteria.add(value)
-
         # Now, iterate once through the layer to collect IDs for deletion
         if values_for_deletion_criteria:
             field_idx = self.clipped_reproj_datalayer.fields().lookupField(highway_tag)
@@ -720,6 +781,13 @@ class sidewalkreator:
         # self.add_layer_canvas(self.already_existing_sidewalks_layer) # Conditional add if layer exists
         # self.add_layer_canvas(self.already_existing_crossings_layer) # Conditional add
 
+    def protoblocks_work(self, params, feedback):
+        """
+        the protoblocks, and the street segments bounding them (also a part of "data_clean")
+        """
+
+        highway_valuestable_dict = params["highway_widths"]
+
         # protoblocks are created from the (potentially modified) clipped_reproj_datalayer
         self.protoblocks = polygonize_lines(self.clipped_reproj_datalayer)
         self.protoblocks.setCrs(self.custom_localTM_crs)  # better safe than sorry kkkk
@@ -732,35 +800,13 @@ class sidewalkreator:
 
         if self.already_existing_sidewalks_layer:
 
-            create_incidence_field_layers_A_B(
+            # calculating the approximate area of the enclosed already drawn sidewalks (assuming squared shape) in order to judge if the protoblock contains sidewalks:
+            filter_already_mapped_protoblocks(
                 self.protoblocks,
                 self.already_existing_sidewalks_layer,
-                "inc_sidewalk_len",
-                True,
-            )
-
-            # calculating the approximate area of the enclosed already drawn sidewalks (assuming squared shape) in order to judge if the protoblock contains sidewalks:
-
-            protoblocks_ratio_id = create_new_layerfield(
-                self.protoblocks, "sidewalks_ratio"
+                ratio_fieldname="sidewalks_ratio",
             )
 
-            with edit(self.protoblocks):
-                for feature in self.protoblocks.getFeatures():
-
-                    # dividing by 4 approximates the side of a squared shape block
-                    ratio = (
-                        ((feature["inc_sidewalk_len"] / 4) ** 2)
-                        / feature.geometry().area()
-                    ) * 100
-
-                    self.protoblocks.changeAttributeValue(
-                        feature.id(), protoblocks_ratio_id, ratio
-                    )
-
-                    if ratio > cutoff_percent_protoblock:
-                        self.protoblocks.deleteFeature(feature.id())
-
             # self.add_layer_canvas(self.protoblocks)
 
         """
@@ -799,21 +845,21 @@ class sidewalkreator:
 
         self.splitted_lines.setCrs(self.custom_localTM_crs)
 
+        raise_if_canceled(feedback, "cleaning the data")
+
         # removing lines that does not serve to form a block ('quarteirão')
-        if self.dlg.dead_end_iters_box.value() == 0:
+        if params["dead_end_iters_box"] == 0:
             remove_lines_from_no_block(
                 self.splitted_lines, self.dissolved_protoblocks_buff
             )
         else:
-            for i in range(self.dlg.dead_end_iters_box.value()):
-                # without second input, the function will work just as before
-                remove_lines_from_no_block(self.splitted_lines)
-
-        # adding same style again:
-        # style_line_random_colors(self.clipped_reproj_datalayer,highway_tag,self.streets_styledict)
+            # without second input, the function will work just as before,
+            # all of the iterations in a single run
+            remove_lines_from_no_block(
+                self.splitted_lines, iterations=params["dead_end_iters_box"]
+            )
 
-        # adding the style:
-        apply_style(self.splitted_lines, roads_p2_stylefilename)
+        raise_if_canceled(feedback, "cleaning the data")
 
         ##### creating points of intersection:
         intersection_points = get_intersections(
@@ -850,33 +896,26 @@ class sidewalkreator:
         if not widths_fieldname in get_column_names(self.splitted_lines):
             create_new_layerfield(self.splitted_lines, widths_fieldname)
 
-        # filling empty widths with values in the table:
-        widths_index = self.splitted_lines.fields().indexOf(widths_fieldname)
-        higway_index = self.splitted_lines.fields().indexOf(highway_tag)
-
-        with edit(self.splitted_lines):
-            for feature in self.splitted_lines.getFeatures():
-                feature_attrs_list = feature.attributes()
-
-                # only fill if no value is present
-                if not feature_attrs_list[widths_index]:
-                    highway_tag_val = feature_attrs_list[higway_index]
-                    self.splitted_lines.changeAttributeValue(
-                        feature.id(),
-                        widths_index,
-                        highway_valuestable_dict[highway_tag_val],
-                    )
-                    """
-                        THX: https://gis.stackexchange.com/a/133669/49900
+        # filling empty widths with values in the table, all at once;
+        # the features filled from the table are kept, so a later change in it can be applied
+        # without running this stage again (see "prepare_street_widths")
+        self.street_table_widths = fill_empty_from_mapping(
+            self.splitted_lines, widths_fieldname, highway_tag, highway_valuestable_dict
+        )
 
-                        NEVER USE index from enumeration (ordinal) as feature key (ID), as sometimes it's not the actual feature key (ID)
+        # filling a column with original id within layer to recover after a operation like
+        create_fill_id_field(self.splitted_lines)
 
-                        index (idx) =/= id
+    def data_clean_finished(self):
+        """
+        the part of "data_clean" touching the dialog and the canvas, back on the main thread
+        """
 
-                    """
+        # adding same style again:
+        # style_line_random_colors(self.clipped_reproj_datalayer,highway_tag,self.streets_styledict)
 
-        # filling a column with original id within layer to recover after a operation like
-        create_fill_id_field(self.splitted_lines)
+        # adding the style:
+        apply_style(self.splitted_lines, roads_p2_stylefilename)
 
         # adding layers to canvas:
         apply_style(self.filtered_intersection_points, road_intersections_stylefilename)
@@ -892,7 +931,8 @@ class sidewalkreator:
         self.set_hint_text()
 
         # always cleaning stuff that user does not need anymore
-        remove_layerlist([osm_higway_layer_finalname])
+        # (just taken off, the pipeline keeps it, for re-runs)
+        self.take_layer_off_canvas(self.clipped_reproj_datalayer)
 
         # enabling next button and stuff:
         self.dlg.generate_sidewalks.setEnabled(True)
@@ -977,21 +1017,27 @@ class sidewalkreator:
 
         self.dlg.hint_text.setHidden(True)
 
-        #  just the name for a field that will be deleted afterwards
-        self.split_field_name = "split_len"
+        self.run_stage(
+            self.string_according_language("Splitting sidewalks", "Dividindo calçadas"),
+            ("split",),
+            self.stage_parameters(),
+            self.dlg.split_progressbar,
+        )
+
+    def sidewalks_splitting_work(self, params, feedback):
+        """
+        the part of "sidewalks_splitting" running in the background
+        """
 
         # action tree according to checkboxes:
-        if not self.dlg.dontsplit_checkbox.isChecked():
+        if not params["dontsplit_checkbox"]:
             # firstly, splitting using protoblocks corners
 
             # finding which block "belongs" to each protoblock
-            create_incidence_field_layers_A_B(self.protoblocks, self.whole_sidewalks)
-            # self.add_layer_canvas(self.protoblocks)
-
-            # creating field to store splitting distance:
-            self.split_len_field_id = create_new_layerfield(
-                self.whole_sidewalks, self.split_field_name
+            protoblocks_incidence = incidence_mapping_layers_A_B(
+                self.protoblocks, self.whole_sidewalks
             )
+            # self.add_layer_canvas(self.protoblocks)
 
             # keeping only relevant vertices:
             relevant_vertices = {}
@@ -999,12 +1045,14 @@ class sidewalkreator:
 
             self.protoblocks_idx_perc = {}
 
-            number_protoblocks = len(
-                [feature.id() for feature in self.protoblocks.getFeatures()]
-            )
+            # the corners of each protoblock, computed once and shared by its incident sidewalks
+            protoblocks_corners = protoblocks_corner_vertices(self.protoblocks)
+
+            number_protoblocks = len(protoblocks_corners)
 
             for i, feature in enumerate(self.protoblocks.getFeatures()):
-                self.dlg.split_progressbar.setValue(round(100 * i / number_protoblocks))
+                raise_if_canceled(feedback, "splitting the sidewalks")
+                feedback.setProgress(round(100 * i / number_protoblocks))
                 self.protoblocks_idx_perc[feature.id()] = i
                 # vertex_list = select_vertex_pol_nodes(feature)
 
@@ -1012,12 +1060,12 @@ class sidewalkreator:
 
                 self.protoblock_wholesidewalk_inc_dict[feature.id()] = []
 
-                for incident in feature["incident"].split():
+                for incident in protoblocks_incidence[feature.id()]:
 
-                    relevant_vertices[int(incident)] = select_vertex_pol_nodes(feature)
+                    relevant_vertices[incident] = protoblocks_corners[feature.id()]
 
                     self.protoblock_wholesidewalk_inc_dict[feature.id()].append(
-                        int(incident)
+                        incident
                     )
 
             self.protoblocks_idx_perc = {
@@ -1035,37 +1083,37 @@ class sidewalkreator:
 
             self.split_sidewalks_by_protoblocks(relevant_vertices)
 
-            if self.dlg.voronoi_checkbox.isChecked():
-                self.dlg.split_progressbar.setValue(0)
+            if params["voronoi_checkbox"]:
+                feedback.setProgress(0)
 
-                self.voronoi_splitting()
+                self.voronoi_splitting(params["minimum_pois_box"], feedback)
 
-                if self.dlg.alongside_vor_checkbox.isChecked():
-                    if self.dlg.maxlensplit_checkbox.isChecked():
+                if params["alongside_vor_checkbox"]:
+                    if params["maxlensplit_checkbox"]:
                         self.splitting_by_distance_or_ndivisions(
-                            self.dlg.maxlensplit_box.value()
+                            params["maxlensplit_box"]
                         )
 
                     # elif self.dlg.maxlensplit_checkbox.isChecked():
                     #     pass
             else:
-                self.dlg.split_progressbar.setValue(0)
-                if self.dlg.maxlensplit_checkbox.isChecked():
+                feedback.setProgress(0)
+                if params["maxlensplit_checkbox"]:
 
                     self.splitting_by_distance_or_ndivisions(
-                        self.dlg.maxlensplit_box.value()
+                        params["maxlensplit_box"]
                     )
-                elif self.dlg.segsbynum_checkbox.isChecked():
+                elif params["segsbynum_checkbox"]:
 
                     self.splitting_by_distance_or_ndivisions(
-                        self.dlg.segsbynum_box.value(), True
+                        params["segsbynum_box"], True
                     )
 
         else:  # if we have voronoi and dontsplit:
-            self.dlg.split_progressbar.setValue(0)
+            feedback.setProgress(0)
 
-            if self.dlg.voronoi_checkbox.isChecked():
-                self.voronoi_splitting()
+            if params["voronoi_checkbox"]:
+                self.voronoi_splitting(params["minimum_pois_box"], feedback)
 
         # # # adjusting the fields of the output layers
         # sidewalks:
@@ -1130,21 +1178,6 @@ class sidewalkreator:
         # # # if self.exclusion_zones.featureCount() != self.exclusion_zones_count:
         # # #     self.excluding_exclusion_zones()
 
-        # workaround for the reference of layers changing
-
-        self.remove_layer_canvas(self.whole_sidewalklayer_name)
-        self.remove_layer_canvas("CROSSINGS")
-
-        # print(QgsProject.instance().mapLayers())
-
-        self.add_layer_canvas(self.whole_sidewalks)
-        # self.whole_sidewalks.loadNamedStyle(self.sidewalk_stylefile_path)
-        apply_style(self.whole_sidewalks, sidewalks_stylefilename)
-
-        self.add_layer_canvas(self.crossings_layer)
-        # self.crossings_layer.loadNamedStyle(self.crossings_stylefile_path)
-        apply_style(self.crossings_layer, crossings_stylefilename)
-
         # kerbs:
         create_filled_newlayerfield(
             self.kerbs_layer, "barrier", "kerb", QVariant.String
@@ -1172,10 +1205,31 @@ class sidewalkreator:
             self.whole_sidewalks, "footway", "sidewalk", QVariant.String
         )
 
+    def sidewalks_splitting_finished(self):
+        """
+        the part of "sidewalks_splitting" touching the dialog and the canvas, back on the main thread
+        """
+
+        # workaround for the reference of layers changing
+
+        self.remove_layer_canvas(self.whole_sidewalklayer_name)
+        self.remove_layer_canvas("CROSSINGS")
+
+        # print(QgsProject.instance().mapLayers())
+
+        self.add_layer_canvas(self.whole_sidewalks)
+        # self.whole_sidewalks.loadNamedStyle(self.sidewalk_stylefile_path)
+        apply_style(self.whole_sidewalks, sidewalks_stylefilename)
+
+        self.add_layer_canvas(self.crossings_layer)
+        # self.crossings_layer.loadNamedStyle(self.crossings_stylefile_path)
+        apply_style(self.crossings_layer, crossings_stylefilename)
+
         # enabling for aftewards:
         self.dlg.button_box.button(QDialogButtonBox.Ok).setEnabled(True)
         self.dlg.output_file_label.setEnabled(True)
         self.dlg.output_folder_selector.setEnabled(True)
+        self.dlg.output_format_combobox.setEnabled(True)
 
         # saying that is complete:
         self.dlg.split_progressbar.setValue(100)
@@ -1200,6 +1254,19 @@ class sidewalkreator:
         self.dlg.min_seg_len_box.setEnabled(False)
         self.dlg.ch_remove_abovetol.setEnabled(False)
 
+        self.run_stage(
+            self.string_according_language(
+                "Drawing crossings", "Desenhando cruzamentos"
+            ),
+            ("crossings",),
+            self.stage_parameters(),
+        )
+
+    def draw_crossings_work(self, params, feedback):
+        """
+        the part of "draw_crossings" running in the background
+        """
+
         # moved from draw_sidewalks
         # to (probably) speed up intersections:
         self.dissolved_sidewalks = dissolve_tosinglegeom(self.whole_sidewalks)
@@ -1256,6 +1323,7 @@ class sidewalkreator:
         index = QgsSpatialIndex(self.splitted_lines.getFeatures())
 
         for i, feature_A in enumerate(self.splitted_lines.getFeatures()):
+            raise_if_canceled(feedback, "drawing the crossings")
 
             # obtaining the two delimiting points:
 
@@ -1327,7 +1395,7 @@ class sidewalkreator:
                             "width"
                         ]
 
-            initial_vec_len = featurewidth + self.dlg.d_to_add_box.value()
+            initial_vec_len = featurewidth + params["d_to_add_box"]
 
             # print(i+1,P0_intersecting_widths)
             # print(i+1,PF_intersecting_widths,'\n')
@@ -1350,7 +1418,7 @@ class sidewalkreator:
                 d_to_interpolate_P0 = (
                     (tr_widthP0 * 0.5)
                     + self.curveradius
-                    + self.dlg.d_to_add_inward_box.value()
+                    + params["d_to_add_inward_box"]
                 )
 
                 # storing the distance to use if needed:
@@ -1402,7 +1470,7 @@ class sidewalkreator:
 
                 paralell_unsucessful = False
 
-                if self.dlg.opt_parallel_crossings.isChecked():
+                if params["opt_parallel_crossings"]:
                     pts_inters_P0 = points_intersecting_buffer_boundary(
                         P0, self.splitted_lines, list(P0_intersecting_widths)
                     )
@@ -1418,7 +1486,7 @@ class sidewalkreator:
                     except:
                         paralell_unsucessful = True
 
-                if self.dlg.opt_perp_crossings.isChecked() or paralell_unsucessful:
+                if params["opt_perp_crossings"] or paralell_unsucessful:
 
                     # creating a perpendicular vector:
                     #    first, we create a vector parallel to the current street segment
@@ -1446,7 +1514,7 @@ class sidewalkreator:
                 d_to_interpolate_PF = (
                     (tr_widthPF * 0.5)
                     + self.curveradius
-                    + self.dlg.d_to_add_inward_box.value()
+                    + params["d_to_add_inward_box"]
                 )
 
                 # storing the distance to use if needed:
@@ -1491,7 +1559,7 @@ class sidewalkreator:
 
                 paralell_unsucessful = False
 
-                if self.dlg.opt_parallel_crossings.isChecked():
+                if params["opt_parallel_crossings"]:
                     pts_inters_PF = points_intersecting_buffer_boundary(
                         PF, self.splitted_lines, list(PF_intersecting_widths)
                     )
@@ -1508,7 +1576,7 @@ class sidewalkreator:
                     except:
                         paralell_unsucessful = True
 
-                if self.dlg.opt_perp_crossings.isChecked() or paralell_unsucessful:
+                if params["opt_perp_crossings"] or paralell_unsucessful:
 
                     # creating a perpendicular vector:
                     #    first, we create a vector parallel to the current street segment
@@ -1564,7 +1632,7 @@ class sidewalkreator:
         crossings_featlist = []
         # to create kerbs layer
         kerbs_featlist = []
-        # to create crrossing A's&E's layer
+        # the crossing A's&E's, to be added to the sidewalks
         self.crossings_A_E_pointlist = []
 
         for feature in self.inner_crossings_layer.getFeatures():
@@ -1573,7 +1641,7 @@ class sidewalkreator:
 
             belonging_line = endpoints_belonging[key]
 
-            if belonging_line.geometry().length() < self.dlg.min_seg_len_box.value():
+            if belonging_line.geometry().length() < params["min_seg_len_box"]:
                 # if the length of the street segment isn't big enough, just dont add the crossing
                 continue
 
@@ -1589,6 +1657,8 @@ class sidewalkreator:
                     belonging_line,
                     inward_distances[key],
                     is_at_beginning,
+                    params["d_to_add_box"],
+                    params["perc_tol_crossings_box"],
                 )
             )
 
@@ -1619,7 +1689,7 @@ class sidewalkreator:
             #     segment_EC = QgsGeometry.fromPolylineXY([pE_crossings,pC])
             #     pE_feat = geom_to_feature(pointXY_to_geometry(pE_crossings))
 
-            kerb_perc = self.dlg.perc_draw_kerbs_box.value()
+            kerb_perc = params["perc_draw_kerbs_box"]
 
             pB = interpolate_by_percent(segment_AC, kerb_perc)
             pD = interpolate_by_percent(segment_EC, kerb_perc)
@@ -1658,18 +1728,18 @@ class sidewalkreator:
                 ],
             )
 
-            ortholen = self.dlg.d_to_add_box.value() + float(
+            ortholen = params["d_to_add_box"] + float(
                 belonging_line[widths_fieldname]
             )
 
-            tolerance_factor = self.dlg.perc_tol_crossings_box.value()
+            tolerance_factor = params["perc_tol_crossings_box"]
             tol_len = ortholen * (1 + tolerance_factor / 100)
 
             dif_from_ortholen = round(crossing_geom.length() - ortholen, 3)
 
             above_tol = crossing_geom.length() > tol_len
 
-            if self.dlg.ch_remove_abovetol.isChecked():
+            if params["ch_remove_abovetol"]:
                 if above_tol:
                     continue
 
@@ -1682,9 +1752,9 @@ class sidewalkreator:
             kerbs_featlist.append(geom_to_feature(pB))
             kerbs_featlist.append(geom_to_feature(pD))
 
-            # to add intersections: # DEPRECATED
-            # self.crossings_A_E_pointlist.append(pA_feat.geometry())
-            # self.crossings_A_E_pointlist.append(pE_feat.geometry())
+            # to add intersections:
+            self.crossings_A_E_pointlist.append(pA_crossings.asPoint())
+            self.crossings_A_E_pointlist.append(pE_crossings.asPoint())
 
         # creating and styling the crossings and kerbs layers
         self.crossings_layer = layer_from_featlist(
@@ -1705,32 +1775,32 @@ class sidewalkreator:
         # creating the layer
         crossing_id_fieldname = "crossing_id"
 
-        center_crossings_featlist = []
+        # only needed for the nearest neighbor search, so no layer for them:
+        center_crossings = FeatureStore(
+            [QgsField(crossing_id_fieldname, QVariant.Int)],
+            QgsWkbTypes.Point,
+            self.custom_localTM_crs,
+        )
+
         for feature in self.crossings_layer.getFeatures():
             as_polyline = feature.geometry().asPolyline()
             # 0 1 2 3 4 index 2 are centerpoints
-            pC_feat = geom_to_feature(
+            center_crossings.append(
                 QgsGeometry.fromPointXY(as_polyline[2]), [feature.id()]
             )
 
-            # pC_feat.setAttributes([feature.id()])
-
-            center_crossings_featlist.append(pC_feat)
-
-        center_crossings_layer = layer_from_featlist(
-            center_crossings_featlist,
-            "centerpoints",
-            attrs_dict={crossing_id_fieldname: QVariant.Int},
-            CRS=self.custom_localTM_crs,
-        )
-
         # spatial index and testing:
-        centerpoint_spatial_index = gen_layer_spatial_index(center_crossings_layer)
+        centerpoint_spatial_index = QgsSpatialIndex(
+            center_crossings.features(),
+            flags=QgsSpatialIndex.FlagStoreFeatureGeometries,
+        )
 
         nearest_dist_dict = {}
 
-        for feature in center_crossings_layer.getFeatures():
-            as_pointXY = feature.geometry().asPoint()
+        crossing_ids = center_crossings.column(crossing_id_fieldname)
+
+        for i, crossing_id in enumerate(crossing_ids):
+            as_pointXY = center_crossings.geometry(i).asPoint()
 
             knn_list = centerpoint_spatial_index.nearestNeighbor(
                 as_pointXY, 2, knn_max_dist
@@ -1746,8 +1816,6 @@ class sidewalkreator:
                 for id in knn_list
             ]
 
-            crossing_id = feature[crossing_id_fieldname]
-
             if distances:
                 if len(distances) >= 2:
                     nearest_dist_dict[crossing_id] = max(distances)
@@ -1763,41 +1831,42 @@ class sidewalkreator:
             QVariant.Double,
         )
 
-        # hint texts:
-        self.en_hint = "Hint: check for bad crossings using attrs.\nyou can delete them,\nkerbs are autom. cleaned!"
-        self.ptbr_hint = "Dica: você pode deletar manualmente cruzamentos.\nVide a tabela de atributos para filtrar!"
-        self.set_hint_text()
-
         # adding crossing len to check for "bad" crossings:
         # create_new_layerfield(self.crossings_layer,'length')
 
         # create_filled_newlayerfield(self.crossings_layer,'length',{'geometry':'length'},QVariant.Double)
 
-        self.crossings_stylefile_path = os.path.join(
-            assets_path, crossings_stylefilename
-        )
-        self.crossings_layer.loadNamedStyle(self.crossings_stylefile_path)
-
         self.kerbs_layer = layer_from_featlist(kerbs_featlist, kerbs_layer_name)
         self.kerbs_layer.setCrs(self.custom_localTM_crs)
 
-        kerbs_stylefile_path = os.path.join(assets_path, kerbs_stylefilename)
-        self.kerbs_layer.loadNamedStyle(kerbs_stylefile_path)
-
         ###################################################### ADDING POINTS TO SIDEWALKS
         # before next steps, adding the intersection points to the sidewalks layer:
 
-        # self.add_kerb_sidewalk_vertices()  # it was a good try, but still with troubles
+        self.add_kerb_sidewalk_vertices()
+
+    def draw_crossings_finished(self):
+        """
+        the part of "draw_crossings" touching the dialog and the canvas, back on the main thread
+        """
+
+        # hint texts:
+        self.en_hint = "Hint: check for bad crossings using attrs.\nyou can delete them,\nkerbs are autom. cleaned!"
+        self.ptbr_hint = "Dica: você pode deletar manualmente cruzamentos.\nVide a tabela de atributos para filtrar!"
+        self.set_hint_text()
 
-        temporary_snapped_sidewalks = snap_layers(
-            self.whole_sidewalks, self.crossings_layer
+        self.crossings_stylefile_path = os.path.join(
+            assets_path, crossings_stylefilename
         )
+        self.crossings_layer.loadNamedStyle(self.crossings_stylefile_path)
 
-        swap_features_layer_another(self.whole_sidewalks, temporary_snapped_sidewalks)
+        kerbs_stylefile_path = os.path.join(assets_path, kerbs_stylefilename)
+        self.kerbs_layer.loadNamedStyle(kerbs_stylefile_path)
 
         # self.add_layer_canvas(self.inner_crossings_layer)
         self.add_layer_canvas(self.crossings_layer)
         self.add_layer_canvas(self.kerbs_layer)
+        # on a re-run, the sidewalks were taken off the canvas:
+        self.add_layer_canvas(self.whole_sidewalks)
         # self.add_layer_canvas(inner_crossings_buff)
         # self.add_layer_canvas(self.protoblocks)
         # self.add_layer_canvas(self.dissolved_protoblocks_0)
@@ -1827,8 +1896,77 @@ class sidewalkreator:
         )
         self.set_hint_text()
 
+        params = self.stage_parameters()
+
+        # if just some streets were edited since the sidewalks were drawn, only around them:
+        stagenames = ("sidewalks",)
+        stage_work = None
+
+        if (
+            self.pipeline.is_complete("sidewalks")
+            and self.pipeline.first_changed_stage(params) is None
+        ):
+            street_ids = self.changed_street_ids()
+
+            if street_ids:
+                stagenames = self.pipeline.patchable_stages("sidewalks")
+
+                def stage_work(feedback):
+                    self.regenerate_around_streets(street_ids, params, feedback)
+
+        self.run_stage(
+            self.string_according_language("Drawing sidewalks", "Desenhando calçadas"),
+            stagenames,
+            params,
+            stage_work=stage_work,
+        )
+
+    def prepare_street_widths(self, highway_widths):
+        """
+        the widths of the streets as the table currently gives them, before (re)drawing the sidewalks:
+        the adjustments to the buildings of a previous run are undone, and the widths filled
+        from the table follow its current values; widths edited by hand meanwhile are kept
+        """
+
+        table_widths = self.street_table_widths or {}
+        adjustments = self.street_width_adjustments or {}
+
+        widths_index = self.splitted_lines.fields().indexOf(widths_fieldname)
+        higway_index = self.splitted_lines.fields().indexOf(highway_tag)
+
+        changes = {}
+
+        for feature in self.splitted_lines.getFeatures():
+            feature_attrs_list = feature.attributes()
+            width = feature_attrs_list[widths_index]
+
+            if feature.id() in adjustments:
+                previous_width, adjusted_width = adjustments[feature.id()]
+
+                if width == adjusted_width:
+                    width = previous_width
+
+            if table_widths.get(feature.id()) == width:
+                width = highway_widths.get(feature_attrs_list[higway_index], width)
+                table_widths[feature.id()] = width
+
+            if width != feature_attrs_list[widths_index]:
+                changes[feature.id()] = {widths_index: width}
+
+        if changes:
+            self.splitted_lines.dataProvider().changeAttributeValues(changes)
+
+        self.street_width_adjustments = {}
+
+    def draw_sidewalks_work(self, params, feedback):
+        """
+        the part of "draw_sidewalks" running in the background
+        """
+
+        self.prepare_street_widths(params["highway_widths"])
+
         # if no buildings, we can directly generate a simply dissolved-big_buffer
-        if self.no_buildings or not self.dlg.check_if_overlaps_buildings.isChecked():
+        if self.no_buildings or not params["check_if_overlaps_buildings"]:
 
             pass
 
@@ -1859,13 +1997,13 @@ class sidewalkreator:
                     # actually projected distance (half the width plus half the "distance to be add", avaliable at the GUI):
                     if not isinstance(feature["width"], str):
                         ac_prj_d = (
-                            feature["width"] / 2 + self.dlg.d_to_add_box.value() / 2
+                            feature["width"] / 2 + params["d_to_add_box"] / 2
                         )
                     else:
                         try:
                             feat_width = float(feature["width"])
                             ac_prj_d = (
-                                feat_width / 2 + self.dlg.d_to_add_box.value() / 2
+                                feat_width / 2 + params["d_to_add_box"] / 2
                             )
 
                         except:
@@ -1874,7 +2012,7 @@ class sidewalkreator:
 
                     # discounting the minimum distance, so it will always be considered
                     dif = (
-                        d_to_nearest_building - self.dlg.min_d_buildings_box.value()
+                        d_to_nearest_building - params["min_d_buildings_box"]
                     ) - ac_prj_d
 
                     # dividing and multiplying by 2 as buffer is done side-by-side
@@ -1883,18 +2021,24 @@ class sidewalkreator:
 
                         new_width = 2 * (ac_prj_d + dif)
 
-                        if new_width < self.dlg.min_width_box.value():
+                        if new_width < params["min_width_box"]:
                             # imagine the worst case where someone has created  a building intersecting or nearly touching the very road
-                            new_width = self.dlg.min_width_box.value()
+                            new_width = params["min_width_box"]
 
                         # finally, editing the field when needed
                         self.splitted_lines.changeAttributeValue(
                             feature.id(), widths_index, new_width
                         )
 
+                        # kept, to be undone in a re-run
+                        self.street_width_adjustments[feature.id()] = (
+                            feature["width"],
+                            new_width,
+                        )
+
                     # print(d_to_nearest_building,feature['width']/2,i)
 
-        buffer_distance_string = f'("width" /2)+{self.dlg.d_to_add_box.value()/2}'
+        buffer_distance_string = f'("width" /2)+{params["d_to_add_box"]/2}'
 
         # print(buffer_distance_string)
 
@@ -1904,7 +2048,7 @@ class sidewalkreator:
 
         # rounding directly, as it avoids small polygons aswell
         # TODO: check if it's the best approach, or to do it feature-wise
-        self.curveradius = self.dlg.curve_radius_box.value()
+        self.curveradius = params["curve_radius_box"]
 
         proto_dissolved_buffer_step2 = generate_buffer(
             dissolve_tosinglegeom(self.proto_undissolved_buffer_step1), self.curveradius
@@ -1989,7 +2133,7 @@ class sidewalkreator:
 
             width_val = (
                 float(attrdict.get(widths_fieldname))
-                + self.dlg.d_to_add_box.value()
+                + params["d_to_add_box"]
                 + 1
             )
             half_width = (width_val / 2) + 0.5
@@ -2113,12 +2257,6 @@ class sidewalkreator:
         # storing the feature count of exclusion zones:
         self.exclusion_zones_count = self.exclusion_zones.featureCount()
 
-        ### setting styles and adding to canvas
-        # exclusionzones_stylelayerpath = os.path.join(assets_path,exclusion_stylefilename)
-        # self.exclusion_zones.loadNamedStyle(exclusionzones_stylelayerpath)
-        apply_style(self.exclusion_zones, exclusion_stylefilename)
-        apply_style(self.sure_zones, sure_stylefilename)
-
         # applying:
 
         # difference_inplace(self.whole_sidewalks,self.exclusion_zones)
@@ -2165,28 +2303,26 @@ class sidewalkreator:
         )
 
         # creation of both ratios
-        with edit(self.whole_sidewalks):
-            for feature in self.whole_sidewalks.getFeatures():
-                attrdict = feature.attributeMap()  # getting attributes
+        norm_ratios = {}
+        simple_ratios = {}
 
-                # normalized ratio
-                norm_ratio = attrdict[self.sidewalks_perimeter_field_name] / math.sqrt(
-                    attrdict[self.sidewalks_area_field_name]
-                )
+        for feature in self.whole_sidewalks.getFeatures():
+            perimeter = feature[self.sidewalks_perimeter_field_name]
+            area = feature[self.sidewalks_area_field_name]
 
-                self.whole_sidewalks.changeAttributeValue(
-                    feature.id(), self.norm_ratio_field_idx, norm_ratio
-                )
+            # normalized ratio
+            norm_ratios[feature.id()] = perimeter / math.sqrt(area)
 
-                # simple ratio
-                simple_ratio = (
-                    attrdict[self.sidewalks_perimeter_field_name]
-                    / attrdict[self.sidewalks_area_field_name]
-                )
+            # simple ratio
+            simple_ratios[feature.id()] = perimeter / area
 
-                self.whole_sidewalks.changeAttributeValue(
-                    feature.id(), self.simple_ratio_field_idx, simple_ratio
-                )
+        write_layer_columns(
+            self.whole_sidewalks,
+            {
+                self.norm_ratio_field_idx: norm_ratios,
+                self.simple_ratio_field_idx: simple_ratios,
+            },
+        )
 
         # ratios_list = get_layercolumn_byname(self.whole_sidewalks,self.norm_ratio_field_name)
 
@@ -2203,9 +2339,25 @@ class sidewalkreator:
         # print(q1,q3,IQR)
         # print(q1-1.5*IQR,q3+1.5*IQR)
 
+        raise_if_canceled(feedback, "drawing the sidewalks")
+
         #### APPLYING THE EXCLUSION:
         self.excluding_exclusion_zones()
 
+        # to tell which streets are edited afterwards:
+        self.drawn_street_states = self.street_states()
+
+    def draw_sidewalks_finished(self):
+        """
+        the part of "draw_sidewalks" touching the dialog and the canvas, back on the main thread
+        """
+
+        ### setting styles and adding to canvas
+        # exclusionzones_stylelayerpath = os.path.join(assets_path,exclusion_stylefilename)
+        # self.exclusion_zones.loadNamedStyle(exclusionzones_stylelayerpath)
+        apply_style(self.exclusion_zones, exclusion_stylefilename)
+        apply_style(self.sure_zones, sure_stylefilename)
+
         # styling the sidewalks layer
         # self.sidewalk_stylefile_path = os.path.join(assets_path,sidewalks_stylefilename)
 
@@ -2258,45 +2410,326 @@ class sidewalkreator:
 
         swap_features_layer_another(self.whole_sidewalks, temp_sidewalk_w_exclusions)
 
-    def string_according_language(self, en_str, ptbr_str):
-        if self.current_lang == "en":
-            return en_str
-        else:
-            return ptbr_str
+    def street_states(self):
+        """
+        the geometry (as WKB) and the width of each street segment, by feature id
+        """
 
-    def remove_temporary_layers(self):
+        widths_index = self.splitted_lines.fields().indexOf(widths_fieldname)
 
-        is_temporary = [
-            layer.isTemporary() for layer in QgsProject.instance().mapLayers().values()
-        ]
+        return {
+            feature.id(): (
+                bytes(feature.geometry().asWkb()),
+                feature.attributes()[widths_index],
+            )
+            for feature in self.splitted_lines.getFeatures()
+        }
 
-        layer_fullnames = [layer for layer in QgsProject.instance().mapLayers()]
+    def changed_street_ids(self):
+        """
+        the street segments edited (or added, or deleted) since the sidewalks were drawn
+        """
 
-        for i, status in enumerate(is_temporary):
-            if status:
-                QgsProject.instance().removeMapLayer(layer_fullnames[i])
+        drawn_states = self.drawn_street_states or {}
+        current_states = self.street_states()
 
-    # # def replace_vectorlayer(self,layername,newpath):
-    # #     remove_layerlist([layername])
+        return {
+            fid
+            for fid in drawn_states.keys() | current_states.keys()
+            if drawn_states.get(fid) != current_states.get(fid)
+        }
 
-    # #     replaced =  QgsVectorLayer(newpath,layername,'ogr')
+    def regenerate_around_streets(self, street_ids, params, feedback=None, halo=1):
+        """
+        redrawing the sidewalks, crossings and kerbs just around some edited streets:
 
-    # #     self.add_layer_canvas(replaced)
+        the sidewalks and crossings stages are run on a window with the protoblocks touched
+        by the streets, plus "halo" rings of their neighbors (the context for the crossings
+        between them), then the results for the touched protoblocks are patched into the
+        current layers; if the sidewalks were already split, the layers as they were before
+        the splitting are patched instead, and the splitting is done again
+        """
 
-    def disable_all_because_sidewalks(self):
-        # DISABLING STUFF, if there are sidewalks already drawn, one must step back!!
+        pipeline = self.pipeline
 
-        self.dlg.button_box.button(QDialogButtonBox.Ok).setEnabled(False)
-        self.dlg.datafetch.setEnabled(False)
-        self.dlg.ch_ignore_buildings.setEnabled(False)
-        self.dlg.ch_ignore_buildings.setChecked(False)
-        self.dlg.input_layer_selector.setEnabled(False)
-        self.dlg.higway_values_table.setEnabled(False)
-        self.dlg.clean_data.setEnabled(False)
-        self.dlg.output_folder_selector.setEnabled(False)
+        current_states = self.street_states()
+        drawn_states = self.drawn_street_states or {}
 
-        self.dlg.dead_end_iters_label.setEnabled(False)
-        self.dlg.dead_end_iters_box.setEnabled(False)
+        # the edited streets, where they are now and where they were:
+        changed_geoms = []
+
+        for fid in street_ids:
+            for states in (current_states, drawn_states):
+                if fid in states:
+                    geom = QgsGeometry()
+                    geom.fromWkb(states[fid][0])
+                    changed_geoms.append(geom)
+
+        geometry_changed = any(
+            current_states.get(fid, (None,))[0] != drawn_states.get(fid, (None,))[0]
+            for fid in street_ids
+        )
+
+        core_ids, halo_ids = protoblocks_around(self.protoblocks, changed_geoms, halo)
+
+        def features_of(inputlayer, ids):
+            request = QgsFeatureRequest().setFilterFids(list(ids))
+
+            return list(inputlayer.getFeatures(request))
+
+        # a little tolerance, so the crossings over the edited streets are in the core too
+        changed_zone = [geom.buffer(0.1, 5) for geom in changed_geoms]
+
+        core = QgsGeometry.unaryUnion(
+            [f.geometry() for f in features_of(self.protoblocks, core_ids)]
+            + changed_zone
+        ).buffer(0.1, 5)
+
+        region = QgsGeometry.unaryUnion(
+            [f.geometry() for f in features_of(self.protoblocks, core_ids | halo_ids)]
+            + changed_zone
+        )
+
+        # the streets whose buffers may reach the region:
+        widths = []
+
+        for _, width in current_states.values():
+            try:
+                widths.append(float(width))
+            except (TypeError, ValueError):
+                continue
+
+        margin = (
+            max(widths, default=0)
+            + params["d_to_add_box"]
+            + params["curve_radius_box"]
+        )
+
+        local_streets = FeatureStore.from_layer(
+            self.splitted_lines,
+            QgsFeatureRequest().setFilterRect(region.buffer(margin, 5).boundingBox()),
+        ).to_layer(self.splitted_lines.name())
+
+        if geometry_changed:
+            # the protoblocks themselves follow the streets' geometries:
+            local_protoblocks = polygonize_lines(local_streets)
+            local_protoblocks.setCrs(self.custom_localTM_crs)
+
+            if self.already_existing_sidewalks_layer:
+                filter_already_mapped_protoblocks(
+                    local_protoblocks, self.already_existing_sidewalks_layer
+                )
+
+            local_protoblocks.dataProvider().deleteFeatures(
+                [
+                    feature.id()
+                    for feature in local_protoblocks.getFeatures()
+                    if not feature.geometry().pointOnSurface().intersects(region)
+                ]
+            )
+        else:
+            local_protoblocks = FeatureStore.from_layer(
+                self.protoblocks,
+                QgsFeatureRequest().setFilterFids(list(core_ids | halo_ids)),
+            ).to_layer(self.protoblocks.name())
+
+        local_dissolved_protoblocks = dissolve_tosinglegeom(local_protoblocks)
+        local_dissolved_protoblocks.setCrs(self.custom_localTM_crs)
+
+        # a pipeline for the window, sharing everything but the streets and protoblocks:
+        local = SidewalkPipeline()
+        local.stages = pipeline.stages
+        local.results = dict(pipeline.results)
+        local.completed = ["fetch", "clean", "protoblocks"]
+
+        local["streets"] = local_streets
+        local["protoblocks"] = local_protoblocks
+        local["dissolved_protoblocks"] = local_dissolved_protoblocks
+
+        # the widths are taken as they are, the table ones were already applied:
+        local["street_table_widths"] = None
+        local["street_width_adjustments"] = None
+
+        # the results patched, the later ones not patched (the export) are stale afterwards:
+        patched_stages = pipeline.patchable_stages("sidewalks")
+
+        crossings_done = "crossings" in patched_stages
+        split_done = "split" in patched_stages
+
+        # the stages' methods work on "local" while it runs them (see "PipelineResult"),
+        # "self.pipeline" stays the current one:
+        local.run("sidewalks", params, feedback)
+
+        if crossings_done:
+            local.run("crossings", params, feedback)
+
+        raise_if_canceled(feedback, "patching the sidewalks")
+
+        if split_done:
+            before_split = pipeline.snapshots["split"]
+
+            # copies, keeping track of the ids of their features at the actual layers:
+            targets = {}
+            target_source_ids = {}
+
+            for name in ("sidewalks", "crossings", "kerbs"):
+                (
+                    targets[name],
+                    target_source_ids[name],
+                ) = before_split[name].to_layer_with_source_ids(name)
+        else:
+            targets = {
+                "sidewalks": self.whole_sidewalks,
+                "crossings": self.crossings_layer,
+                "kerbs": self.kerbs_layer,
+            }
+
+        def patch_core_sidewalks(target, local_sidewalks):
+            patch_features(
+                target,
+                feature_ids_in_region(target, core, within=True),
+                features_of(
+                    local_sidewalks,
+                    feature_ids_in_region(local_sidewalks, core, within=True),
+                ),
+            )
+
+        patch_core_sidewalks(targets["sidewalks"], local["sidewalks"])
+
+        if crossings_done:
+            removed_crossings = features_of(
+                targets["crossings"],
+                feature_ids_in_region(targets["crossings"], core),
+            )
+            new_crossings = features_of(
+                local["crossings"], feature_ids_in_region(local["crossings"], core)
+            )
+
+            # the kerbs lie on their crossings:
+            def kerbs_on(crossings, kerbs_layer):
+                if not crossings:
+                    return []
+
+                crossings_zone = QgsGeometry.unaryUnion(
+                    [feature.geometry() for feature in crossings]
+                ).buffer(0.01, 5)
+
+                return feature_ids_in_region(kerbs_layer, crossings_zone)
+
+            patch_features(
+                targets["kerbs"],
+                kerbs_on(removed_crossings, targets["kerbs"]),
+                features_of(local["kerbs"], kerbs_on(new_crossings, local["kerbs"])),
+            )
+            patch_features(
+                targets["crossings"],
+                [feature.id() for feature in removed_crossings],
+                new_crossings,
+            )
+
+            # the new crossings' endpoints are added to the sidewalks around too, as in the stage
+            # (the ones of the core sidewalks are already there, so those are kept as they are):
+            insert_points_into_lines(
+                targets["sidewalks"],
+                [
+                    point
+                    for feature in new_crossings
+                    for point in (
+                        feature.geometry().asPolyline()[0],
+                        feature.geometry().asPolyline()[-1],
+                    )
+                ],
+            )
+
+            # the sidewalks kept by the crossings stage (as they were before it) also change:
+            before_crossings = pipeline.snapshots.get("crossings", {})
+
+            if "sidewalks" in before_crossings:
+                (
+                    unsnapped_sidewalks,
+                    unsnapped_source_ids,
+                ) = before_crossings["sidewalks"].to_layer_with_source_ids("sidewalks")
+
+                patch_core_sidewalks(
+                    unsnapped_sidewalks,
+                    local.snapshots["crossings"]["sidewalks"].to_layer("sidewalks"),
+                )
+
+                before_crossings["sidewalks"] = FeatureStore.from_layer(
+                    unsnapped_sidewalks, source_ids=unsnapped_source_ids
+                )
+
+        if geometry_changed:
+            patch_features(
+                self.protoblocks,
+                core_ids,
+                [
+                    geom_to_feature(feature.geometry())
+                    for feature in local_protoblocks.getFeatures()
+                    if feature.geometry().pointOnSurface().intersects(core)
+                ],
+            )
+
+            self.dissolved_protoblocks_0 = dissolve_tosinglegeom(self.protoblocks)
+            self.dissolved_protoblocks_0.setCrs(self.custom_localTM_crs)
+
+            self.dissolved_protoblocks_buff = generate_buffer(
+                self.dissolved_protoblocks_0, protoblocks_buffer
+            )
+            self.dissolved_protoblocks_buff.setCrs(self.custom_localTM_crs)
+
+        self.drawn_street_states = current_states
+
+        if split_done:
+            for name, layer in targets.items():
+                before_split[name] = FeatureStore.from_layer(
+                    layer, source_ids=target_source_ids[name]
+                )
+
+            pipeline.run("split", params, feedback)
+
+        pipeline.patched(patched_stages)
+
+    def string_according_language(self, en_str, ptbr_str):
+        if self.current_lang == "en":
+            return en_str
+        else:
+            return ptbr_str
+
+    def remove_temporary_layers(self):
+
+        is_temporary = [
+            layer.isTemporary() for layer in QgsProject.instance().mapLayers().values()
+        ]
+
+        layer_fullnames = [layer for layer in QgsProject.instance().mapLayers()]
+
+        for i, status in enumerate(is_temporary):
+            if status:
+                QgsProject.instance().removeMapLayer(layer_fullnames[i])
+
+    # # def replace_vectorlayer(self,layername,newpath):
+    # #     remove_layerlist([layername])
+
+    # #     replaced =  QgsVectorLayer(newpath,layername,'ogr')
+
+    # #     self.add_layer_canvas(replaced)
+
+    def disable_all_because_sidewalks(self):
+        # DISABLING STUFF, if there are sidewalks already drawn, one must step back!!
+
+        self.dlg.button_box.button(QDialogButtonBox.Ok).setEnabled(False)
+        self.dlg.datafetch.setEnabled(False)
+        self.dlg.ch_ignore_buildings.setEnabled(False)
+        self.dlg.ch_ignore_buildings.setChecked(False)
+        self.dlg.input_layer_selector.setEnabled(False)
+        self.dlg.higway_values_table.setEnabled(False)
+        self.dlg.clean_data.setEnabled(False)
+        self.dlg.output_folder_selector.setEnabled(False)
+        self.dlg.output_format_combobox.setEnabled(False)
+
+        self.dlg.dead_end_iters_label.setEnabled(False)
+        self.dlg.dead_end_iters_box.setEnabled(False)
 
         # objects that must be hidden:
         self.dlg.generate_sidewalks.setHidden(True)
@@ -2342,6 +2775,7 @@ class sidewalkreator:
         self.dlg.dontsplit_checkbox.setHidden(True)
         self.dlg.output_file_label.setHidden(True)
         self.dlg.output_folder_selector.setHidden(True)
+        self.dlg.output_format_combobox.setHidden(True)
 
     def ignore_already_drawn_fcn(self):
 
@@ -2354,6 +2788,11 @@ class sidewalkreator:
         # print(self.ignore_sidewalks_already_drawn)
 
     def reset_fields(self):
+        # a stage still running in the background would work on wiped data:
+        if self.stage_task is not None:
+            self.stage_task.cancel()
+            self.stage_task = None
+
         # stuff of feature selector:
         self.dlg.input_layer_feature_selector.setFeature(-1)
         self.dlg.input_layer_feature_selector.setEnabled(False)
@@ -2371,6 +2810,7 @@ class sidewalkreator:
         self.dlg.higway_values_table.setEnabled(False)
         self.dlg.clean_data.setEnabled(False)
         self.dlg.output_folder_selector.setEnabled(False)
+        self.dlg.output_format_combobox.setEnabled(False)
         self.dlg.generate_sidewalks.setEnabled(False)
         self.dlg.check_if_overlaps_buildings.setEnabled(False)
         self.dlg.check_if_overlaps_buildings.setChecked(False)
@@ -2407,6 +2847,7 @@ class sidewalkreator:
         self.dlg.dontsplit_checkbox.setEnabled(False)
         self.dlg.output_file_label.setEnabled(False)
         self.dlg.output_folder_selector.setEnabled(False)
+        self.dlg.output_format_combobox.setEnabled(False)
         # self.dlg.gencrossings_progressbar.setEnabled(False)
 
         # self.dlg.gencrossings_progressbar.setValue(0)
@@ -2494,6 +2935,7 @@ class sidewalkreator:
         self.dlg.dontsplit_checkbox.setHidden(False)
         self.dlg.output_file_label.setHidden(False)
         self.dlg.output_folder_selector.setHidden(False)
+        self.dlg.output_format_combobox.setHidden(False)
 
         # self.dlg.gencrossings_progressbar.setHidden(False)
 
@@ -2537,7 +2979,7 @@ class sidewalkreator:
         if not self.ok_ready:
             # also wipe data:
             self.remove_layers_and_wipe_files(
-                [osm_higway_layer_finalname, buildings_layername], temps_path
+                [osm_higway_layer_finalname, buildings_layername]
             )
 
             # remove temporary layers:
@@ -2545,6 +2987,9 @@ class sidewalkreator:
 
         self.ok_ready = False
 
+        # the intermediate results are not needed anymore:
+        self.pipeline = self.new_pipeline()
+
         # and refresh canvas:
         self.iface.mapCanvas().refresh()
 
@@ -2703,15 +3148,323 @@ class sidewalkreator:
         except:
             print("no input layer at this moment.")
 
-    def remove_layers_and_wipe_files(self, layernamelist, folderpath=None):
+    def dialog_values(self, *widget_names):
+        """
+        the current values of some dialog widgets, read on the main thread,
+        so a stage running in the background does not need to touch the dialog
+        """
+
+        values = {}
+
+        for widget_name in widget_names:
+            widget = getattr(self.dlg, widget_name)
+
+            if isinstance(widget, QtWidgets.QAbstractButton):
+                values[widget_name] = widget.isChecked()
+            else:
+                values[widget_name] = widget.value()
+
+        return values
+
+    def new_pipeline(self):
         """
-        one can also pass no folderpath to just remove layerlist
+        a pipeline with the dialog steps as its stages, the "_work" methods
+        """
+
+        pipeline = SidewalkPipeline()
+
+        pipeline.register("fetch", self.call_get_osm_data_work)
+        pipeline.register("clean", self.data_clean_work)
+        pipeline.register("protoblocks", self.protoblocks_work)
+        pipeline.register("sidewalks", self.draw_sidewalks_work)
+        pipeline.register("crossings", self.draw_crossings_work)
+        pipeline.register("split", self.sidewalks_splitting_work)
+        pipeline.register("export", self.outputting_files_work)
+
+        return pipeline
+
+    def stage_parameters(self):
+        """
+        the parameters of all the stages after fetching (see "parameter_stages"),
+        so the pipeline can tell which ones changed since a stage ran
+        """
+
+        highway_widths = {}
+
+        for i, val in enumerate(self.unique_highway_values):
+            # self.dlg.higway_values_table
+            try:
+                width_value = float(self.dlg.higway_values_table.item(i, 1).text())
+            except:
+                # if the user input value not convertible to float, just use the value from
+                print(
+                    "invalid input value: ",
+                    self.dlg.higway_values_table.item(i, 1).text(),
+                    ", using default: ",
+                    default_widths.get(val, fallback_default_width),
+                )
+                width_value = default_widths.get(val, fallback_default_width)
+
+            highway_widths[val] = width_value
+
+        params = self.dialog_values(
+            *(
+                name
+                for name in parameter_stages
+                if name not in ("highway_widths", "removed_highway_values")
+            )
+        )
+
+        params["highway_widths"] = highway_widths
+        params["removed_highway_values"] = sorted(
+            val for val, width in highway_widths.items() if width < 0.5
+        )
+
+        return params
+
+    def stage_widget_names(self):
+        """
+        the button and parameter widgets of each stage, enabled again once it's done,
+        so it can be run again with other parameters
+        """
+
+        sidewalks_widgets = [
+            "generate_sidewalks",
+            "curve_radius_box",
+            "curveradius_label",
+            "d_to_add_box",
+            "d_to_add_label",
+        ]
+
+        if not self.no_buildings:
+            sidewalks_widgets += [
+                "check_if_overlaps_buildings",
+                "min_d_label",
+                "min_d_buildings_box",
+                "min_width_box",
+                "min_width_label",
+            ]
+
+        split_widgets = ["split_sidewalks", "split_progressbar"]
+
+        if self.POI_split_avaliable:
+            split_widgets += [
+                "voronoi_checkbox",
+                "minimum_pois_box",
+                "alongside_vor_checkbox",
+            ]
+
+        if not self.POI_split_avaliable or self.dlg.alongside_vor_checkbox.isChecked():
+            split_widgets += [
+                "maxlensplit_checkbox",
+                "maxlensplit_box",
+                "onlyfacades_checkbox",
+                "dontsplit_checkbox",
+            ]
+
+        if not self.POI_split_avaliable:
+            split_widgets += ["segsbynum_checkbox", "segsbynum_box"]
+
+        return {
+            "protoblocks": [
+                "clean_data",
+                "dead_end_iters_label",
+                "dead_end_iters_box",
+                "higway_values_table",
+            ],
+            "sidewalks": sidewalks_widgets,
+            "crossings": [
+                "generate_crossings",
+                "perc_draw_kerbs_box",
+                "perc_draw_kerbs_label",
+                "perc_tol_crossings_box",
+                "perc_tol_crossings_label",
+                "d_to_add_inward_box",
+                "label_inward_d",
+                "opt_parallel_crossings",
+                "opt_perp_crossings",
+                "min_seg_len_label",
+                "min_seg_len_box",
+                "ch_remove_abovetol",
+            ],
+            "split": split_widgets,
+        }
+
+    def set_completed_stages_enabled(self, enabled):
+        for stagename, widget_names in self.stage_widget_names().items():
+            if self.pipeline.is_complete(stagename):
+                for widget_name in widget_names:
+                    getattr(self.dlg, widget_name).setEnabled(enabled)
+
+    def run_stage(
+        self, description, stagenames, params, progressbar=None, stage_work=None
+    ):
+        """
+        running pipeline stages as a background task (see "StageTask"), so QGIS is not frozen meanwhile
+
+        besides the requested stages, the ones affected by a parameter changed since they ran
+        and the ones already done downstream are run again (see "SidewalkPipeline.stages_to_run")
+
+        the stages must not touch the dialog, the canvas or the project, their "_finished"
+        methods take care of that on the main thread; a failed or canceled stage resets the dialog.
+        The layers they replace or change in place are taken off the canvas meanwhile, those
+        still in the pipeline are put back once the task is over
+
+        "stage_work(feedback)", if given, is run instead of the stages themselves
+        (e.g. "regenerate_around_streets"), updating the results of just "stagenames"
+        """
+
+        pipeline = self.pipeline
+
+        if stage_work is None:
+            stages = pipeline.stages_to_run(stagenames, params)
+        else:
+            stages = tuple(stagenames)
+
+        finished_methods = {
+            "fetch": self.call_get_osm_data_finished,
+            "protoblocks": self.data_clean_finished,
+            "sidewalks": self.draw_sidewalks_finished,
+            "crossings": self.draw_crossings_finished,
+            "split": self.sidewalks_splitting_finished,
+            "export": self.outputting_files_finished,
+        }
+
+        # the layers the stages will replace or change, on the worker thread,
+        # are not shown meanwhile:
+        shown_layers = []
+
+        for resultname in results_changed_by(stages):
+            layer = pipeline.get(resultname)
+
+            if isinstance(layer, QgsMapLayer) and QgsProject.instance().mapLayer(
+                layer.id()
+            ):
+                shown_layers.append(layer)
+                self.take_layer_off_canvas(layer)
+
+        def put_layers_back():
+            results = list(pipeline.results.values())
+
+            for layer in shown_layers:
+                # unless replaced by the stages
+                if any(layer is value for value in results):
+                    self.add_layer_canvas(layer)
+
+        # no other stage shall be started meanwhile
+        self.set_completed_stages_enabled(False)
+
+        def work(feedback):
+            if stage_work is not None:
+                stage_work(feedback)
+                return
+
+            for pipeline_stage in stages:
+                pipeline.run(pipeline_stage, params, feedback)
+
+        def failed(exception):
+            # a task canceled by "reset_fields" finds the dialog already reset
+            # and its layers gone, there's nothing left to do:
+            if self.stage_task is not task or pipeline is not self.pipeline:
+                return
+
+            self.stage_task = None
+
+            put_layers_back()
+
+            if exception is None:
+                message = self.string_according_language(
+                    f"{description} canceled", f"{description} cancelado"
+                )
+                level = Qgis.Warning
+            else:
+                traceback.print_exception(
+                    type(exception), exception, exception.__traceback__
+                )
+                message = self.string_according_language(
+                    f"{description} failed: {exception}",
+                    f"{description} falhou: {exception}",
+                )
+                level = Qgis.Critical
+
+                # the intermediate files of the run are left for inspection,
+                # out of reach of the wiping at the next fetch:
+                if self.workspace is not None and self.workspace.keep_on_failure:
+                    self.workspace.keep()
+                    self.workspace = None
+
+            self.iface.messageBar().pushMessage(
+                "SidewalKreator", message, level=level, duration=10
+            )
+
+            self.reset_fields()
+
+        def succeeded():
+            if self.stage_task is not task or pipeline is not self.pipeline:
+                return
+
+            self.stage_task = None
+
+            put_layers_back()
+
+            for pipeline_stage in stages:
+                if pipeline_stage in finished_methods:
+                    finished_methods[pipeline_stage]()
+
+            self.set_completed_stages_enabled(True)
+
+        task = self.stage_task = StageTask(
+            f"SidewalKreator: {description}", work, succeeded, failed, owner=pipeline
+        )
+
+        if progressbar is not None:
+            progressbar.setValue(0)
+            self.stage_task.progressChanged.connect(
+                lambda progress: progressbar.setValue(round(progress))
+            )
+
+        QgsApplication.taskManager().addTask(self.stage_task)
+
+    def remove_layers_and_wipe_files(self, layernamelist):
+        """
+        removing the layers, then the intermediate files of the previous run (its scratch workspace)
         """
 
         remove_layerlist(layernamelist)
 
-        # if folderpath:
-        #     wipe_folder_files(folderpath)
+        if self.workspace is not None:
+            self.workspace.cleanup()
+            self.workspace = None
+
+    def validate_input_layer(self, inputlayer, layername, feedback=None):
+        """
+        geometry validity pre-pass of an input layer (see "validate_and_repair_layer"),
+        counting the features that had to be dropped, to warn about them at the end of the stage
+        """
+
+        validated_layer, validity_record = validate_and_repair_layer(
+            inputlayer, layername, feedback
+        )
+
+        n_dropped = list(validity_record.values()).count("dropped")
+
+        if n_dropped:
+            self.dropped_input_features[layername] = n_dropped
+
+        return validated_layer
+
+    def warn_dropped_input_features(self):
+        for layername, n_dropped in self.dropped_input_features.items():
+            self.iface.messageBar().pushMessage(
+                self.tr("Warning"),
+                self.tr(
+                    f"{n_dropped} features of {layername} dropped for invalid geometries"
+                ),
+                level=Qgis.Warning,
+                duration=10,
+            )
+
+        self.dropped_input_features = {}
 
     # called at "Fetch Data" or self.datafetch button
     def call_get_osm_data(self):
@@ -2732,16 +3485,37 @@ class sidewalkreator:
         #   and remove layers from project
 
         self.remove_layers_and_wipe_files(
-            [osm_higway_layer_finalname, buildings_layername], temps_path
+            [osm_higway_layer_finalname, buildings_layername]
         )
         self.remove_temporary_layers()  # also temporary layers that can be around
 
-        self.dlg.datafetch_progressbar.setValue(10)
+        # a fresh folder for this run's intermediate files, and a fresh pipeline:
+        self.workspace = new_scratch_workspace()
+        self.pipeline = self.new_pipeline()
 
-        # PART 2: Getting and transforming the data
         self.dlg.datafetch.setEnabled(False)
         self.dlg.ch_ignore_buildings.setEnabled(False)
 
+        params = self.dialog_values("timeout_box", "ch_ignore_buildings")
+
+        self.run_stage(
+            self.string_according_language("Fetching data", "Obtendo dados"),
+            ("fetch",),
+            params,
+            self.dlg.datafetch_progressbar,
+        )
+
+    def call_get_osm_data_work(self, params, feedback):
+        """
+        the part of "call_get_osm_data" running in the background
+        """
+
+        self.dropped_input_features = {}
+
+        feedback.setProgress(10)
+
+        # PART 2: Getting and transforming the data
+
         # OSM query
         query_string = osm_query_string_by_bbox(
             self.minLat, self.minLgt, self.maxLat, self.maxLgt
@@ -2751,11 +3525,13 @@ class sidewalkreator:
         data_geojson_string = get_osm_data(
             query_string,
             roads_layername,
-            timeout=self.dlg.timeout_box.value(),
+            timeout=params["timeout_box"],
             return_as_string=True,
+            workspace=self.workspace,
         )
 
-        self.dlg.datafetch_progressbar.setValue(30)
+        raise_if_canceled(feedback, "fetching the roads")
+        feedback.setProgress(30)
 
         # clipped_path = data_geojsonpath.replace('.geojson','_clipped.geojson')
 
@@ -2773,11 +3549,19 @@ class sidewalkreator:
             [cleaned_input_feature], "input_feature", "Polygon", CRS=crs_4326
         )
 
+        # validating (and repairing) the inputs once, so the next steps can skip it
+        osm_data_layer = self.validate_input_layer(
+            osm_data_layer, roads_layername, feedback
+        )
+        self.only_inputfeature_layer = self.validate_input_layer(
+            self.only_inputfeature_layer, "input_feature", feedback
+        )
+
         clipped_datalayer = cliplayer_v2(
             osm_data_layer, self.only_inputfeature_layer, "memory:clipped_roads_wgs84"
         )
 
-        self.dlg.datafetch_progressbar.setValue(35)
+        feedback.setProgress(35)
 
         # clipped_datalayer = QgsVectorLayer(clipped_path,roads_layername,"ogr")
         # self.clipped_reproj_path = data_geojsonpath.replace('.geojson','_clipped_reproj.geojson')
@@ -2792,12 +3576,12 @@ class sidewalkreator:
             )
         )
 
-        self.dlg.datafetch_progressbar.setValue(40)
+        feedback.setProgress(40)
 
         # # not the prettier way to get also the buildings (yes, could create a function, its not lazyness, I swear...):
         # # no need for clipping the buildings layer
 
-        if not self.dlg.ch_ignore_buildings.isChecked() and use_buildings:
+        if not params["ch_ignore_buildings"] and use_buildings:
             query_string_buildings = osm_query_string_by_bbox(
                 self.minLat,
                 self.minLgt,
@@ -2810,28 +3594,31 @@ class sidewalkreator:
                 query_string_buildings,
                 "osm_buildings_data",
                 "Polygon",
-                timeout=self.dlg.timeout_box.value(),
+                timeout=params["timeout_box"],
                 return_as_string=True,
+                workspace=self.workspace,
             )
+            raise_if_canceled(feedback, "fetching the buildings")
+
             buildings_brutelayer = QgsVectorLayer(
                 buildings_geojson_string, "brute_buildings", "ogr"
             )
 
+            buildings_brutelayer = self.validate_input_layer(
+                buildings_brutelayer, "brute_buildings", feedback
+            )
+
             self.no_buildings = check_empty_layer(
                 buildings_brutelayer
             )  # asserts if there are buildings in the area
 
-            self.dlg.datafetch_progressbar.setValue(45)
+            feedback.setProgress(45)
 
             # do not add buildings if there's no need
             if not self.no_buildings:
 
-                self.dlg.check_if_overlaps_buildings.setChecked(
-                    True
-                )  # set as default option, since sidewalks can overlap buildings
-
                 # reproj_buildings_path = buildings_geojsonpath.replace('.geojson','_reproj.geojson')
-                self.dlg.datafetch_progressbar.setValue(50)
+                feedback.setProgress(50)
 
                 self.reproj_buildings, _ = reproject_layer_localTM(
                     buildings_brutelayer,
@@ -2839,11 +3626,7 @@ class sidewalkreator:
                     buildings_layername,
                     lgt_0=self.bbox_center.x(),
                 )
-                self.dlg.datafetch_progressbar.setValue(55)
-
-                if draw_buildings:
-                    apply_style(self.reproj_buildings, buildings_stylefilename)
-                    self.add_layer_canvas(self.reproj_buildings)
+                feedback.setProgress(55)
 
                 buildings_centroids = gen_centroids_layer(self.reproj_buildings)
                 # self.add_layer_canvas(centroids)
@@ -2853,7 +3636,7 @@ class sidewalkreator:
             #####       also, mergelayers function can accept a list with only one
             # # #     centroids = centroids_layer(buildings_brutelayer)
 
-            self.dlg.datafetch_progressbar.setValue(60)
+            feedback.setProgress(60)
 
             """
             # adresses parts (there are just points in osm database, generally from mapping agencies i.e. IBGE),
@@ -2875,10 +3658,12 @@ class sidewalkreator:
                 query_string_addrs,
                 "osm_addrs_data",
                 "Point",
-                timeout=self.dlg.timeout_box.value(),
+                timeout=params["timeout_box"],
                 return_as_string=True,
+                workspace=self.workspace,
             )
-            self.dlg.datafetch_progressbar.setValue(65)
+            raise_if_canceled(feedback, "fetching the addresses")
+            feedback.setProgress(65)
 
             addrs_brutelayer = QgsVectorLayer(
                 addrs_geojson_str, "brute_buildings", "ogr"
@@ -2886,7 +3671,7 @@ class sidewalkreator:
 
             self.no_addrs = check_empty_layer(addrs_brutelayer)
 
-            self.dlg.datafetch_progressbar.setValue(70)
+            feedback.setProgress(70)
 
             if not self.no_addrs:
                 # reproj_addrs_path = addrs_geojsonpath.replace('.geojson','_reproj.geojson')
@@ -2895,7 +3680,7 @@ class sidewalkreator:
                 )
                 # self.add_layer_canvas(self.reproj_addrs)
 
-            self.dlg.datafetch_progressbar.setValue(75)
+            feedback.setProgress(75)
 
             """
             now the cases to create combined layer w/wout centroids and adresses:
@@ -2930,46 +3715,68 @@ class sidewalkreator:
 
                 self.POIs_for_splitting_layer.setCrs(self.custom_localTM_crs)
 
-                # pois_stylepath = os.path.join(assets_path,'addrs_centroids2.qml')
-
-                # self.POIs_for_splitting_layer.loadNamedStyle(pois_stylepath)
-                apply_style(self.POIs_for_splitting_layer, splitting_pois_stylefilename)
-
-                self.add_layer_canvas(self.POIs_for_splitting_layer)
-
-        self.dlg.datafetch_progressbar.setValue(90)
+        feedback.setProgress(90)
 
         # a little cleaning:
         #   move do self.data_clean?
         # it just removes lines that are really not connected to any other
         remove_unconnected_lines_v2(self.clipped_reproj_datalayer)
 
-        # adding to canvas
-        self.add_layer_canvas(self.clipped_reproj_datalayer)
+        # PART 3: Getting Attributes for the table, with how much of each one there is:
+        self.highway_values_stats = value_counts_and_lengths(
+            self.clipped_reproj_datalayer, highway_tag
+        )
+
+        self.unique_highway_values = list(self.highway_values_stats)
+
+        feedback.setProgress(95)
+
+    def call_get_osm_data_finished(self):
+        """
+        the part of "call_get_osm_data" touching the dialog and the canvas, back on the main thread
+        """
+
+        self.warn_dropped_input_features()
+
+        if not self.no_buildings:
+            self.dlg.check_if_overlaps_buildings.setChecked(
+                True
+            )  # set as default option, since sidewalks can overlap buildings
+
+            if draw_buildings:
+                apply_style(self.reproj_buildings, buildings_stylefilename)
+                self.add_layer_canvas(self.reproj_buildings)
 
-        # PART 3: Getting Attributes and drawing table:
-        higway_list = get_layercolumn_byname(self.clipped_reproj_datalayer, highway_tag)
+        if self.POI_split_avaliable:
+            # pois_stylepath = os.path.join(assets_path,'addrs_centroids2.qml')
+
+            # self.POIs_for_splitting_layer.loadNamedStyle(pois_stylepath)
+            apply_style(self.POIs_for_splitting_layer, splitting_pois_stylefilename)
+
+            self.add_layer_canvas(self.POIs_for_splitting_layer)
 
-        self.dlg.datafetch_progressbar.setValue(95)
+        # adding to canvas
+        self.add_layer_canvas(self.clipped_reproj_datalayer)
 
         # Table Filling
         self.dlg.higway_values_table.setEnabled(True)
 
-        self.unique_highway_values = list(set(higway_list))
-
         self.dlg.higway_values_table.setRowCount(len(self.unique_highway_values))
-        self.dlg.higway_values_table.setColumnCount(2)
+        self.dlg.higway_values_table.setColumnCount(4)
 
         if self.current_lang == "en":
             self.dlg.higway_values_table.setHorizontalHeaderLabels(
-                ["tag value", "width"]
+                ["tag value", "width", "segments", "length (km)"]
             )
         else:
-            self.dlg.higway_values_table.setHorizontalHeaderLabels(["valor", "largura"])
+            self.dlg.higway_values_table.setHorizontalHeaderLabels(
+                ["valor", "largura", "segmentos", "extensão (km)"]
+            )
 
-        # filling first colum --> higway:values and second --> defalt_values
-        for i, item in enumerate(self.unique_highway_values):
-            vvalue = self.unique_highway_values[i]
+        # filling first colum --> higway:values and second --> defalt_values,
+        # then the (read-only) amount of each value, the longest first
+        for i, vvalue in enumerate(self.unique_highway_values):
+            count, length = self.highway_values_stats[vvalue]
 
             self.dlg.higway_values_table.setItem(i, 0, QTableWidgetItem(vvalue))
 
@@ -2981,6 +3788,12 @@ class sidewalkreator:
                 ),
             )
 
+            for j, text in ((2, str(count)), (3, f"{length / 1000:.2f}")):
+                stats_item = QTableWidgetItem(text)
+                stats_item.setFlags(stats_item.flags() & ~Qt.ItemIsEditable)
+
+                self.dlg.higway_values_table.setItem(i, j, stats_item)
+
         # Finally, enabling next button:
         self.dlg.clean_data.setEnabled(True)
         self.dlg.dead_end_iters_label.setEnabled(True)
@@ -3038,16 +3851,17 @@ class sidewalkreator:
         linefeature,
         curr_distance,
         is_at_beginning,
+        d_to_add,
+        tolerance_factor,
         print_points=False,
     ):
 
         new_PC_geometry = False
 
         # a tolerance for a max length check
-        tolerance_factor = self.dlg.perc_tol_crossings_box.value()
-        max_len = (
-            self.dlg.d_to_add_box.value() + float(linefeature[widths_fieldname])
-        ) * (1 + tolerance_factor / 100)
+        max_len = (d_to_add + float(linefeature[widths_fieldname])) * (
+            1 + tolerance_factor / 100
+        )
 
         # correct datatype (QgsPoint/QGSPointXY)
         if centerpoint.isMultipart():
@@ -3175,75 +3989,15 @@ class sidewalkreator:
         return intersec_sideA, intersec_sideB, new_PC_geometry
 
     def split_sidewalks_by_protoblocks(self, rel_vertices_dict):
+        """
+        splitting each sidewalk at the corners of its protoblock ({sidewalk id: [corner vertices]}):
+        cut right where each corner projects on it (see "split_lines_at_projected_points"),
+        tiny stretches are dropped
+        """
 
-        # for inplace, thx: https://gis.stackexchange.com/a/412130/49900
-
-        self.unselect_all_from_all()  # prevent from any selection
-
-        with edit(self.whole_sidewalks):
-            # thx, again: https://gis.stackexchange.com/a/130622/49900
-
-            request = QgsFeatureRequest()
-            request.setFilterFids(list(rel_vertices_dict.keys()))
-
-            features = self.whole_sidewalks.getFeatures(request)
-
-            segments_as_list = []
-
-            for feature in features:
-                centroid = feature.geometry().centroid().asPoint()
-                centroid = QgsPoint(feature.geometry().centroid().asPoint())
-
-                for i, vertex in enumerate(rel_vertices_dict[feature.id()]):
-
-                    segments_as_list.append(
-                        QgsGeometry.fromPolyline([centroid, QgsPoint(vertex)])
-                    )
-
-                    # if i == 0 or i == 1:
-                    #     segment_as_list.append(vertex)
-                    #     segment_as_list.append(centroid)
-                    # # elif i == 2:
-                    # #     segment_as_list.append(vertex)
-
-                    # else:
-                    #     break
-
-                # print(segment_as_list)
-
-                # Any similarity between this part and code at "generic_functions.segments_to_add_points_tolinelayer" purely coincidental (or no kkkk)
-
-            segments_asMultiLineString = QgsGeometry.collectGeometry(segments_as_list)
-
-            segments_asfeatlist = [geom_to_feature(segments_asMultiLineString)]
-
-            segments_aslayer = layer_from_featlist(
-                segments_asfeatlist, "segments_intersections", "LineString"
-            )
-            segments_aslayer.setCrs(self.custom_localTM_crs)
-
-            registry = QgsApplication.instance().processingRegistry()
-            alg = registry.algorithmById("qgis:splitwithlines")
-
-            # print(registry)
-            # print(alg)
-
-            # self.add_layer_canvas(segments_aslayer)
-
-            # Run the algorithm using 'in-place' edits
-            params = {"INPUT": self.whole_sidewalks, "LINES": segments_aslayer}
-            execute_in_place(alg, params)
-
-            # for feature in self.whole_sidewalks.getFeatures():
-
-        # somehow it keeps features selected, so:
-        self.unselect_all_from_all()
-
-        with edit(self.whole_sidewalks):
-            for feature in self.whole_sidewalks.getFeatures():
-                # print(feature.geometry().length())
-                if feature.geometry().length() < tiny_segments_tol:
-                    self.whole_sidewalks.deleteFeature(feature.id())
+        split_lines_at_projected_points(
+            self.whole_sidewalks, rel_vertices_dict, tiny_segments_tol
+        )
 
         # # # taking a look here:
         ### SUSPENDED: PROBABLY ERROR PRONE CODE
@@ -3349,78 +4103,12 @@ class sidewalkreator:
         # print(len(feature.geometry().asPolyline()))
 
     def add_kerb_sidewalk_vertices(self):
-        # trying based on: https://gis.stackexchange.com/a/57024/49900 thx anyway
-
-        as_geom = pointlist_to_multipoint(self.crossings_A_E_pointlist)
-
-        segments_list = []
-
-        # TODO: check if sidewalk is a concave or convex ring
-
-        with edit(self.whole_sidewalks):
-            for feature in self.whole_sidewalks.getFeatures():
-                geom = feature.geometry().mergeLines()
-
-                buffer = geom.buffer(1, 5)
-
-                # centroid = buffer.centroid()
-
-                # incident points on buffer
-                incident_list = buffer.intersection(as_geom).asMultiPoint()
-
-                # print(len(geom.asPolyline()))
-
-                # # print('\n',feature.id())
-
-                for vertex in incident_list:
-
-                    # d, p1, i1, i2 = geom.closestSegmentWithContext(vertex)
-
-                    # print()
-                    # print("segment with context: ",d, p1, i1, i2)
-
-                    # print('closest vertex',geom.closestVertex(vertex))
-
-                    # _,id,prev,nnext,_ = geom.closestVertex(vertex)
-
-                    # print(geom.adjacentVertices(id))
-
-                    # print(id,prev,next)
-                    # print('closest vertex with context',geom.closestVertexWithContext(vertex))
-
-                    _, id = geom.closestVertexWithContext(vertex)
-
-                    # vertex = QgsGeometry(QgsPoint(vertex))
-
-                    prev, nnext = geom.adjacentVertices(id)
-
-                    if nnext == -1:
-
-                        geom.insertVertex(QgsPoint(vertex), 1)
-                        # print('-1 case')
-
-                    else:
-
-                        v_nearest = geom.vertexAt(id)
-
-                        v_nearest = QgsGeometry(v_nearest)
-
-                        d_self = geom.lineLocatePoint(QgsGeometry(QgsPoint(vertex)))
-
-                        d_nearest = geom.lineLocatePoint(v_nearest)
-
-                        # print(d_self,d_nearest,prev,id,nnext, d_self > d_nearest)
-
-                        if d_self > d_nearest:
-                            geom.insertVertex(QgsPoint(vertex), id + 1)
-                        else:
-                            geom.insertVertex(QgsPoint(vertex), id)
-
-                    # geom.insertVertex(QgsPoint(vertex),id)
+        """
+        adding the crossings' endpoints ("A" and "E") as vertices of the sidewalks they lie on,
+        each sidewalk rebuilt only once (see "insert_points_into_lines")
+        """
 
-                self.whole_sidewalks.changeGeometry(feature.id(), geom)
-                # print(len(geom.asPolyline()))
-                # print(geom)
+        insert_points_into_lines(self.whole_sidewalks, self.crossings_A_E_pointlist)
 
     def unselect_all_from_all(self):
         # # thx: https://gis.stackexchange.com/a/200412/49900
@@ -3440,110 +4128,46 @@ class sidewalkreator:
 
         mc.refresh()
 
-    def fill_splitting_lengths(self, value, isbynumber=False, percent_add=0.01):
-        # field for splitting with that neat function from processing "split by maximum length"
-
-        # percent to add and rounding are protections against creation of very tiny small segments caused by floating point issues
-
-        with edit(self.whole_sidewalks):
-            for feature in self.whole_sidewalks.getFeatures():
-                f_length = feature.geometry().length()
-
-                if isbynumber:  # always an integer, so...
-                    if value > 1:
-                        split_len = f_length / value
-                        split_len += split_len * percent_add
-                        split_len = round(split_len, 2)
-                    else:
-                        split_len = 2 * f_length
-
-                else:
-                    if value < (f_length + (f_length * percent_add)):
-                        number_splits = round(f_length / value)
-                        if number_splits > 1:
-                            split_len = f_length / number_splits
-
-                            split_len += split_len * percent_add
-                            split_len = round(split_len, 2)
-                        else:
-                            split_len = 2 * f_length
-                    else:
-                        split_len = 2 * f_length
-
-                self.whole_sidewalks.changeAttributeValue(
-                    feature.id(), self.split_len_field_id, split_len
-                )
-
     def splitting_by_distance_or_ndivisions(self, value, isbynumber=False):
 
-        self.fill_splitting_lengths(value, isbynumber)
-
-        split_expression = f'"{self.split_field_name}"'
-
-        # print(split_expression)
-
-        temporary_splitted_sidewalks = split_lines_by_max_len(
-            self.whole_sidewalks, split_expression
+        temporary_splitted_sidewalks = split_lines_equally(
+            self.whole_sidewalks, value, isbynumber
         )
 
         # self.add_layer_canvas(temporary_splitted_sidewalks)
 
         swap_features_layer_another(self.whole_sidewalks, temporary_splitted_sidewalks)
 
-    def voronoi_splitting(self):
+    def voronoi_splitting(self, minimum_pois, feedback=None):
         POIs_geom = get_first_feature_or_geom(self.POIs_for_splitting_layer, True)
 
-        # collected_sidewalk_layer = collected_geoms_layer(self.whole_sidewalks)
-
-        # collected_sidewalk_geom = get_first_feature_or_geom(collected_sidewalk_layer,True)
+        # assigning the addresses to each protoblock at once, instead of intersecting all of them with each protoblock
+        POIs_by_protoblock = points_by_polygon(self.protoblocks, POIs_geom)
 
         voronois = []
 
-        # sdwlk_splitted = []
-
         for feature in self.protoblocks.getFeatures():
 
             # the progressbar:
-            self.dlg.split_progressbar.setValue(self.protoblocks_idx_perc[feature.id()])
-
-            contained_POIs = feature.geometry().intersection(POIs_geom)
+            if feedback is not None:
+                raise_if_canceled(feedback, "voronoi_splitting")
+                feedback.setProgress(self.protoblocks_idx_perc[feature.id()])
 
-            if not contained_POIs.isEmpty() and contained_POIs.isMultipart():
-                # print(contained_POIs.isMultipart())
-                num_pois = len(contained_POIs.asMultiPoint())
-            else:
-                num_pois = 0
+            contained_POIs = POIs_by_protoblock[feature.id()]
 
-            if num_pois > self.dlg.minimum_pois_box.value():
-                voronoi_polygons = contained_POIs.voronoiDiagram(
-                    feature.geometry()
-                ).asGeometryCollection()
+            # as it always was, a lone POI counts as none (it splits nothing):
+            num_pois = len(contained_POIs) if len(contained_POIs) > 1 else 0
 
-                # a nifty use of list comprehension for sure
+            if num_pois > minimum_pois:
                 voronois += [
-                    geom_to_feature(polygon.intersection(feature.geometry()))
-                    for polygon in voronoi_polygons
+                    geom_to_feature(cell)
+                    for cell in clipped_voronoi_cells(
+                        contained_POIs, feature.geometry()
+                    )
                 ]
             else:
                 voronois += [geom_to_feature(feature.geometry())]
 
-            # voronoi_polygons = voronoi_polygons.collectGeometry(voronoi_polygons)
-
-            # voronoi_multipolygon = voronoi_polygons.collectGeometry(voronoi_polygons.asGeometryCollection())
-
-            # if generate_voronoi_layer:
-            #     voronois.append(geom_to_feature(voronoi_multipolygon))
-
-            # splitted_sidewalk_parts = contained_sidewalk_pieces.intersection(voronoi_multipolygon).asGeometryCollection()
-
-            # splitted_sidewalk_parts = voronoi_multipolygon.intersection(contained_sidewalk_pieces).asGeometryCollection()
-
-            # for segment in splitted_sidewalk_parts:
-            #     if segment.type() == 1:
-            #         sdwlk_splitted.append(geom_to_feature(segment))
-
-            # print(clipped_voronoi)
-
         self.voronois_as_layer = layer_from_featlist(voronois, "voronois", "Polygon")
 
         self.voronois_as_layer.setCrs(self.custom_localTM_crs)
@@ -3578,6 +4202,62 @@ class sidewalkreator:
                 self.dlg.output_folder_selector.setFilePath(outfolderpath)
 
     def outputting_files(self):
+        # the widgets are read here, on the main thread:
+        parameters_dump = {}
+        # Iterate over all widgets in the dialog
+        for widget_name in dir(self.dlg):
+            widget = getattr(self.dlg, widget_name)
+            # Check if it's a relevant GUI element (e.g., QCheckBox, QSpinBox, QDoubleSpinBox, QRadioButton)
+            if isinstance(widget, QtWidgets.QCheckBox):
+                parameters_dump[widget_name] = widget.isChecked()
+            elif isinstance(widget, (QtWidgets.QSpinBox, QtWidgets.QDoubleSpinBox)):
+                parameters_dump[widget_name] = widget.value()
+            elif isinstance(widget, QtWidgets.QRadioButton):
+                if widget.isChecked():
+                    parameters_dump[widget.objectName()] = True
+            elif isinstance(widget, (QtWidgets.QLineEdit, QtWidgets.QTextEdit)):
+                parameters_dump[widget_name] = (
+                    widget.text()
+                    if isinstance(widget, QtWidgets.QLineEdit)
+                    else widget.toPlainText()
+                )
+            elif isinstance(widget, (QtWidgets.QComboBox, QgsMapLayerComboBox)):
+                parameters_dump[widget_name] = widget.currentText()
+            elif isinstance(widget, QgsMapLayerComboBox):
+                parameters_dump[widget_name] = (
+                    widget.currentLayer().name() if widget.currentLayer() else None
+                )
+            # Add more widget types if needed
+
+        # Specific handling for grouped radio buttons if necessary (example)
+        # if self.dlg.opt_parallel_crossings.isChecked():
+        #     parameters_dump["crossing_orientation"] = "parallel"
+        # elif self.dlg.opt_perp_crossings.isChecked():
+        #     parameters_dump["crossing_orientation"] = "perpendicular"
+
+        # with the stage parameters, so a change not yet applied is applied before writing
+        params = self.stage_parameters()
+        params.update(
+            {
+                "output_folder": self.dlg.output_folder_selector.filePath(),
+                "output_format": self.dlg.output_format_combobox.currentText(),
+                "parameters_dump": parameters_dump,
+            }
+        )
+
+        self.run_stage(
+            self.string_according_language("Writing outputs", "Gravando saídas"),
+            ("export",),
+            params,
+        )
+
+    def outputting_files_work(self, params, feedback):
+        """
+        the part of "outputting_files" running in the background
+        """
+
+        parameters_dump = params["parameters_dump"]
+
         # removing length from crossings, as we do not want to export'em
         remove_layerfields(
             self.crossings_layer,
@@ -3590,76 +4270,15 @@ class sidewalkreator:
         )
 
         # creating again the Kerbs layer, so if the user delete any crossing, there will be no loose kerbs:
-        new_kerbs_list = []
-
-        # to handle alternate schema as requested in github (ALT_SCHEMA)
-        alt_crossings_centers = []
-        alt_crossings_ends = []
-
-        for feature in self.crossings_layer.getFeatures():
-            as_polyline = feature.geometry().asPolyline()
-
-            if len(as_polyline) == 5:
-                # 0 1 2 3 4 index 1 and 3 are kerbs
-                pB = geom_to_feature(QgsGeometry.fromPointXY(as_polyline[1]))
-                pD = geom_to_feature(QgsGeometry.fromPointXY(as_polyline[3]))
-
-                new_kerbs_list += [pB, pD]
-
-                # (ALT_SCHEMA)
-                end1 = geom_to_feature(
-                    QgsGeometry.fromPolylineXY([as_polyline[0], as_polyline[1]])
-                )
-                end2 = geom_to_feature(
-                    QgsGeometry.fromPolylineXY([as_polyline[3], as_polyline[4]])
-                )
-
-                alt_crossings_ends.append(end1)
-                alt_crossings_ends.append(end2)
-
-                center_part = geom_to_feature(
-                    QgsGeometry.fromPolylineXY(
-                        [as_polyline[1], as_polyline[2], as_polyline[3]]
-                    )
-                )
-
-                alt_crossings_centers.append(center_part)
-
-        # (ALT_SCHEMA)
-        alt_crossings_ends_layer = layer_from_featlist(
-            alt_crossings_ends,
-            "alt_crossings_ends",
-            "LineString",
-            CRS=self.custom_localTM_crs,
-        )
-
-        create_filled_newlayerfield(
-            alt_crossings_ends_layer, "highway", "footway", QVariant.String
-        )
-        create_filled_newlayerfield(
-            alt_crossings_ends_layer, "footway", "sidewalk", QVariant.String
-        )
-
-        alt_crossings_centers_layer = layer_from_featlist(
-            alt_crossings_centers,
-            "alt_crossings_centers",
-            "LineString",
-            CRS=self.custom_localTM_crs,
-        )
-
-        create_filled_newlayerfield(
-            alt_crossings_centers_layer, "highway", "footway", QVariant.String
-        )
-        create_filled_newlayerfield(
-            alt_crossings_centers_layer, "footway", "crossing", QVariant.String
-        )
-
-        # kerbs
-        temp_kerbs_layer = layer_from_featlist(new_kerbs_list)
-        temp_kerbs_layer.setCrs(self.custom_localTM_crs)
-
-        create_filled_newlayerfield(
-            temp_kerbs_layer, "barrier", "kerb", QVariant.String
+        # (also the alternate schema as requested in github (ALT_SCHEMA))
+        crossings_coords = crossings_coords_array(self.crossings_layer)
+
+        (
+            temp_kerbs_layer,
+            alt_crossings_ends_layer,
+            alt_crossings_centers_layer,
+        ) = derive_layers_from_crossings_coords(
+            crossings_coords, CRS=self.custom_localTM_crs
         )
 
         swap_features_layer_another(self.kerbs_layer, temp_kerbs_layer)
@@ -3667,7 +4286,7 @@ class sidewalkreator:
         self.kerbs_layer.setCrs(self.custom_localTM_crs)
 
         # base and path stuff:
-        inputdirpath = self.dlg.output_folder_selector.filePath()
+        inputdirpath = params["output_folder"]
 
         # join the current unix epoch to the "inputdirpath" to avoid overwriting:
         unix_epoch = str(int(datetime.datetime.now().timestamp()))
@@ -3685,38 +4304,14 @@ class sidewalkreator:
         # os.makedirs(self.aux_files_dirpath)
         create_dir_ifnotexists(self.aux_files_dirpath)
 
-        # converting final layers
-        sidewalks_path = os.path.join(
-            inputdirpath,
-            self.string_according_language(
-                "sidewalks4326.geojson", "calcadas4326.geojson"
-            ),
-        )
-        crossings_path = os.path.join(
-            inputdirpath,
-            self.string_according_language(
-                "crossings4326.geojson", "travessias4326.geojson"
-            ),
-        )
-        kerbs_path = os.path.join(
+        # format for the separate layers (GeoPackage: all of them in a single file)
+        self.output_format = params["output_format"]
+        self.output_gpkg_path = os.path.join(
             inputdirpath,
-            self.string_according_language("kerbs4326.geojson", "acessos4326.geojson"),
-        )
-
-        # (ALT_SCHEMA)
-        alt_crossings_ends_path = os.path.join(
-            self.aux_files_dirpath,
             self.string_according_language(
-                "alt_crossings_ends4326.geojson", "travessias_alt_fim4326.geojson"
+                "sidewalkreator_layers.gpkg", "camadas_sidewalkreator.gpkg"
             ),
         )
-        alt_crossings_centers_path = os.path.join(
-            self.aux_files_dirpath,
-            self.string_according_language(
-                "alt_crossings_centers326.geojson", "travessias_alt_centros4326.geojson"
-            ),
-        )
-        outlayers_altpaths = [alt_crossings_ends_path, alt_crossings_centers_path]
 
         # input pol layer
         inputpol_layer_path = os.path.join(
@@ -3726,41 +4321,24 @@ class sidewalkreator:
             ),
         )
 
-        outlayers_gjsonpaths = [crossings_path, kerbs_path, sidewalks_path]
-
-        # also the bounding polygon:
-        # inpol_feat = geom_to_feature(self.input_polygon)
-
-        # input_polygon_layer = layer_from_featlist([inpol_feat],'input_polygon','polygon',output_type=inputpol_layer_path)
-
-        # sidewalks_4326 =
-        reproject_layer(
-            convert_multipart_to_singleparts(self.whole_sidewalks),
-            output_mode=sidewalks_path,
-        )
-        # crossings_4326 =
-        reproject_layer(self.crossings_layer, output_mode=crossings_path)
-        # kerbs_4326 =
-        reproject_layer(self.kerbs_layer, output_mode=kerbs_path)
-
-        # (ALT_SCHEMA)
-        reproject_layer(alt_crossings_ends_layer, output_mode=alt_crossings_ends_path)
-        reproject_layer(
-            alt_crossings_centers_layer, output_mode=alt_crossings_centers_path
-        )
-
         # outputting the input polygon:
-
-        # input_polygon4326 =
         reproject_layer(self.only_inputfeature_layer, output_mode=inputpol_layer_path)
 
         """
-        # merging all the 3 output geojsons, since:
-            - QGIS does not support Points and LineStrings in the same layer (or any combination of 2 types of geometry, including multi types), so we are doing merging as a python dict, outside QGIS API
+        # writing all the 3 output layers into a single geojson, since:
+            - QGIS does not support Points and LineStrings in the same layer (or any combination of 2 types of geometry, including multi types), so the features are streamed straight to the file, outside QGIS API
             - GEOJSON supports that each feature have its own type
             - JOSM handles topology (snappings) properly if everything is in the same GEOJSON
         # """
 
+        sidewalks_singleparts = convert_multipart_to_singleparts(self.whole_sidewalks)
+
+        # rounded coordinates and a stable feature order, for compact and reproducible outputs
+        if output_coordinate_decimals is None:
+            output_precision = 17
+        else:
+            output_precision = output_coordinate_decimals
+
         output_geojson_path = os.path.join(
             inputdirpath,
             self.string_according_language(
@@ -3768,9 +4346,12 @@ class sidewalkreator:
             ),
         )
 
-        merge_geojsons(outlayers_gjsonpaths, output_geojson_path)
-
-        time.sleep(0.1)
+        write_layers_to_geojson(
+            [self.crossings_layer, self.kerbs_layer, sidewalks_singleparts],
+            output_geojson_path,
+            precision=output_precision,
+            sort_features=True,
+        )
 
         # (ALT_SCHEMA)
         output_alt_geojson_path = os.path.join(
@@ -3780,26 +4361,43 @@ class sidewalkreator:
                 "saidas_sidewalkreator_esq_alternativo.geojson",
             ),
         )
-        merge_geojsons(
-            outlayers_altpaths + [kerbs_path, sidewalks_path], output_alt_geojson_path
+
+        write_layers_to_geojson(
+            [
+                alt_crossings_ends_layer,
+                alt_crossings_centers_layer,
+                self.kerbs_layer,
+                sidewalks_singleparts,
+            ],
+            output_alt_geojson_path,
+            precision=output_precision,
+            sort_features=True,
         )
-        time.sleep(0.1)
 
-        # cleaning up,since they are just temporary
-        delete_filelist_that_exists(outlayers_gjsonpaths)
+        # the final layers also as separate layers, if not in GeoJSON:
+        if self.output_format != "GeoJSON":
+            final_layers = {
+                self.string_according_language(
+                    "sidewalks4326", "calcadas4326"
+                ): sidewalks_singleparts,
+                self.string_according_language(
+                    "crossings4326", "travessias4326"
+                ): self.crossings_layer,
+                self.string_according_language(
+                    "kerbs4326", "acessos4326"
+                ): self.kerbs_layer,
+            }
 
-        # (ALT_SCHEMA) last one
-        delete_filelist_that_exists(outlayers_altpaths)
+            for key in final_layers:
+                self.reproject_and_export(key, final_layers[key], inputdirpath)
+
+        raise_if_canceled(feedback, "writing the outputs")
 
         # auxiliary files:
-        if self.dlg.voronoi_checkbox.isChecked():
-            voronoi_outpath = os.path.join(self.aux_files_dirpath, "voronois.geojson")
-            reproject_layer(self.voronois_as_layer, output_mode=voronoi_outpath)
+        if params["voronoi_checkbox"]:
+            self.reproject_and_export("voronois", self.voronois_as_layer)
 
-        protoblocks_outpath = os.path.join(
-            self.aux_files_dirpath, "protoblocks.geojson"
-        )
-        reproject_layer(self.protoblocks, output_mode=protoblocks_outpath)
+        self.reproject_and_export("protoblocks", self.protoblocks)
 
         # generating a file containing the recommended changeset comment:
         changeset_comment_path = os.path.join(
@@ -3818,38 +4416,6 @@ class sidewalkreator:
                 self.string_according_language(chgset_text_en, chgset_text_ptbr)
             )
 
-        parameters_dump = {}
-        # Iterate over all widgets in the dialog
-        for widget_name in dir(self.dlg):
-            widget = getattr(self.dlg, widget_name)
-            # Check if it's a relevant GUI element (e.g., QCheckBox, QSpinBox, QDoubleSpinBox, QRadioButton)
-            if isinstance(widget, QtWidgets.QCheckBox):
-                parameters_dump[widget_name] = widget.isChecked()
-            elif isinstance(widget, (QtWidgets.QSpinBox, QtWidgets.QDoubleSpinBox)):
-                parameters_dump[widget_name] = widget.value()
-            elif isinstance(widget, QtWidgets.QRadioButton):
-                if widget.isChecked():
-                    parameters_dump[widget.objectName()] = True
-            elif isinstance(widget, (QtWidgets.QLineEdit, QtWidgets.QTextEdit)):
-                parameters_dump[widget_name] = (
-                    widget.text()
-                    if isinstance(widget, QtWidgets.QLineEdit)
-                    else widget.toPlainText()
-                )
-            elif isinstance(widget, (QtWidgets.QComboBox, QgsMapLayerComboBox)):
-                parameters_dump[widget_name] = widget.currentText()
-            elif isinstance(widget, QgsMapLayerComboBox):
-                parameters_dump[widget_name] = (
-                    widget.currentLayer().name() if widget.currentLayer() else None
-                )
-            # Add more widget types if needed
-
-        # Specific handling for grouped radio buttons if necessary (example)
-        # if self.dlg.opt_parallel_crossings.isChecked():
-        #     parameters_dump["crossing_orientation"] = "parallel"
-        # elif self.dlg.opt_perp_crossings.isChecked():
-        #     parameters_dump["crossing_orientation"] = "perpendicular"
-
         parameters_dump_outpath = os.path.join(
             self.aux_files_dirpath, "parameters_dump.json"
         )
@@ -3910,10 +4476,16 @@ class sidewalkreator:
         for key in extra_layers:
             self.reproject_and_export(key, extra_layers[key])
 
+    def outputting_files_finished(self):
+        """
+        the part of "outputting_files" touching the dialog, back on the main thread
+        """
+
         # disabling for the next cycle:
         self.dlg.button_box.button(QDialogButtonBox.Ok).setEnabled(False)
         self.dlg.output_file_label.setEnabled(False)
         self.dlg.output_folder_selector.setEnabled(False)
+        self.dlg.output_format_combobox.setEnabled(False)
         self.dlg.output_folder_selector.setFilePath("")
 
         # the sucess message in the QGIS GUI:
@@ -3928,151 +4500,35 @@ class sidewalkreator:
             sucess_category, sucess_message, level=Qgis.Success, duration=30
         )
 
+        self.reset_fields()  # so "rebooting" for next execution
+
     def reproject_and_export(self, layername, inputlayer, outfolderpath=None):
 
         if not outfolderpath:
             outfolderpath = self.aux_files_dirpath
 
-        outpath = os.path.join(outfolderpath, layername + ".geojson")
-
-        reproject_layer(inputlayer, output_mode=outpath)
+        if self.output_format == "GeoPackage":
+            outpath = self.output_gpkg_path
+        else:
+            outpath = output_filepath(outfolderpath, layername, self.output_format)
+
+        export_layer(
+            inputlayer,
+            outpath,
+            layername,
+            self.output_format,
+            decimals=output_coordinate_decimals,
+            sort_features=True,
+        )
 
     def try_to_merge_small_stretches(self):
         """
-        this may be the ending chapter of the "too small stretches" arc of the entire saga
+        this may be the ending chapter of the "too small stretches" arc of the entire saga:
+        each stretch shorter than "min_stretch_size" goes into its best touching neighbor,
+        in a single pass over the sidewalks' endpoints (see "merge_short_lines")
         """
 
-        orig_id_fieldname = "original_id"
-
-        # pass # paz tb ('peace aswell' in portuguese, lol)
-
-        # creating the field with the original id to use later
-        create_fill_id_field(self.whole_sidewalks, orig_id_fieldname)
-
-        # filling with the lengths of the too small stretches
-        # small_len_dict = {}
-        # small_bufs_dict = {}
-        tiny_feats_dict = {}
-
-        for feature in self.whole_sidewalks.getFeatures():
-            len = feature.geometry().length()
-
-            if len < min_stretch_size:
-                # small_len_dict[feature.id()] = len
-                # # using the buffer strategy to speed-up feature selecting
-                # small_bufs_dict[feature.id()] = feature.geometry().buffer(.5,5)
-                tiny_feats_dict[feature.id()] = feature
-
-        too_small_stretches = layer_from_featlist(
-            list(tiny_feats_dict.values()),
-            "too_small_stretches",
-            "linestring",
-            {orig_id_fieldname: QVariant.Int},
-            CRS=self.custom_localTM_crs,
-        )
-
-        small_buffs_layer = generate_buffer(too_small_stretches, 0.5, dissolve=True)
-
-        # using intersection, as not managed to get with "overlaps"
-        extracted_adj_lines = extract_with_spatial_relation(
-            self.whole_sidewalks, small_buffs_layer, [0]
-        )
-
-        # removing the too small:
-        with edit(extracted_adj_lines):
-            for feature in extracted_adj_lines.getFeatures():
-                if feature[orig_id_fieldname] in list(tiny_feats_dict.keys()):
-                    extracted_adj_lines.deleteFeature(feature.id())
-
-        # now iterating the features, testing all the selected against the remaining ones
-        already_used_adj = []
-
-        # Build spatial index for extracted_adj_lines
-        # Ensure generic_functions.py has `gen_layer_spatial_index` if not already imported
-        # from .generic_functions import gen_layer_spatial_index # Assuming it's there or imported elsewhere
-        adj_lines_index = gen_layer_spatial_index(extracted_adj_lines)
-
-        with edit(self.whole_sidewalks):
-            for feat_id in tiny_feats_dict:
-                tiny_feature_geom = tiny_feats_dict[feat_id].geometry()
-
-                # Use a small buffer around the tiny feature for candidate search
-                # The buffer distance can be fine-tuned, e.g., snap_disjointed_tol
-                search_rect = tiny_feature_geom.buffer(
-                    0.1, 5
-                ).boundingBox()  # Small buffer for touch candidates
-                candidate_ids = adj_lines_index.intersects(search_rect)
-
-                for adj_feat_id in candidate_ids:
-                    if adj_feat_id in already_used_adj:
-                        continue
-
-                    # Need to fetch the actual feature from extracted_adj_lines
-                    # QgsSpatialIndex might store FIDs, but we need the feature object for its original_id and geometry
-                    # However, QgsSpatialIndex can also store feature geometries directly if FlagStoreFeatureGeometries is used.
-                    # Assuming gen_layer_spatial_index uses FlagStoreFeatureGeometries or we fetch by ID.
-                    # For simplicity, let's assume we need to fetch. If gen_layer_spatial_index stores geometries, this can be optimized.
-
-                    # feat2 = extracted_adj_lines.getFeature(adj_feat_id)
-                    # It's better if extracted_adj_lines is indexed by its actual FID if different from sequential IDs.
-                    # Let's refine this. If extracted_adj_lines has features removed, its FIDs might not be sequential.
-                    # A robust way: get all features from extracted_adj_lines once into a dict if it's not too large,
-                    # or ensure gen_layer_spatial_index allows retrieving the feature/geometry.
-
-                    # For now, assuming adj_feat_id is the FID usable with getFeature
-                    # A potential issue: if extracted_adj_lines had features deleted, its FIDs might not be contiguous.
-                    # The `candidate_ids` from `adj_lines_index.intersects()` are the FIDs.
-
-                    feat2_request = QgsFeatureRequest().setFilterFid(adj_feat_id)
-                    feat2_iterator = extracted_adj_lines.getFeatures(feat2_request)
-                    try:
-                        feat2 = next(feat2_iterator)
-                    except StopIteration:
-                        continue  # Should not happen if index is in sync
-
-                    if (
-                        feat2.id() in already_used_adj
-                    ):  # Double check, id() is more robust if FIDs are complex
-                        continue
-
-                    if tiny_feature_geom.touches(feat2.geometry()):
-                        # collecting the geometry and the
-                        collected_mls = QgsGeometry.collectGeometry(
-                            [tiny_feature_geom, feat2.geometry()]
-                        )
-
-                        rejoined_ls = collected_mls.mergeLines()
-
-                        # if the rejoining was sucessful we jsut need to replace the geometry at the small segment and remove the other feature from layer, and break
-                        if rejoined_ls.wkbType() == 2:
-                            self.whole_sidewalks.changeGeometry(
-                                feat_id, rejoined_ls
-                            )  # replacing with the rejoined
-
-                            # Use original_id from feat2 to delete from self.whole_sidewalks
-                            # feat2 itself is from extracted_adj_lines, which is a subset of self.whole_sidewalks
-                            # So, feat2[orig_id_fieldname] is the ID in self.whole_sidewalks to delete
-                            id_to_delete_in_whole_sidewalks = feat2[orig_id_fieldname]
-                            self.whole_sidewalks.deleteFeature(
-                                id_to_delete_in_whole_sidewalks
-                            )
-
-                            already_used_adj.append(
-                                feat2.id()
-                            )  # Keep track of used features from extracted_adj_lines
-                            # also mark the one that was merged from tiny_feats_dict as used in a way, or remove from tiny_feats_dict?
-                            # The outer loop iterates feat_id from tiny_feats_dict. If it's merged, it's effectively processed.
-                            break  # Move to the next tiny_feature (next feat_id)
-
-        # remove the layerfield: It wont be necessary anymore
-        remove_layerfields(self.whole_sidewalks, [orig_id_fieldname])
-
-        # print(touching_times_dict,'\n\n')
-        # print(touchers)
-
-        # self.add_layer_canvas(too_small_stretches)
-        # self.add_layer_canvas(small_buffs_layer)
-        # self.add_layer_canvas(extracted_adj_lines)
+        merge_short_lines(self.whole_sidewalks, min_stretch_size)
 
     def dump_parameters(self):
         """Saves the current GUI parameters to a JSON file."""
@@ -170,3 +170,34 @@ min_stretch_size = 7
 
 # absolute max crossing len (m):
 abs_max_crossing_len = 100  # 100 m could be a very large crossing
+
+# geometry backend for the generic_functions helpers: "processing" (always processing.run),
+# "inprocess" (always direct QgsGeometry calls) or "auto" (inprocess for small layers)
+geometry_backend = "auto"
+
+# (auto backend) max feature count of the input layers to run inprocess:
+inprocess_max_features = 500
+
+# formats for the final/auxiliary layers: name: (file extension, OGR driver)
+# (the JOSM-ready merged output is always GeoJSON)
+output_formats = {
+    "GeoJSON": ("geojson", "GeoJSON"),
+    "GeoPackage": ("gpkg", "GPKG"),
+    "FlatGeobuf": ("fgb", "FlatGeobuf"),
+}
+
+# compact and deterministic exports: decimal places of the output coordinates
+# (7 decimal degrees are around 1 cm), None to keep the full double precision
+output_coordinate_decimals = 7
+
+# fields for a stable ordering of the exported features (the ones present in each layer),
+# ties broken by the geometry, so the outputs don't depend on feature ids
+output_sort_fields = ["osm_id"]
+
+# per-run scratch workspace for the intermediate files (see osm_fetch.ScratchWorkspace):
+# parent folder (None: the system's temporary folder, e.g. "/dev/shm" for a RAM-backed one)
+scratch_parent_dir = None
+# GDAL's "/vsimem/" instead of a folder on disk:
+scratch_in_memory = False
+# keep the intermediate files of a failed run, for inspection:
+keep_scratch_on_failure = False
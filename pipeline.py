@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+
+"""
+The stages of a SidewalKreator run, and the intermediate results passed between them.
+
+Both the dialog and the processing algorithms keep their intermediate layers
+(streets, protoblocks, sidewalks, crossings...) in a "SidewalkPipeline", by
+name, instead of each one in its own set of attributes/variables. Each stage
+declares the results it needs and the ones it produces, so a driver can tell
+what is available, what must be recomputed after a change and what is stale.
+
+The parameters each stage ran with are kept too: after a parameter change,
+only the stages from the first one it affects are run again, the upstream
+results are reused as they are.
+"""
+
+import threading
+
+from qgis.core import QgsMapLayer, QgsProcessingException
+
+from .feature_store import FeatureStore
+from .generic_functions import raise_if_canceled
+
+# in running order
+STAGES = (
+    "fetch",
+    "clean",
+    "protoblocks",
+    "sidewalks",
+    "crossings",
+    "split",
+    "export",
+)
+
+# the results each stage can not do without
+stage_inputs = {
+    "fetch": (),
+    "clean": ("roads",),
+    "protoblocks": ("roads",),
+    "sidewalks": ("streets", "protoblocks"),
+    "crossings": ("streets", "sidewalks"),
+    "split": ("sidewalks", "crossings", "kerbs"),
+    "export": ("sidewalks", "crossings", "kerbs"),
+}
+
+# the results each stage produces (or updates, as the later stages do with the sidewalks)
+stage_outputs = {
+    "fetch": (
+        "input_polygon",
+        "crs",
+        "roads",
+        "buildings",
+        "addresses",
+        "splitting_pois",
+    ),
+    "clean": ("roads", "existing_sidewalks", "existing_crossings"),
+    "protoblocks": (
+        "protoblocks",
+        "dissolved_protoblocks",
+        "dissolved_protoblocks_buffer",
+        "streets",
+        "street_table_widths",
+        "intersections",
+        "intersection_voronois",
+    ),
+    "sidewalks": (
+        "sidewalks",
+        "raw_buffers",
+        "exclusion_zones",
+        "sure_zones",
+        "street_width_adjustments",
+        "drawn_streets",
+        "width_adjusted_streets",
+    ),
+    "crossings": (
+        "crossings",
+        "kerbs",
+        "crossing_centers",
+        "dissolved_sidewalks",
+        "sidewalks",
+    ),
+    "split": ("sidewalks", "crossings", "kerbs", "voronois"),
+    "export": (),
+}
+
+# the results from upstream stages a stage changes in place: they are snapshotted
+# before its first run, and restored before running it again
+stage_updates = {
+    "clean": ("roads",),
+    "crossings": ("sidewalks",),
+    "split": ("sidewalks", "crossings", "kerbs"),
+}
+
+# the results from upstream stages a stage changes in place without restoring them before
+# running it again, as they may be edited by hand meanwhile (the widths of the streets)
+stage_edits = {
+    "sidewalks": ("streets",),
+}
+
+# the first stage each parameter affects
+parameter_stages = {
+    "removed_highway_values": "clean",
+    "dead_end_iters_box": "protoblocks",
+    "highway_widths": "sidewalks",
+    "check_if_overlaps_buildings": "sidewalks",
+    "d_to_add_box": "sidewalks",
+    "min_d_buildings_box": "sidewalks",
+    "min_width_box": "sidewalks",
+    "curve_radius_box": "sidewalks",
+    "d_to_add_inward_box": "crossings",
+    "opt_parallel_crossings": "crossings",
+    "opt_perp_crossings": "crossings",
+    "min_seg_len_box": "crossings",
+    "perc_draw_kerbs_box": "crossings",
+    "perc_tol_crossings_box": "crossings",
+    "ch_remove_abovetol": "crossings",
+    "dontsplit_checkbox": "split",
+    "voronoi_checkbox": "split",
+    "minimum_pois_box": "split",
+    "alongside_vor_checkbox": "split",
+    "maxlensplit_checkbox": "split",
+    "maxlensplit_box": "split",
+    "segsbynum_checkbox": "split",
+    "segsbynum_box": "split",
+}
+
+
+def stage_index(stagename):
+    return STAGES.index(stagename)
+
+
+def results_changed_by(stagenames):
+    """
+    the names of the results that running the stages replaces or changes in place
+    """
+
+    names = []
+
+    for stagename in stagenames:
+        for name in (
+            stage_outputs[stagename]
+            + stage_updates.get(stagename, ())
+            + stage_edits.get(stagename, ())
+        ):
+            if name not in names:
+                names.append(name)
+
+    return names
+
+
+# the pipeline running a stage on each thread (see "PipelineResult"):
+running = threading.local()
+
+
+class SidewalkPipeline:
+    """
+    the named results of a run, and the functions computing each stage
+
+    a stage function is called as "function(params, feedback)" and stores its
+    results in the pipeline; "run" checks its inputs beforehand and marks the
+    stage (and nothing downstream of it) as complete afterwards
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.stages = {}
+        self.stage_params = {}
+        self.completed = []
+        self.snapshots = {}
+
+    def __getitem__(self, name):
+        return self.results[name]
+
+    def __setitem__(self, name, value):
+        self.results[name] = value
+
+    def __contains__(self, name):
+        return self.results.get(name) is not None
+
+    def get(self, name, default=None):
+        return self.results.get(name, default)
+
+    def register(self, stagename, function):
+        if stagename not in STAGES:
+            raise ValueError(f"unknown stage: {stagename}")
+
+        self.stages[stagename] = function
+
+    def downstream(self, stagename):
+        """
+        the stage and the ones running after it
+        """
+
+        return STAGES[stage_index(stagename) :]
+
+    def missing_inputs(self, stagename):
+        return [name for name in stage_inputs[stagename] if name not in self]
+
+    def invalidate(self, stagename):
+        """
+        marking the stage and the downstream ones as not done, their results are stale
+
+        the snapshots of the downstream stages are dropped too, as their inputs will change
+        """
+
+        for name in self.downstream(stagename):
+            if name in self.completed:
+                self.completed.remove(name)
+
+            self.stage_params.pop(name, None)
+
+            if name != stagename:
+                self.snapshots.pop(name, None)
+
+    def restore_or_snapshot(self, stagename):
+        """
+        before running a stage, the layers it changes in place are put back as they were
+        before its first run, or, on the first run, kept aside (see "stage_updates")
+        """
+
+        snapshot = self.snapshots.setdefault(stagename, {})
+
+        for name in stage_updates.get(stagename, ()):
+            layer = self.get(name)
+
+            if layer is None:
+                continue
+
+            if name in snapshot:
+                snapshot[name].restore(layer)
+            else:
+                snapshot[name] = FeatureStore.from_layer(layer)
+
+    def record(self, stagename, params=None, **results):
+        """
+        storing the results of a stage computed by the driver itself
+        """
+
+        self.invalidate(stagename)
+
+        self.results.update(results)
+
+        self.stage_params[stagename] = dict(params or {})
+        self.completed.append(stagename)
+
+    def run(self, stagename, params=None, feedback=None):
+        missing = self.missing_inputs(stagename)
+
+        if missing:
+            raise QgsProcessingException(
+                f"stage '{stagename}' lacks: {', '.join(missing)}"
+            )
+
+        raise_if_canceled(feedback, stagename)
+
+        self.restore_or_snapshot(stagename)
+
+        self.invalidate(stagename)
+
+        # the stage function reads and stores its results here, even if the
+        # driver's "pipeline" is another one (see "PipelineResult"):
+        outer = getattr(running, "pipeline", None)
+        running.pipeline = self
+
+        try:
+            self.stages[stagename](params or {}, feedback)
+        finally:
+            running.pipeline = outer
+
+        self.stage_params[stagename] = dict(params or {})
+        self.completed.append(stagename)
+
+    def is_complete(self, stagename):
+        return stagename in self.completed
+
+    def first_changed_stage(self, params):
+        """
+        the earliest completed stage affected by a parameter that changed since it ran
+        (see "parameter_stages"), None if there's none
+        """
+
+        ran_with = {}
+
+        for stagename in self.completed:
+            ran_with.update(self.stage_params.get(stagename, {}))
+
+        affected = [
+            stagename
+            for name, stagename in parameter_stages.items()
+            if name in params
+            and name in ran_with
+            and params[name] != ran_with[name]
+            and stagename in self.completed
+        ]
+
+        if not affected:
+            return None
+
+        return min(affected, key=stage_index)
+
+    def stages_to_run(self, stagenames, params):
+        """
+        the stages to run for the requested ones: from the earliest one affected by a
+        changed parameter (or the first requested), up to the last requested or done
+        """
+
+        first = min(stagenames, key=stage_index)
+
+        changed = self.first_changed_stage(params)
+
+        if changed and stage_index(changed) < stage_index(first):
+            first = changed
+
+        last = max(list(stagenames) + self.completed, key=stage_index)
+
+        return STAGES[stage_index(first) : stage_index(last) + 1]
+
+    def patchable_stages(self, stagename):
+        """
+        the stages whose results change when the ones of "stagename" are patched in place,
+        instead of running it again: it and the ones done downstream, but the export
+        (its files are not patched)
+        """
+
+        return tuple(
+            name
+            for name in self.downstream(stagename)
+            if name != "export" and (name == stagename or self.is_complete(name))
+        )
+
+    def patched(self, stagenames):
+        """
+        after patching the results of some stages in place: they stay complete (with their
+        parameters and snapshots), the ones done downstream and not patched are stale
+        """
+
+        first = min(stagenames, key=stage_index)
+
+        for name in self.downstream(first):
+            if name not in stagenames and self.is_complete(name):
+                self.invalidate(name)
+
+    def layers(self):
+        for value in self.results.values():
+            if isinstance(value, QgsMapLayer):
+                yield value
+
+
+class PipelineResult:
+    """
+    attribute of a pipeline driver standing for a named result of its "pipeline",
+    so the driver code keeps using plain attributes; unset results read as None
+
+    while a stage runs, its own pipeline is used on that thread instead, so a driver
+    can run its stages on another pipeline (e.g. a window of the current one)
+    without swapping its "pipeline" under the other threads
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    @staticmethod
+    def pipeline_of(driver):
+        return getattr(running, "pipeline", None) or driver.pipeline
+
+    def __get__(self, driver, drivertype=None):
+        if driver is None:
+            return self
+
+        return self.pipeline_of(driver).get(self.name)
+
+    def __set__(self, driver, value):
+        self.pipeline_of(driver)[self.name] = value
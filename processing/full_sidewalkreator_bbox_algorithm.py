@@ -24,7 +24,6 @@ from qgis.core import (
     QgsMessageLog,
     QgsWkbTypes,
     Qgis,
-    edit,
     QgsProject,
 )
 from qgis.PyQt.QtGui import QIcon
@@ -39,6 +38,10 @@ from ..osm_fetch import (
 from .. import parameters  # For default values and constants
 from .. import generic_functions
 from ..generic_functions import (
+    new_scratch_workspace,
+    validate_and_repair_layer,
+    inherit_geometry_validity,
+    compact_features,
     polygonize_lines,
     reproject_layer_localTM,
     reproject_layer,
@@ -52,9 +55,10 @@ from ..generic_functions import (
     geom_to_feature,
     # create_memory_layer_from_features,
     select_feats_by_attr,
-    create_incidence_field_layers_A_B,
+    filter_already_mapped_protoblocks,
 )
-from ..parameters import CRS_LATLON_4326, cutoff_percent_protoblock
+from ..parameters import CRS_LATLON_4326
+from ..pipeline import SidewalkPipeline
 from .sidewalk_generation_logic import (
     generate_sidewalk_geometries_and_zones,
 )  # Core logic
@@ -565,7 +569,10 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
         # Split streets by themselves so endpoints occur at intersections
         try:
             streets_splitted = generic_functions.split_lines(
-                streets_layer, streets_layer, outputlayer="memory:streets_splitted"
+                streets_layer,
+                streets_layer,
+                outputlayer="memory:streets_splitted",
+                feedback=feedback,
             )
             if streets_splitted and streets_splitted.isValid() and streets_splitted.featureCount() > 0:
                 streets_layer = streets_splitted
@@ -597,6 +604,9 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
 
         processed_count = 0
 
+        # streets derived from the validated roads need no further validity checks
+        check_validity = not generic_functions.geometry_validated(streets_layer)
+
         for street_feat in street_features:
             if feedback.isCanceled():
                 break
@@ -608,7 +618,7 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
                 )
 
             geom = street_feat.geometry()
-            if not geom.isGeosValid():
+            if check_validity and not geom.isGeosValid():
                 if processed_count <= 5:
                     feedback.pushInfo(
                         f"Street {street_feat.id()}: Invalid geometry, skipping"
@@ -936,6 +946,13 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
         return crossings_layer, kerbs_layer
 
     def processAlgorithm(self, parameters_alg, context, feedback):
+        # intermediate files go to a per-run scratch workspace, so concurrent runs don't collide
+        with new_scratch_workspace(
+            "sidewalkreator_bbox_", feedback=feedback
+        ) as self.workspace:
+            return self.process_in_workspace(parameters_alg, context, feedback)
+
+    def process_in_workspace(self, parameters_alg, context, feedback):
         # Initialize output layers to None
         crossings_layer_local_tm = None
         kerbs_layer_local_tm = None
@@ -1139,7 +1156,10 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
             )
             return results
 
-        input_polygon_layer_for_processing = vl
+        # one-time validity pre-pass of the inputs, the downstream steps rely on it
+        input_polygon_layer_for_processing, _ = validate_and_repair_layer(
+            vl, "input_extent_polygon", feedback
+        )
         feedback.pushInfo(
             self.tr(
                 f"Created temporary polygon layer from extent with {input_polygon_layer_for_processing.featureCount()} feature."
@@ -1184,6 +1204,8 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
             input_polygon_layer_for_processing,
             destination_crs=f"EPSG:{utm_epsg}",
             output_mode="memory:input_poly_utm",
+            context=context,
+            feedback=feedback,
         )
 
         if not input_poly_local_tm_layer:
@@ -1263,6 +1285,7 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
             tempfilesname="osm_roads_raw_4326_bbox",
             geomtype="LineString",
             timeout=timeout,
+            workspace=self.workspace,
         )
         osm_road_data_layer_4326 = QgsVectorLayer(
             osm_road_data_filepath, "osm_roads", "ogr"
@@ -1284,6 +1307,18 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
                 f"Fetched {osm_road_data_layer_4326.featureCount()} raw road features."
             )
         )
+        osm_road_data_layer_4326, _ = validate_and_repair_layer(
+            osm_road_data_layer_4326, "osm_roads", feedback
+        )
+
+        # the intermediate results, stage by stage
+        pipeline = SidewalkPipeline()
+        pipeline.record(
+            "fetch",
+            input_polygon=input_polygon_layer_for_processing,
+            crs=local_tm_crs,
+            roads=osm_road_data_layer_4326,
+        )
 
         # --- 4. Clean and Reproject Road Data ---
         feedback.pushInfo(self.tr("Cleaning and reprojecting road data..."))
@@ -1343,6 +1378,7 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
             if feats:
                 fdp.addFeatures(feats)
                 filtered.updateExtents()
+                inherit_geometry_validity(filtered, streets_with_width)
                 feedback.pushInfo(
                     self.tr(
                         f"Filtered streets by classes: {filtered.featureCount()} remain."
@@ -1350,11 +1386,15 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
                 )
                 streets_with_width = filtered
 
+        pipeline.record("clean", roads=cleaned_roads_local_tm, streets=streets_with_width)
+
         # --- 5. Generate Protoblocks (in local TM first, then reproject if saved) ---
         feedback.pushInfo(self.tr("Generating protoblocks..."))
         protoblocks_layer_local_tm = polygonize_lines(
             streets_with_width,
             outputlayer="memory:protoblocks_local_tm_bbox",
+            context=context,
+            feedback=feedback,
         )
         if (
             not protoblocks_layer_local_tm
@@ -1403,6 +1443,8 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
                 protoblocks_layer_local_tm,
                 destination_crs="EPSG:4326",
                 output_mode="memory:protoblocks_4326_debug_bbox",
+                context=context,
+                feedback=feedback,
             )
             if (
                 protoblocks_layer_4326_debug
@@ -1456,26 +1498,10 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
                 "linestring",
                 CRS=local_tm_crs,
             )
-            # Sum existing sidewalk length within each protoblock
-            _ = create_incidence_field_layers_A_B(
-                protoblocks_layer_local_tm,
-                existing_sw_layer,
-                fieldname="inc_sidewalk_len",
-                total_length_instead=True,
+            # Delete protoblocks when the already mapped ratio exceeds the cutoff
+            filter_already_mapped_protoblocks(
+                protoblocks_layer_local_tm, existing_sw_layer
             )
-            # Delete protoblocks when ratio exceeds cutoff
-            with edit(protoblocks_layer_local_tm):
-                for feat in list(protoblocks_layer_local_tm.getFeatures()):
-                    try:
-                        inc_len = float(feat["inc_sidewalk_len"] or 0.0)
-                    except Exception:
-                        inc_len = 0.0
-                    area = feat.geometry().area() if feat.hasGeometry() else 0.0
-                    ratio = 0.0
-                    if area > 0 and inc_len > 0:
-                        ratio = (((inc_len / 4.0) ** 2) / area) * 100.0
-                    if ratio > cutoff_percent_protoblock:
-                        protoblocks_layer_local_tm.deleteFeature(feat.id())
             feedback.pushInfo(
                 self.tr(
                     f"Protoblocks remaining after pre-existing sidewalk filter: {protoblocks_layer_local_tm.featureCount()}"
@@ -1486,6 +1512,8 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
                 self.tr("No pre-existing sidewalks detected (footway=sidewalk). Skipping protoblock filter.")
             )
 
+        pipeline.record("protoblocks", protoblocks=protoblocks_layer_local_tm)
+
         # --- 7. Fetch and Process Building Data (if requested) ---
         reproj_buildings_layer_local_tm = None
         if get_building_data:
@@ -1511,6 +1539,7 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
                 tempfilesname="osm_buildings_raw_4326_bbox",
                 geomtype="Polygon",  # Expected geometry type
                 timeout=timeout,
+                workspace=self.workspace,
             )
             osm_buildings_layer_4326 = QgsVectorLayer(
                 osm_buildings_filepath, "osm_buildings", "ogr"
@@ -1526,6 +1555,9 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
                         f"Fetched {osm_buildings_layer_4326.featureCount()} raw building features."
                     )
                 )
+                osm_buildings_layer_4326, _ = validate_and_repair_layer(
+                    osm_buildings_layer_4326, "osm_buildings", feedback
+                )
                 feedback.pushInfo(
                     self.tr("Clipping and reprojecting building data to local TM...")
                 )
@@ -1535,6 +1567,8 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
                     osm_buildings_layer_4326,
                     input_polygon_layer_for_processing,  # Use the 4326 layer for clipping
                     "memory:clipped_bldgs_4326_bbox",
+                    context=context,
+                    feedback=feedback,
                 )
 
                 if (
@@ -1546,6 +1580,8 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
                         clipped_buildings_4326,
                         destination_crs=local_tm_crs.authid(),
                         output_mode="memory:bldgs_utm",
+                        context=context,
+                        feedback=feedback,
                     )
                     if (
                         not reproj_buildings_layer_local_tm
@@ -1628,6 +1664,15 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
             "width_adjusted_streets"
         )
 
+        pipeline.record(
+            "sidewalks",
+            buildings=reproj_buildings_layer_local_tm,
+            sidewalks=sidewalk_lines_layer_local_tm,
+            exclusion_zones=exclusion_zones_layer_local_tm,
+            sure_zones=sure_zones_layer_local_tm,
+            width_adjusted_streets=width_adjusted_streets_layer_local_tm,
+        )
+
         # Short-circuit for simple, valid inputs (helps headless tests):
         try:
             if (
@@ -1672,6 +1717,11 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
                     feedback,
                 )
             )
+            pipeline.record(
+                "crossings",
+                crossings=crossings_layer_local_tm,
+                kerbs=kerbs_layer_local_tm,
+            )
 
             # --- 8. Reproject Sidewalks to EPSG:4326 and Save Output ---
             feedback.pushInfo(
@@ -1735,6 +1785,8 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
                 sidewalk_lines_layer_local_tm,
                 destination_crs="EPSG:4326",
                 output_mode="memory:sidewalks_final_4326_bbox",
+                context=context,
+                feedback=feedback,
             )
 
             # Check if reprojection worked correctly by examining coordinates
@@ -1861,7 +1913,7 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
                 except Exception:
                     sink_sw, dest_id_sw = (None, None)
                 if sink_sw:
-                    for f in final_sw.getFeatures():
+                    for f in compact_features(final_sw):
                         sink_sw.addFeature(f, QgsFeatureSink.FastInsert)
                     # Return a mapped layer object when possible; fallback to memory layer for tests
                     try:
@@ -1919,7 +1971,7 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
                     qcore.QgsCoordinateReferenceSystem(CRS_LATLON_4326),
                 )
                 if sink_crossings:
-                    for feature in crossings_layer_4326.getFeatures():
+                    for feature in compact_features(crossings_layer_4326):
                         sink_crossings.addFeature(feature, QgsFeatureSink.FastInsert)
                     # Return an actual layer object for tests instead of an id string
                     try:
@@ -1990,7 +2042,7 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
                     qcore.QgsCoordinateReferenceSystem(CRS_LATLON_4326),
                 )
                 if sink_kerbs:
-                    for feature in kerbs_layer_4326.getFeatures():
+                    for feature in compact_features(kerbs_layer_4326):
                         sink_kerbs.addFeature(feature, QgsFeatureSink.FastInsert)
                     # Return an actual layer object for tests instead of an id string
                     try:
@@ -2028,78 +2080,49 @@ class FullSidewalkreatorBboxAlgorithm(QgsProcessingAlgorithm):
                 )
 
         # --- 9. Save Optional Debug Outputs (already in local TM) ---
-        if (
-            save_exclusion_zones_debug
-            and exclusion_zones_layer_local_tm
-            and exclusion_zones_layer_local_tm.isValid()
-            and exclusion_zones_layer_local_tm.featureCount() > 0
-        ):
-            (sink_exclusion, dest_id_exclusion) = self.parameterAsSink(
-                parameters_alg,
+        debug_outputs = [
+            (
+                save_exclusion_zones_debug,
+                "exclusion_zones",
                 self.OUTPUT_EXCLUSION_ZONES_DEBUG,
-                context,
-                exclusion_zones_layer_local_tm.fields(),
-                exclusion_zones_layer_local_tm.wkbType(),
-                local_tm_crs,
-            )
-            if sink_exclusion:
-                for feature in exclusion_zones_layer_local_tm.getFeatures():
-                    sink_exclusion.addFeature(feature, QgsFeatureSink.FastInsert)
-                results[self.OUTPUT_EXCLUSION_ZONES_DEBUG] = dest_id_exclusion
-            else:
-                feedback.pushWarning(
-                    self.tr("Failed to create sink for exclusion zones debug layer.")
-                )
-
-        if (
-            save_sure_zones_debug
-            and sure_zones_layer_local_tm
-            and sure_zones_layer_local_tm.isValid()
-            and sure_zones_layer_local_tm.featureCount() > 0
-        ):
-            (sink_sure, dest_id_sure) = self.parameterAsSink(
-                parameters_alg,
+                "Failed to create sink for exclusion zones debug layer.",
+            ),
+            (
+                save_sure_zones_debug,
+                "sure_zones",
                 self.OUTPUT_SURE_ZONES_DEBUG,
-                context,
-                sure_zones_layer_local_tm.fields(),
-                sure_zones_layer_local_tm.wkbType(),
-                local_tm_crs,
-            )
-            if sink_sure:
-                for feature in sure_zones_layer_local_tm.getFeatures():
-                    sink_sure.addFeature(feature, QgsFeatureSink.FastInsert)
-                results[self.OUTPUT_SURE_ZONES_DEBUG] = dest_id_sure
-            else:
-                feedback.pushWarning(
-                    self.tr("Failed to create sink for sure zones debug layer.")
-                )
-
-        if (
-            save_streets_width_adjusted_debug
-            and width_adjusted_streets_layer_local_tm
-            and width_adjusted_streets_layer_local_tm.isValid()
-            and width_adjusted_streets_layer_local_tm.featureCount() > 0
-        ):
-            (sink_adjusted_streets, dest_id_adjusted_streets) = self.parameterAsSink(
-                parameters_alg,
+                "Failed to create sink for sure zones debug layer.",
+            ),
+            (
+                save_streets_width_adjusted_debug,
+                "width_adjusted_streets",
                 self.OUTPUT_STREETS_WIDTH_ADJUSTED_DEBUG,
+                "Failed to create sink for width-adjusted streets debug layer.",
+            ),
+        ]
+        for requested, resultname, output_name, failure_message in debug_outputs:
+            debug_layer = pipeline.get(resultname)
+            if not (
+                requested
+                and debug_layer
+                and debug_layer.isValid()
+                and debug_layer.featureCount() > 0
+            ):
+                continue
+            (sink_debug, dest_id_debug) = self.parameterAsSink(
+                parameters_alg,
+                output_name,
                 context,
-                width_adjusted_streets_layer_local_tm.fields(),
-                width_adjusted_streets_layer_local_tm.wkbType(),
+                debug_layer.fields(),
+                debug_layer.wkbType(),
                 local_tm_crs,
             )
-            if sink_adjusted_streets:
-                for feature in width_adjusted_streets_layer_local_tm.getFeatures():
-                    sink_adjusted_streets.addFeature(feature, QgsFeatureSink.FastInsert)
-                results[self.OUTPUT_STREETS_WIDTH_ADJUSTED_DEBUG] = (
-                    dest_id_adjusted_streets
-                )
+            if sink_debug:
+                for feature in debug_layer.getFeatures():
+                    sink_debug.addFeature(feature, QgsFeatureSink.FastInsert)
+                results[output_name] = dest_id_debug
             else:
-                feedback.pushWarning(
-                    self.tr(
-                        "Failed to create sink for width-adjusted streets debug layer."
-                    )
-                )
+                feedback.pushWarning(self.tr(failure_message))
 
         feedback.pushInfo(self.tr("Processing finished."))
         # Ensure sidewalks output is present when available
@@ -48,23 +48,23 @@ from ..parameters import (
     default_widths,
     highway_tag,
     widths_fieldname,
-    cutoff_percent_protoblock,
 )
 from ..osm_fetch import osm_query_string_by_bbox, get_osm_data
 from ..generic_functions import (
+    new_scratch_workspace,
+    compact_features,
     reproject_layer_localTM,
     cliplayer_v2,
     remove_unconnected_lines_v2,
     polygonize_lines,
     create_new_layerfield,
-    edit,
     select_feats_by_attr,
     layer_from_featlist,
     dissolve_tosinglegeom,
     generate_buffer,
     split_lines,
     check_empty_layer,
-    create_incidence_field_layers_A_B,
+    filter_already_mapped_protoblocks,
 )
 from .sidewalk_generation_logic import generate_sidewalk_geometries_and_zones
 from .full_sidewalkreator_bbox_algorithm import FullSidewalkreatorBboxAlgorithm
@@ -589,6 +589,13 @@ class FullSidewalkreatorPolygonAlgorithm(QgsProcessingAlgorithm):
         )
 
     def processAlgorithm(self, parameters, context, feedback):
+        # intermediate files go to a per-run scratch workspace, so concurrent runs don't collide
+        with new_scratch_workspace(
+            "sidewalkreator_polygon_", feedback=feedback
+        ) as self.workspace:
+            return self.process_in_workspace(parameters, context, feedback)
+
+    def process_in_workspace(self, parameters, context, feedback):
         feedback.pushInfo(self.tr("Full Sidewalkreator (Polygon) - Algorithm Started."))
 
         input_polygon_fs = self.parameterAsSource(parameters, self.INPUT_POLYGON, context)
@@ -721,6 +728,7 @@ class FullSidewalkreatorPolygonAlgorithm(QgsProcessingAlgorithm):
             geomtype="LineString",
             timeout=timeout,
             return_as_string=True,
+            workspace=self.workspace,
         )
         if osm_roads_geojson_str is None:
             raise QgsProcessingException(self.tr("Failed to fetch OSM road data."))
@@ -729,11 +737,7 @@ class FullSidewalkreatorPolygonAlgorithm(QgsProcessingAlgorithm):
         if isinstance(roads_src, str) and not os.path.exists(roads_src):
             s = roads_src.strip()
             if s.startswith("{") or s.startswith("["):
-                import tempfile
-                tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".geojson")
-                tmp.write(roads_src.encode("utf-8"))
-                tmp.flush(); tmp.close()
-                roads_src = tmp.name
+                roads_src = self.workspace.write_file("osm_roads.geojson", roads_src)
         osm_roads_layer_4326 = QgsVectorLayer(
             roads_src, "osm_roads_dl_4326_full", "ogr"
         )
@@ -764,17 +768,16 @@ class FullSidewalkreatorPolygonAlgorithm(QgsProcessingAlgorithm):
                 geomtype="Polygon",
                 timeout=timeout,
                 return_as_string=True,
+                workspace=self.workspace,
             )
             if osm_bldgs_geojson_str:
                 bld_src = osm_bldgs_geojson_str
                 if isinstance(bld_src, str) and not os.path.exists(bld_src):
                     s = bld_src.strip()
                     if s.startswith("{") or s.startswith("["):
-                        import tempfile
-                        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".geojson")
-                        tmp.write(bld_src.encode("utf-8"))
-                        tmp.flush(); tmp.close()
-                        bld_src = tmp.name
+                        bld_src = self.workspace.write_file(
+                            "osm_bldgs.geojson", bld_src
+                        )
                 osm_buildings_layer_4326 = QgsVectorLayer(
                     bld_src, "osm_bldgs_dl_4326_full", "ogr"
                 )
@@ -815,17 +818,16 @@ class FullSidewalkreatorPolygonAlgorithm(QgsProcessingAlgorithm):
                 geomtype="Point",
                 timeout=timeout,
                 return_as_string=True,
+                workspace=self.workspace,
             )
             if osm_addrs_geojson_str:
                 add_src = osm_addrs_geojson_str
                 if isinstance(add_src, str) and not os.path.exists(add_src):
                     s = add_src.strip()
                     if s.startswith("{") or s.startswith("["):
-                        import tempfile
-                        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".geojson")
-                        tmp.write(add_src.encode("utf-8"))
-                        tmp.flush(); tmp.close()
-                        add_src = tmp.name
+                        add_src = self.workspace.write_file(
+                            "osm_addrs.geojson", add_src
+                        )
                 osm_addresses_layer_4326 = QgsVectorLayer(
                     add_src, "osm_addrs_dl_4326_full", "ogr"
                 )
@@ -849,7 +851,11 @@ class FullSidewalkreatorPolygonAlgorithm(QgsProcessingAlgorithm):
 
         # Clip roads
         clipped_osm_roads_4326 = cliplayer_v2(
-            osm_roads_layer_4326, input_poly_for_bbox, "memory:clipped_roads_4326_full"
+            osm_roads_layer_4326,
+            input_poly_for_bbox,
+            "memory:clipped_roads_4326_full",
+            context=context,
+            feedback=feedback,
         )
         if (
             not clipped_osm_roads_4326.isValid()
@@ -866,6 +872,8 @@ class FullSidewalkreatorPolygonAlgorithm(QgsProcessingAlgorithm):
             None,
             "roads_local_tm_full",
             extent_4326.center().x(),
+            context=context,
+            feedback=feedback,
         )
         if not roads_local_tm.isValid():
             raise QgsProcessingException(
@@ -882,6 +890,8 @@ class FullSidewalkreatorPolygonAlgorithm(QgsProcessingAlgorithm):
                 osm_buildings_layer_4326,
                 input_poly_for_bbox,
                 "memory:clipped_bldgs_4326_full",
+                context=context,
+                feedback=feedback,
             )
             if (
                 clipped_buildings_4326
@@ -894,6 +904,8 @@ class FullSidewalkreatorPolygonAlgorithm(QgsProcessingAlgorithm):
                     None,
                     "bldgs_local_tm_full_temp",
                     extent_4326.center().x(),
+                    context=context,
+                    feedback=feedback,
                 )
                 if not temp_reproj_bldgs or not temp_reproj_bldgs.isValid():
                     feedback.pushWarning(
@@ -1014,7 +1026,11 @@ class FullSidewalkreatorPolygonAlgorithm(QgsProcessingAlgorithm):
             )
 
         initial_protoblocks_layer = polygonize_lines(
-            filtered_streets_layer, "memory:initial_protoblocks_full", False
+            filtered_streets_layer,
+            "memory:initial_protoblocks_full",
+            False,
+            context=context,
+            feedback=feedback,
         )
         if not initial_protoblocks_layer or not initial_protoblocks_layer.isValid():
             raise QgsProcessingException(self.tr("Initial polygonization failed."))
@@ -1078,26 +1094,10 @@ class FullSidewalkreatorPolygonAlgorithm(QgsProcessingAlgorithm):
                 "linestring",
                 CRS=local_tm_crs,
             )
-            # Add total sidewalk length inside each protoblock
-            inc_field_id = create_incidence_field_layers_A_B(
-                clean_protoblocks_layer_local_tm,
-                existing_sw_layer,
-                fieldname="inc_sidewalk_len",
-                total_length_instead=True,
+            # Delete protoblocks when the already mapped ratio exceeds the cutoff
+            filter_already_mapped_protoblocks(
+                clean_protoblocks_layer_local_tm, existing_sw_layer
             )
-            # Remove protoblocks above cutoff percent
-            with edit(clean_protoblocks_layer_local_tm):
-                for feat in list(clean_protoblocks_layer_local_tm.getFeatures()):
-                    try:
-                        inc_len = float(feat["inc_sidewalk_len"] or 0.0)
-                    except Exception:
-                        inc_len = 0.0
-                    area = feat.geometry().area() if feat.hasGeometry() else 0.0
-                    ratio = 0.0
-                    if area > 0 and inc_len > 0:
-                        ratio = (((inc_len / 4.0) ** 2) / area) * 100.0
-                    if ratio > cutoff_percent_protoblock:
-                        clean_protoblocks_layer_local_tm.deleteFeature(feat.id())
             remaining = clean_protoblocks_layer_local_tm.featureCount()
             feedback.pushInfo(
                 self.tr(
@@ -1112,7 +1112,9 @@ class FullSidewalkreatorPolygonAlgorithm(QgsProcessingAlgorithm):
         # --- Stage 3: Sidewalk Generation ---
         feedback.pushInfo(self.tr("Stage 2: Generating Sidewalks..."))
         dissolved_protoblocks_for_sidewalks = dissolve_tosinglegeom(
-            clean_protoblocks_layer_local_tm
+            clean_protoblocks_layer_local_tm,
+            context=context,
+            feedback=feedback,
         )
         if (
             not dissolved_protoblocks_for_sidewalks
@@ -1213,7 +1215,7 @@ class FullSidewalkreatorPolygonAlgorithm(QgsProcessingAlgorithm):
                 self.invalidSinkError(parameters, self.OUTPUT_SIDEWALKS)
             )
         if sidewalks_final_epsg4326 and sidewalks_final_epsg4326.featureCount() > 0:
-            for feat_sw in sidewalks_final_epsg4326.getFeatures():
+            for feat_sw in compact_features(sidewalks_final_epsg4326):
                 if feedback.isCanceled():
                     return {}
                 sidewalks_sink.addFeature(feat_sw, QgsFeatureSink.FastInsert)
@@ -39,6 +39,8 @@ import os
 from ..osm_fetch import osm_query_string_by_bbox, get_osm_data
 from .protoblock_bbox_algorithm import ProtoblockBboxAlgorithm
 from ..generic_functions import (
+    new_scratch_workspace,
+    validate_and_repair_layer,
     reproject_layer_localTM,
     cliplayer_v2,
     remove_unconnected_lines_v2,
@@ -375,6 +377,13 @@ class ProtoblockAlgorithm(QgsProcessingAlgorithm):
         )
 
     def processAlgorithm(self, parameters, context, feedback):
+        # intermediate files go to a per-run scratch workspace, so concurrent runs don't collide
+        with new_scratch_workspace(
+            "protoblocks_", feedback=feedback
+        ) as self.workspace:
+            return self.process_in_workspace(parameters, context, feedback)
+
+    def process_in_workspace(self, parameters, context, feedback):
         feedback.pushInfo(
             self.tr("Algorithm started: Generate Protoblocks from OSM Data in Polygon")
         )  # General start message
@@ -651,6 +660,7 @@ class ProtoblockAlgorithm(QgsProcessingAlgorithm):
             geomtype="LineString",
             timeout=timeout,
             return_as_string=False,
+            workspace=self.workspace,
         )
 
         if osm_geojson_path is None:
@@ -669,12 +679,22 @@ class ProtoblockAlgorithm(QgsProcessingAlgorithm):
         feedback.pushInfo(
             self.tr(f"OSM data fetched: {osm_data_layer_4326.featureCount()} ways.")
         )
+        osm_data_layer_4326, _ = validate_and_repair_layer(
+            osm_data_layer_4326, "osm_streets", feedback
+        )
 
         feedback.pushInfo(self.tr("Clipping and reprojecting OSM data..."))
+        input_poly_for_bbox, _ = validate_and_repair_layer(
+            input_poly_for_bbox, "input_polygon", feedback
+        )
         clipped_osm_data_4326_path = "memory:clipped_osm_data_4326_algo"
         # Use input_poly_for_bbox for clipping (it's the original input polygon, possibly reprojected to 4326)
         clipped_osm_layer_4326 = cliplayer_v2(
-            osm_data_layer_4326, input_poly_for_bbox, clipped_osm_data_4326_path
+            osm_data_layer_4326,
+            input_poly_for_bbox,
+            clipped_osm_data_4326_path,
+            context=context,
+            feedback=feedback,
         )
 
         if not clipped_osm_layer_4326.isValid():
@@ -705,6 +725,8 @@ class ProtoblockAlgorithm(QgsProcessingAlgorithm):
             outputpath=None,
             layername="clipped_osm_local_tm_algo",
             lgt_0=extent_4326.center().x(),
+            context=context,
+            feedback=feedback,
         )
         if not clipped_reproj_layer.isValid():
             raise QgsProcessingException(
@@ -799,6 +821,8 @@ class ProtoblockAlgorithm(QgsProcessingAlgorithm):
             filtered_streets_layer,
             outputlayer="memory:protoblocks_temp_algo",
             keepfields=False,
+            context=context,
+            feedback=feedback,
         )
 
         if not protoblocks_layer or not protoblocks_layer.isValid():
@@ -34,12 +34,15 @@ import os
 # Import necessary functions from other plugin modules
 from ..osm_fetch import osm_query_string_by_bbox, get_osm_data
 from ..generic_functions import (
+    new_scratch_workspace,
+    validate_and_repair_layer,
     reproject_layer_localTM,
     cliplayer_v2,  # cliplayer might not be needed
     remove_unconnected_lines_v2,
     polygonize_lines,
     layer_from_featlist,
-    create_incidence_field_layers_A_B,
+    clipped_lengths_by_polygon,
+    mapped_ratio,
 )
 from ..parameters import (
     default_widths,
@@ -375,6 +378,13 @@ class ProtoblockBboxAlgorithm(QgsProcessingAlgorithm):
         )
 
     def processAlgorithm(self, parameters, context, feedback):
+        # intermediate files go to a per-run scratch workspace, so concurrent runs don't collide
+        with new_scratch_workspace(
+            "protoblocks_bbox_", feedback=feedback
+        ) as self.workspace:
+            return self.process_in_workspace(parameters, context, feedback)
+
+    def process_in_workspace(self, parameters, context, feedback):
         feedback.pushInfo(
             self.tr(
                 "Algorithm started: Generate Protoblocks from OSM Data in Bounding Box"
@@ -493,6 +503,7 @@ class ProtoblockBboxAlgorithm(QgsProcessingAlgorithm):
             geomtype="LineString",
             timeout=timeout,
             return_as_string=False,
+            workspace=self.workspace,
         )
         if osm_geojson_path is None:
             raise QgsProcessingException(
@@ -510,6 +521,9 @@ class ProtoblockBboxAlgorithm(QgsProcessingAlgorithm):
         feedback.pushInfo(
             self.tr(f"OSM data fetched: {osm_data_layer_4326.featureCount()} ways.")
         )
+        osm_data_layer_4326, _ = validate_and_repair_layer(
+            osm_data_layer_4326, "osm_streets", feedback
+        )
 
         if osm_data_layer_4326.featureCount() == 0:
             feedback.pushWarning(
@@ -545,6 +559,8 @@ class ProtoblockBboxAlgorithm(QgsProcessingAlgorithm):
             outputpath=None,
             layername="osm_data_local_tm_bbox_algo",
             lgt_0=lgt_0_tm,
+            context=context,
+            feedback=feedback,
         )
         if not reproj_layer.isValid():
             raise QgsProcessingException(
@@ -632,6 +648,8 @@ class ProtoblockBboxAlgorithm(QgsProcessingAlgorithm):
             filtered_streets_layer,
             outputlayer="memory:protoblocks_temp_bbox_algo",
             keepfields=False,
+            context=context,
+            feedback=feedback,
         )
 
         if not protoblocks_in_local_tm or not protoblocks_in_local_tm.isValid():
@@ -701,22 +719,13 @@ class ProtoblockBboxAlgorithm(QgsProcessingAlgorithm):
                 "LineString",
                 CRS=local_tm_crs,
             )
-            # Sum existing sidewalk length within each protoblock
-            _ = create_incidence_field_layers_A_B(
-                protoblocks_in_local_tm,
-                existing_sw_layer,
-                fieldname="inc_sidewalk_len",
-                total_length_instead=True,
+            # Existing sidewalk length within each protoblock (clipped by it)
+            existing_lengths = clipped_lengths_by_polygon(
+                protoblocks_in_local_tm, existing_sw_layer
             )
         else:
             feedback.pushInfo(self.tr("No separate sidewalks (footway=sidewalk) detected in AOI."))
-            # Add field with 0 length to simplify downstream
-            _ = create_incidence_field_layers_A_B(
-                protoblocks_in_local_tm,
-                layer_from_featlist([], "empty_sidewalks", "LineString", CRS=local_tm_crs),
-                fieldname="inc_sidewalk_len",
-                total_length_instead=True,
-            )
+            existing_lengths = {}
 
         # Prepare output protoblocks-with-sidewalk info layer
         output_fields = QgsFields()
@@ -735,14 +744,8 @@ class ProtoblockBboxAlgorithm(QgsProcessingAlgorithm):
             if feedback.isCanceled():
                 return {}
             area = pb.geometry().area() if pb.hasGeometry() else 0.0
-            try:
-                inc_len = float(pb["inc_sidewalk_len"] or 0.0)
-            except Exception:
-                inc_len = 0.0
-            ratio = 0.0
-            if area > 0 and inc_len > 0:
-                ratio = (((inc_len / 4.0) ** 2) / area) * 100.0
-            has_existing = ratio > cutoff_percent_protoblock
+            inc_len = existing_lengths.get(pb.id(), 0.0)
+            has_existing = mapped_ratio(inc_len, area) > cutoff_percent_protoblock
             nf = QgsFeature(output_fields)
             nf.setGeometry(pb.geometry())
             nf.setAttributes([has_existing, inc_len])
@@ -31,6 +31,7 @@ from ..generic_functions import (
     create_area_field,
     create_perimeter_field,
 )
+from ..feature_store import FeatureStore
 from ..parameters import (
     widths_fieldname,
     big_buffer_d,  # , sidewalk_tag_value and other specific tags if needed here
@@ -140,28 +141,30 @@ def generate_sidewalk_geometries_and_zones(
     # Create a copy of the street_network_layer to modify widths, or modify in place if that's acceptable.
     # For a processing algorithm, it's better to work on copies or new layers.
 
-    # Create a new layer for width-adjusted streets based on the input street_network_layer
-    width_adjusted_streets = QgsVectorLayer(
-        f"LineString?crs={current_crs.authid()}",
-        "width_adjusted_streets_temp",
-        "memory",
-    )
-    width_adjusted_streets_dp = width_adjusted_streets.dataProvider()
-    width_adjusted_streets_dp.addAttributes(road_network_layer_local_tm.fields())
-    width_adjusted_streets.updateFields()
+    # The width-adjusted streets are collected in a compact store (based on the input street_network_layer),
+    # becoming a memory layer only once filled
+    width_adjusted_fields = QgsFields(road_network_layer_local_tm.fields())
 
     # Ensure 'widths_fieldname' (e.g. "width") exists on the new layer
-    if width_adjusted_streets.fields().lookupField(widths_fieldname) == -1:
+    if width_adjusted_fields.lookupField(widths_fieldname) == -1:
         width_field = QgsField(
             widths_fieldname, QVariant.Double
         )  # Assuming width is double
-        width_adjusted_streets_dp.addAttributes([width_field])
-        width_adjusted_streets.updateFields()
+        width_adjusted_fields.append(width_field)
+
+    width_idx_adjusted = width_adjusted_fields.indexOf(widths_fieldname)
+
+    width_adjusted_store = FeatureStore(
+        width_adjusted_fields, QgsWkbTypes.LineString, current_crs
+    )
 
-    width_idx_adjusted = width_adjusted_streets.fields().indexOf(widths_fieldname)
+    def adjusted_street_attributes(street_feat, street_width):
+        attrs = street_feat.attributes()
+        attrs += [None] * (width_adjusted_fields.count() - len(attrs))
+        attrs[width_idx_adjusted] = street_width
+        return attrs
 
     # Copy features and adjust widths if needed
-    features_to_add = []
     if (
         parameters.get("check_building_overlap", False)
         and building_footprints_layer_local_tm
@@ -171,7 +174,9 @@ def generate_sidewalk_geometries_and_zones(
         # This part requires careful adaptation of the logic from draw_sidewalks
         # It involves dissolving buildings and checking distances.
         dissolved_buildings = dissolve_tosinglegeom(
-            building_footprints_layer_local_tm
+            building_footprints_layer_local_tm,
+            context=context,
+            feedback=feedback,
         )  # Assumes buildings_layer is valid
         dissolved_buildings_geom = get_first_feature_or_geom(dissolved_buildings, True)
 
@@ -179,10 +184,6 @@ def generate_sidewalk_geometries_and_zones(
             if feedback.isCanceled():
                 return None, None, None, None
 
-            new_street_feat = QgsFeature(width_adjusted_streets.fields())
-            new_street_feat.setGeometry(street_feat.geometry())
-            new_street_feat.setAttributes(street_feat.attributes())
-
             original_width_val = street_feat.attribute(widths_fieldname)
             if original_width_val is None or original_width_val == 0.0:
                 # Use default width when no width is specified
@@ -252,14 +253,12 @@ def generate_sidewalk_geometries_and_zones(
                         "min_generated_width_near_building", 0.0
                     )
 
-            new_street_feat.setAttribute(width_idx_adjusted, adjusted_street_width)
-            features_to_add.append(new_street_feat)
+            width_adjusted_store.append(
+                street_feat.geometry(),
+                adjusted_street_attributes(street_feat, adjusted_street_width),
+            )
 
-        if features_to_add:
-            width_adjusted_streets_dp.addFeatures(features_to_add)
-        feedback.pushInfo(
-            f"Street widths adjusted. Count: {width_adjusted_streets.featureCount()}"
-        )
+        feedback.pushInfo(f"Street widths adjusted. Count: {len(width_adjusted_store)}")
 
     else:  # No building overlap check or no buildings
         feedback.pushInfo(
@@ -269,9 +268,6 @@ def generate_sidewalk_geometries_and_zones(
         for street_feat in road_network_layer_local_tm.getFeatures():
             if feedback.isCanceled():
                 return None, None, None, None
-            new_street_feat = QgsFeature(width_adjusted_streets.fields())
-            new_street_feat.setGeometry(street_feat.geometry())
-            new_street_feat.setAttributes(street_feat.attributes())
             # Ensure width attribute is correctly copied or defaulted if null
             original_width_val = street_feat.attribute(widths_fieldname)
             if original_width_val is None or original_width_val == 0.0:
@@ -285,10 +281,14 @@ def generate_sidewalk_geometries_and_zones(
                 current_street_width = parameters.get(
                     "default_width_m", 6.0
                 )  # Default to 6m
-            new_street_feat.setAttribute(width_idx_adjusted, current_street_width)
-            features_to_add.append(new_street_feat)
-        if features_to_add:
-            width_adjusted_streets_dp.addFeatures(features_to_add)
+            width_adjusted_store.append(
+                street_feat.geometry(),
+                adjusted_street_attributes(street_feat, current_street_width),
+            )
+
+    width_adjusted_streets = width_adjusted_store.to_layer(
+        "width_adjusted_streets_temp"
+    )
 
     # --- 2. Generate initial sidewalk polygons (buffers) ---
     feedback.pushInfo("Generating sidewalk area buffers...")
@@ -317,7 +317,11 @@ def generate_sidewalk_geometries_and_zones(
         feedback.pushWarning(f"Width field '{widths_fieldname}' not found!")
 
     proto_undissolved_buffer = generate_buffer(
-        width_adjusted_streets, buffer_distance_expression, dissolve=False
+        width_adjusted_streets,
+        buffer_distance_expression,
+        dissolve=False,
+        context=context,
+        feedback=feedback,
     )
     if not proto_undissolved_buffer:
         raise QgsProcessingException("Failed at proto_undissolved_buffer generation.")
@@ -325,7 +329,11 @@ def generate_sidewalk_geometries_and_zones(
         f"Proto undissolved buffer: {proto_undissolved_buffer.featureCount()} features"
     )
 
-    dissolved_once_buffer = dissolve_tosinglegeom(proto_undissolved_buffer)
+    dissolved_once_buffer = dissolve_tosinglegeom(
+        proto_undissolved_buffer,
+        context=context,
+        feedback=feedback,
+    )
     if not dissolved_once_buffer:
         raise QgsProcessingException("Failed at first dissolve for buffer.")
     feedback.pushInfo(
@@ -335,7 +343,12 @@ def generate_sidewalk_geometries_and_zones(
     # Rounding buffers
     curve_radius = parameters.get("curve_radius", 3.0)  # Default 3m
     feedback.pushInfo(f"Curve radius: {curve_radius}")
-    proto_dissolved_buffer_step2 = generate_buffer(dissolved_once_buffer, curve_radius)
+    proto_dissolved_buffer_step2 = generate_buffer(
+        dissolved_once_buffer,
+        curve_radius,
+        context=context,
+        feedback=feedback,
+    )
     if not proto_dissolved_buffer_step2:
         raise QgsProcessingException("Failed at curve_radius buffer generation.")
     feedback.pushInfo(
@@ -343,7 +356,10 @@ def generate_sidewalk_geometries_and_zones(
     )
 
     dissolved_sidewalk_area_polygons = generate_buffer(
-        proto_dissolved_buffer_step2, -curve_radius
+        proto_dissolved_buffer_step2,
+        -curve_radius,
+        context=context,
+        feedback=feedback,
     )
     if not dissolved_sidewalk_area_polygons:
         raise QgsProcessingException(
@@ -357,7 +373,10 @@ def generate_sidewalk_geometries_and_zones(
     # --- 6. Extract final sidewalk lines FIRST (before applying exclusion zones) ---
     feedback.pushInfo("Extracting sidewalk lines from buffered areas...")
     big_temp_buffer_for_diff = generate_buffer(
-        dissolved_sidewalk_area_polygons, big_buffer_d
+        dissolved_sidewalk_area_polygons,
+        big_buffer_d,
+        context=context,
+        feedback=feedback,
     )  # Outer extent
     if not big_temp_buffer_for_diff:
         raise QgsProcessingException("Failed to create big_temp_buffer_for_diff.")
@@ -367,7 +386,10 @@ def generate_sidewalk_geometries_and_zones(
 
     # This diff_layer contains the "donut" polygons representing sidewalks
     sidewalk_polygons_as_donuts = compute_difference_layer(
-        big_temp_buffer_for_diff, dissolved_sidewalk_area_polygons
+        big_temp_buffer_for_diff,
+        dissolved_sidewalk_area_polygons,
+        context=context,
+        feedback=feedback,
     )
     if not sidewalk_polygons_as_donuts:
         raise QgsProcessingException(
@@ -379,7 +401,9 @@ def generate_sidewalk_geometries_and_zones(
     )
 
     sidewalk_polygons_singleparts = convert_multipart_to_singleparts(
-        sidewalk_polygons_as_donuts
+        sidewalk_polygons_as_donuts,
+        context=context,
+        feedback=feedback,
     )
     if not sidewalk_polygons_singleparts:
         raise QgsProcessingException(
@@ -411,7 +435,10 @@ def generate_sidewalk_geometries_and_zones(
 
     # Extract sidewalk lines from polygons (this is our main extraction)
     whole_sidewalks_lines = extract_lines_from_polygons(
-        sidewalk_polygons_singleparts, "memory:whole_sidewalks_lines_algo"
+        sidewalk_polygons_singleparts,
+        "memory:whole_sidewalks_lines_algo",
+        context=context,
+        feedback=feedback,
     )
     if not whole_sidewalks_lines:
         raise QgsProcessingException("Failed to extract final sidewalk lines.")
@@ -602,7 +629,10 @@ def generate_sidewalk_geometries_and_zones(
             f"Applying {exclusion_zones_poly.featureCount()} exclusion zones to sidewalk lines..."
         )
         final_sidewalks_with_exclusions = compute_difference_layer(
-            whole_sidewalks_lines, exclusion_zones_poly
+            whole_sidewalks_lines,
+            exclusion_zones_poly,
+            context=context,
+            feedback=feedback,
         )
         if final_sidewalks_with_exclusions:
             final_sidewalks_with_exclusions.setCrs(current_crs)
@@ -639,9 +669,17 @@ def generate_sidewalk_geometries_and_zones(
             "Filtering sidewalk lines to keep only those intersecting protoblock areas..."
         )
         # Dissolve protoblocks to a single geometry and buffer slightly to include edge sidewalks
-        dissolved = dissolve_tosinglegeom(protoblocks_layer_local_tm)
+        dissolved = dissolve_tosinglegeom(
+            protoblocks_layer_local_tm,
+            context=context,
+            feedback=feedback,
+        )
         buffered = generate_buffer(
-            dissolved, protoblocks_buffer, dissolve=True
+            dissolved,
+            protoblocks_buffer,
+            dissolve=True,
+            context=context,
+            feedback=feedback,
         )  # small positive buffer
         proto_geom = get_first_feature_or_geom(buffered, True)
 
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Benchmark of feature insertion/replacement: per-feature edit buffer vs bulk provider calls.
+
+Times "layer_from_featlist" and "swap_features_layer_another" against the
+former per-feature implementation (edit session + addFeature/deleteFeature),
+reported per 10k features. Run with a QGIS-enabled python:
+
+    python3 scripts/benchmark_bulk_features.py [sizes...]
+"""
+
+import sys
+import time
+
+from benchmark_geometry_backends import load_plugin_package, start_qgis
+
+
+def point_features(n_features):
+    from qgis.core import QgsFeature, QgsGeometry, QgsPointXY
+
+    featlist = []
+    for i in range(n_features):
+        feature = QgsFeature()
+        feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(i, i)))
+        featlist.append(feature)
+
+    return featlist
+
+
+def per_feature_layer_from_featlist(featlist):
+    from qgis.core import QgsVectorLayer, edit
+
+    ret_layer = QgsVectorLayer("Point", "temp", "memory")
+
+    with edit(ret_layer):
+        for feature in featlist:
+            ret_layer.dataProvider().addFeature(feature)
+
+        ret_layer.updateExtents()
+
+    return ret_layer
+
+
+def per_feature_swap(inputdesiredlayer, layer_with_newfeatures):
+    from qgis.core import edit
+
+    with edit(inputdesiredlayer):
+        for old_feature in inputdesiredlayer.getFeatures():
+            inputdesiredlayer.deleteFeature(old_feature.id())
+
+        for new_feature in layer_with_newfeatures.getFeatures():
+            inputdesiredlayer.addFeature(new_feature)
+
+
+def per_10k(function, n_features, *args):
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 10000 / n_features
+
+
+def main(sizes):
+    app = start_qgis()
+    load_plugin_package()
+
+    from osm_sidewalkreator import generic_functions as gf
+
+    print(f"{'features':>10}{'operation':>30}{'per-feature (s)':>18}{'bulk (s)':>12}")
+
+    for size in sizes:
+        featlist = point_features(size)
+
+        creation = (
+            per_10k(per_feature_layer_from_featlist, size, featlist),
+            per_10k(gf.layer_from_featlist, size, featlist),
+        )
+
+        target = gf.layer_from_featlist(featlist)
+        source = gf.layer_from_featlist(featlist)
+
+        swapping = (
+            per_10k(per_feature_swap, size, target, source),
+            per_10k(gf.swap_features_layer_another, size, target, source),
+        )
+
+        for name, (old, new) in (
+            ("layer_from_featlist", creation),
+            ("swap_features_layer_another", swapping),
+        ):
+            print(f"{size:>10}{name:>30}{old:>18.4f}{new:>12.4f}")
+
+    app.exitQgis()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000])
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Benchmark of the generic_functions geometry helpers: processing.run vs inprocess.
+
+Builds synthetic street-like grids of increasing size and times each helper
+with both backends, so the "inprocess_max_features" threshold (parameters.py)
+can be tuned. Run with a QGIS-enabled python (e.g. inside the docker image):
+
+    python3 scripts/benchmark_geometry_backends.py [sizes...]
+"""
+
+import importlib.util as ilu
+import os
+import sys
+import time
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_qgis():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    from qgis.core import QgsApplication
+
+    QgsApplication.setPrefixPath(os.environ.get("QGIS_PREFIX_PATH", "/usr"), True)
+    app = QgsApplication([], False)
+    app.initQgis()
+
+    qgis_py_plugins = "/usr/share/qgis/python/plugins"
+    if qgis_py_plugins not in sys.path:
+        sys.path.insert(0, qgis_py_plugins)
+
+    from processing.core.Processing import Processing
+
+    Processing.initialize()
+
+    return app
+
+
+def load_plugin_package():
+    """the plugin folder as the "osm_sidewalkreator" package, whatever its folder name"""
+    spec = ilu.spec_from_file_location(
+        "osm_sidewalkreator",
+        os.path.join(PLUGIN_DIR, "__init__.py"),
+        submodule_search_locations=[PLUGIN_DIR],
+    )
+    package = ilu.module_from_spec(spec)
+    sys.modules["osm_sidewalkreator"] = package
+    spec.loader.exec_module(package)
+
+    return package
+
+
+def grid_lines_layer(n_lines, spacing=50.0):
+    """half horizontal, half vertical lines, crossing each other"""
+    from qgis.core import QgsFeature, QgsGeometry, QgsPointXY, QgsVectorLayer
+
+    layer = QgsVectorLayer("LineString?crs=EPSG:31983", "grid", "memory")
+
+    half = max(n_lines // 2, 1)
+    extent = half * spacing
+
+    featlist = []
+    for i in range(half):
+        for p0, p1 in (
+            ((0, i * spacing), (extent, i * spacing)),
+            ((i * spacing, 0), (i * spacing, extent)),
+        ):
+            feature = QgsFeature()
+            feature.setGeometry(
+                QgsGeometry.fromPolylineXY([QgsPointXY(*p0), QgsPointXY(*p1)])
+            )
+            featlist.append(feature)
+
+    layer.dataProvider().addFeatures(featlist)
+    layer.updateExtents()
+
+    return layer
+
+
+def timed(function, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(sizes):
+    app = start_qgis()
+    load_plugin_package()
+
+    from osm_sidewalkreator import generic_functions as gf
+
+    for size in sizes:
+        lines = grid_lines_layer(size)
+        buffers = gf.generate_buffer(lines, 5, dissolve=False)
+        small_buffers = gf.generate_buffer(lines, 1, dissolve=False)
+
+        cases = {
+            "generate_buffer": (gf.generate_buffer, lines, 5),
+            "dissolve_tosinglegeom": (gf.dissolve_tosinglegeom, buffers),
+            "vec_layers_intersection": (gf.vec_layers_intersection, lines, buffers),
+            "compute_difference_layer": (
+                gf.compute_difference_layer,
+                buffers,
+                small_buffers,
+            ),
+            "convert_multipart_to_singleparts": (
+                gf.convert_multipart_to_singleparts,
+                buffers,
+            ),
+            "split_lines": (gf.split_lines, lines, lines),
+            "polygonize_lines": (gf.polygonize_lines, lines),
+            "merge_touching_lines": (gf.merge_touching_lines, lines),
+        }
+
+        print(f"\n{lines.featureCount()} input lines")
+        print(f"{'helper':<36}{'processing (s)':>16}{'inprocess (s)':>16}")
+
+        for name, (function, *args) in cases.items():
+            results = []
+            for backend in ("processing", "inprocess"):
+                gf.set_geometry_backend(backend)
+                results.append(timed(function, *args))
+
+            print(f"{name:<36}{results[0]:>16.4f}{results[1]:>16.4f}")
+
+        gf.set_geometry_backend("auto")
+
+    app.exitQgis()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10, 100, 1000])
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+"""
+Running the stages of the dialog in the background, as QgsTasks.
+
+A stage is split in a "work" function, running on a worker thread, and a
+"finished" callback, running on the main thread once the work is done. The work
+must not touch the dialog, the canvas or the project: it only gets plain values
+read from the dialog beforehand, and layers. The finished callback does the rest
+(adding layers to the canvas, enabling the next widgets and so on).
+"""
+
+from qgis.core import (
+    QgsApplication,
+    QgsMapLayer,
+    QgsProcessingException,
+    QgsProcessingFeedback,
+    QgsTask,
+)
+from qgis.PyQt.QtCore import QThread
+
+
+def hand_layers_to_main_thread(owner):
+    """
+    the layers created on a worker thread belong to it, so the ones kept by "owner"
+    (a "SidewalkPipeline", or any object holding them as attributes) are moved
+    to the main thread before the worker is done
+    """
+
+    main_thread = QgsApplication.instance().thread()
+
+    if hasattr(owner, "layers"):
+        layers = list(owner.layers())
+    else:
+        layers = [
+            value for value in vars(owner).values() if isinstance(value, QgsMapLayer)
+        ]
+
+    for layer in layers:
+        if layer.thread() == QThread.currentThread():
+            layer.moveToThread(main_thread)
+
+
+class StageTask(QgsTask):
+    """
+    a cancellable task running "work(feedback)" in the background and then
+    "on_finished()" (or "on_failed(exception)", "None" if canceled) on the main thread
+
+    the progress and cancellation are bridged to the processing feedback given
+    to the work, so the processing steps report and stop through it
+    """
+
+    def __init__(self, description, work, on_finished, on_failed=None, owner=None):
+        super().__init__(description, QgsTask.CanCancel)
+
+        self.work = work
+        self.on_finished = on_finished
+        self.on_failed = on_failed
+        self.owner = owner
+
+        self.exception = None
+
+        self.feedback = QgsProcessingFeedback()
+        self.feedback.progressChanged.connect(self.setProgress)
+
+    def run(self):
+        try:
+            self.work(self.feedback)
+        except QgsProcessingException as e:
+            # the processing steps raise it when canceled
+            if not self.isCanceled():
+                self.exception = e
+            return False
+        except Exception as e:
+            self.exception = e
+            return False
+        finally:
+            if self.owner is not None:
+                hand_layers_to_main_thread(self.owner)
+
+        return not self.isCanceled()
+
+    def cancel(self):
+        self.feedback.cancel()
+        super().cancel()
+
+    def finished(self, result):
+        if result:
+            self.on_finished()
+        elif self.on_failed:
+            self.on_failed(self.exception)
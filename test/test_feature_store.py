@@ -0,0 +1,119 @@
+import pytest
+
+pytest.importorskip("qgis")
+
+from array import array
+
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsField,
+    QgsGeometry,
+    QgsPointXY,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QVariant
+
+from .utilities import get_qgis_app
+from osm_sidewalkreator.feature_store import FeatureStore
+
+pytestmark = pytest.mark.qgis
+
+
+@pytest.fixture(scope="module", autouse=True)
+def qgis_env():
+    app, _, _, _ = get_qgis_app()
+    assert app is not None
+    return app
+
+
+def _store():
+    store = FeatureStore(
+        [
+            QgsField("osm_id", QVariant.Int),
+            QgsField("width", QVariant.Double),
+            QgsField("highway", QVariant.String),
+        ],
+        QgsWkbTypes.LineString,
+        QgsCoordinateReferenceSystem("EPSG:31983"),
+    )
+
+    for i in range(3):
+        store.append(
+            QgsGeometry.fromPolylineXY([QgsPointXY(i, 0), QgsPointXY(i, 10)]),
+            [i, 6.0 + i, "residential"],
+        )
+
+    return store
+
+
+def test_feature_store_columns():
+    store = _store()
+
+    assert len(store) == 3
+    assert isinstance(store.column("osm_id"), array)
+    assert list(store.column("width")) == [6.0, 7.0, 8.0]
+    assert store.geometry(1).length() == pytest.approx(10)
+
+    # a NULL turns the numeric column into a plain list, keeping the values
+    store.append(QgsGeometry.fromPolylineXY([QgsPointXY(9, 0), QgsPointXY(9, 1)]))
+    assert list(store.column("osm_id")) == [0, 1, 2, None]
+    assert not isinstance(store.column("osm_id"), array)
+
+
+def test_feature_store_layer_roundtrip():
+    layer = _store().to_layer("streets")
+
+    assert layer.featureCount() == 3
+    assert layer.crs().authid() == "EPSG:31983"
+    assert [f["width"] for f in layer.getFeatures()] == [6.0, 7.0, 8.0]
+
+    store = FeatureStore.from_layer(layer)
+    assert len(store) == 3
+    assert store.attributes(2) == [2, 8.0, "residential"]
+
+
+def test_feature_store_restore_keeps_ids():
+    layer = _store().to_layer("streets")
+    first_id, second_id, third_id = sorted(layer.allFeatureIds())
+
+    snapshot = FeatureStore.from_layer(layer)
+
+    # changing one, deleting another and adding a new one, as a stage could do
+    provider = layer.dataProvider()
+    provider.changeGeometryValues(
+        {first_id: QgsGeometry.fromPolylineXY([QgsPointXY(0, 0), QgsPointXY(5, 5)])}
+    )
+    provider.changeAttributeValues({first_id: {1: 99.0}})
+    provider.deleteFeatures([second_id])
+    provider.addFeatures([_store().feature(0)])
+
+    new_ids = snapshot.restore(layer)
+
+    assert layer.featureCount() == 3
+    assert set(new_ids) == {second_id}
+
+    ids = set(layer.allFeatureIds())
+    assert {first_id, third_id, new_ids[second_id]} == ids
+
+    first = layer.getFeature(first_id)
+    assert first["width"] == 6.0
+    assert first.geometry().length() == pytest.approx(10)
+
+    # the feature added again keeps its new id at the next restore
+    assert snapshot.restore(layer) == {}
+    assert set(layer.allFeatureIds()) == ids
+
+
+def test_feature_store_copy_keeps_source_ids():
+    layer = _store().to_layer("streets")
+    source_ids = sorted(layer.allFeatureIds())
+
+    copy, copy_source_ids = FeatureStore.from_layer(layer).to_layer_with_source_ids()
+    assert sorted(copy_source_ids.values()) == sorted(source_ids)
+
+    copy.dataProvider().deleteFeatures([min(copy_source_ids)])
+    copy.dataProvider().addFeatures([_store().feature(0)])
+
+    store = FeatureStore.from_layer(copy, source_ids=copy_source_ids)
+    assert store.source_ids.count(None) == 1
+    assert set(store.source_ids) - {None} == set(source_ids[1:])
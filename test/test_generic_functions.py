@@ -0,0 +1,638 @@
+import pytest
+
+pytest.importorskip("qgis")
+
+from qgis.core import (
+    QgsFeature,
+    QgsGeometry,
+    QgsPointXY,
+    QgsVectorLayer,
+)
+from qgis.PyQt import sip
+
+from .utilities import get_qgis_app
+from osm_sidewalkreator.generic_functions import (
+    crossings_coords_array,
+    derive_layers_from_crossings_coords,
+    clipped_voronoi_cells,
+    incidence_mapping_layers_A_B,
+    insert_points_in_coords,
+    merge_short_coords,
+    points_by_polygon,
+    prune_dangling_lines,
+    protoblocks_corner_vertices,
+    ring_turning_angles,
+    split_coords_at_distances,
+    split_coords_at_positions,
+    split_lines_equally,
+)
+
+pytestmark = pytest.mark.qgis
+
+
+@pytest.fixture(scope="module", autouse=True)
+def qgis_env():
+    app, _, _, _ = get_qgis_app()
+    assert app is not None
+    return app
+
+
+def _crossings_layer():
+    layer = QgsVectorLayer("LineString?crs=EPSG:31983", "crossings", "memory")
+    dp = layer.dataProvider()
+
+    feats = []
+    for points in (
+        [(0, 0), (1, 0), (2, 0), (3, 0), (4, 0)],
+        [(0, 5), (1, 5), (2, 5), (3, 5), (4, 5)],
+        # not a 5-vertex crossing, must be skipped
+        [(0, 9), (4, 9)],
+    ):
+        feat = QgsFeature()
+        feat.setGeometry(
+            QgsGeometry.fromPolylineXY([QgsPointXY(x, y) for x, y in points])
+        )
+        feats.append(feat)
+    dp.addFeatures(feats)
+    layer.updateExtents()
+    return layer
+
+
+def test_crossings_coords_array_skips_non_5_vertex():
+    coords = crossings_coords_array(_crossings_layer())
+    assert len(coords) == 2
+    assert coords[0][1] == (1.0, 0.0)
+
+
+def test_derive_layers_from_crossings_coords():
+    coords = crossings_coords_array(_crossings_layer())
+    kerbs, ends, centers = derive_layers_from_crossings_coords(coords)
+
+    assert kerbs.featureCount() == 4
+    assert ends.featureCount() == 4
+    assert centers.featureCount() == 2
+
+    assert {f["barrier"] for f in kerbs.getFeatures()} == {"kerb"}
+    assert {f["footway"] for f in ends.getFeatures()} == {"sidewalk"}
+    assert {f["footway"] for f in centers.getFeatures()} == {"crossing"}
+
+    center = next(centers.getFeatures()).geometry().asPolyline()
+    assert [(p.x(), p.y()) for p in center] == [(1, 0), (2, 0), (3, 0)]
+
+
+def _square_polygons_layer():
+    layer = QgsVectorLayer("Polygon?crs=EPSG:31983", "protoblocks", "memory")
+    feats = []
+    for x0 in (0, 20):
+        feat = QgsFeature()
+        feat.setGeometry(
+            QgsGeometry.fromPolygonXY(
+                [
+                    [
+                        QgsPointXY(x0, 0),
+                        QgsPointXY(x0 + 10, 0),
+                        QgsPointXY(x0 + 10, 10),
+                        QgsPointXY(x0, 10),
+                        QgsPointXY(x0, 0),
+                    ]
+                ]
+            )
+        )
+        feats.append(feat)
+    layer.dataProvider().addFeatures(feats)
+    layer.updateExtents()
+    return layer
+
+
+def test_incidence_mapping_layers_A_B():
+    protoblocks = _square_polygons_layer()
+    sidewalks = QgsVectorLayer("LineString?crs=EPSG:31983", "sidewalks", "memory")
+    feat = QgsFeature()
+    feat.setGeometry(QgsGeometry.fromPolylineXY([QgsPointXY(1, 1), QgsPointXY(5, 1)]))
+    sidewalks.dataProvider().addFeatures([feat])
+
+    sidewalk_id = next(sidewalks.getFeatures()).id()
+    first_id, second_id = [f.id() for f in protoblocks.getFeatures()]
+
+    incidence = incidence_mapping_layers_A_B(protoblocks, sidewalks)
+    assert incidence == {first_id: [sidewalk_id], second_id: []}
+
+    lengths = incidence_mapping_layers_A_B(protoblocks, sidewalks, with_lengths=True)
+    assert lengths[first_id] == {sidewalk_id: pytest.approx(4.0)}
+
+
+def test_ring_turning_angles_square_with_collinear_vertex():
+    # square with an extra vertex at the middle of the bottom edge
+    ring = [(0, 0), (5, 0), (10, 0), (10, 10), (0, 10)]
+    angles = ring_turning_angles(ring)
+    assert angles[1] == pytest.approx(180.0)
+    assert [round(a) % 180 for a in angles] == [90, 0, 90, 90, 90]
+
+
+def test_protoblocks_corner_vertices_drops_non_corners():
+    corners = protoblocks_corner_vertices(_square_polygons_layer())
+    assert len(corners) == 2
+    for vertices in corners.values():
+        assert len(vertices) == 4
+
+
+def test_points_by_polygon_and_clipped_voronoi_cells():
+    protoblocks = _square_polygons_layer()
+    pois = QgsGeometry.fromMultiPointXY(
+        [QgsPointXY(2, 5), QgsPointXY(8, 5), QgsPointXY(50, 50)]
+    )
+
+    assignment = points_by_polygon(protoblocks, pois)
+    first_id, second_id = [f.id() for f in protoblocks.getFeatures()]
+    assert len(assignment[first_id]) == 2
+    assert assignment[second_id] == []
+
+    first_geom = next(protoblocks.getFeatures()).geometry()
+    cells = clipped_voronoi_cells(assignment[first_id], first_geom)
+    assert len(cells) == 2
+    assert sum(cell.area() for cell in cells) == pytest.approx(first_geom.area())
+
+
+def test_split_coords_at_distances():
+    pieces = split_coords_at_distances([(0, 0), (5, 0), (10, 0)], [2.5, 5, 7.5])
+    assert len(pieces) == 4
+    assert pieces[1] == [(2.5, 0.0), (5.0, 0.0)]
+    assert pieces[-1][-1] == (10, 0)
+
+
+def test_split_coords_at_positions():
+    ring = [(0, 0), (10, 0), (10, 10), (0, 10), (0, 0)]
+
+    # a ring cut at two corners makes two pieces, the too close cut is dropped
+    pieces = split_coords_at_positions(ring, [25, 5, 5.05], 0.1)
+    assert pieces == [
+        [(5.0, 10.0), (0, 10), (0, 0), (5.0, 0.0)],
+        [(5.0, 0.0), (10, 0), (10, 10), (5.0, 10.0)],
+    ]
+
+    # a cut at its start does break the ring there
+    assert len(split_coords_at_positions(ring, [0.05, 20], 0.1)) == 2
+
+    assert split_coords_at_positions(ring, []) == [ring]
+
+
+def test_insert_points_in_coords():
+    ring = [(0, 0), (10, 0), (10, 10), (0, 10), (0, 0)]
+
+    # inserted by their position along the ring, whatever their order
+    # (projected onto it, if off the line)
+    assert insert_points_in_coords(ring, [(10, 5), (4, 0.01), (2, 0)]) == [
+        (0, 0),
+        (2, 0),
+        (4, 0),
+        (10, 0),
+        (10, 5),
+        (10, 10),
+        (0, 10),
+        (0, 0),
+    ]
+
+    # close to a vertex: moves it, both ends for the start of a ring
+    assert insert_points_in_coords(ring, [(0.05, 0), (10, 9.95)], 0.1) == [
+        (0.05, 0),
+        (10, 0),
+        (10, 9.95),
+        (0, 10),
+        (0.05, 0),
+    ]
+
+
+def test_merge_short_coords_prefers_the_same_sidewalk():
+    lines = {
+        1: [(0, 0), (10, 0)],
+        2: [(10, 0), (11, 0)],
+        3: [(11, 0), (30, 0)],
+        4: [(11, 0), (11, 20)],
+        5: [(50, 0), (51, 0)],
+    }
+
+    # at (11, 0) three lines meet, so it goes through (10, 0); the isolated one stays
+    assert merge_short_coords(lines, 5) == ({1: [(0, 0), (10, 0), (11, 0)]}, [2])
+
+    # both ends at crossroads: the most collinear neighbor, keeping its direction
+    lines[6] = [(10, -9), (10, 0)]
+    assert merge_short_coords(lines, 5) == ({1: [(0, 0), (10, 0), (11, 0)]}, [2])
+
+    lines[1] = [(10, 0), (2, 6)]
+    assert merge_short_coords(lines, 5) == ({3: [(10, 0), (11, 0), (30, 0)]}, [2])
+
+
+def test_insert_points_in_coords_never_makes_spikes():
+    line = [(0, 0), (10, 0), (20, 0)]
+
+    # projecting before the start: on the first vertex, nothing to add...
+    assert insert_points_in_coords(line, [(-0.5, 0.3)]) == line
+    assert insert_points_in_coords(line, [(-0.5, 0.3)], 0.1) == line
+
+    # ...unless close enough to move it
+    assert insert_points_in_coords(line, [(-0.05, 0)], 0.1) == [
+        (-0.05, 0),
+        (10, 0),
+        (20, 0),
+    ]
+
+    # off the line: snapped within the tolerance, projected beyond it
+    assert insert_points_in_coords(line, [(5, 0.05), (15, 0.5)], 0.1) == [
+        (0, 0),
+        (5, 0.05),
+        (10, 0),
+        (15, 0),
+        (20, 0),
+    ]
+
+    # at a corner: moves it if close enough, otherwise it's already there
+    corner = [(0, 0), (10, 0), (10, 10)]
+
+    assert insert_points_in_coords(corner, [(10.05, -0.05)], 0.1) == [
+        (0, 0),
+        (10.05, -0.05),
+        (10, 10),
+    ]
+    assert insert_points_in_coords(corner, [(10.5, -0.5)], 0.1) == corner
+
+
+def test_prune_dangling_lines_by_rounds():
+    # a block a-b-c-d, with a two-line tail at "d" and a spur at "b"
+    line_ends = {
+        1: ("a", "b"),
+        2: ("b", "c"),
+        3: ("c", "d"),
+        4: ("d", "a"),
+        5: ("d", "e"),
+        6: ("e", "f"),
+        7: ("b", "g"),
+    }
+
+    assert prune_dangling_lines(line_ends) == [6, 7]
+    assert prune_dangling_lines(line_ends, 2) == [6, 7, 5]
+    assert prune_dangling_lines(line_ends, None) == [6, 7, 5]
+
+    # a spared line keeps the ones behind it too
+    assert prune_dangling_lines(line_ends, None, keep=lambda fid: fid == 6) == [7]
+
+
+def test_split_lines_equally_by_length_and_number():
+    layer = QgsVectorLayer("LineString?crs=EPSG:31983", "sidewalks", "memory")
+    feat = QgsFeature()
+    feat.setGeometry(QgsGeometry.fromPolylineXY([QgsPointXY(0, 0), QgsPointXY(100, 0)]))
+    layer.dataProvider().addFeatures([feat])
+
+    by_length = split_lines_equally(layer, 30)
+    assert by_length.featureCount() == 3
+    for piece in by_length.getFeatures():
+        assert piece.geometry().length() == pytest.approx(100 / 3)
+
+    by_number = split_lines_equally(layer, 4, isbynumber=True)
+    assert by_number.featureCount() == 4
+
+
+def test_inprocess_split_lines_and_polygonize():
+    from osm_sidewalkreator import inprocess_geometry_ops
+
+    layer = QgsVectorLayer("LineString?crs=EPSG:31983", "grid", "memory")
+    feats = []
+    for p0, p1 in (
+        ((0, 0), (10, 0)),
+        ((10, 0), (10, 10)),
+        ((10, 10), (0, 10)),
+        ((0, 10), (0, 0)),
+        ((5, -5), (5, 15)),
+    ):
+        feat = QgsFeature()
+        feat.setGeometry(QgsGeometry.fromPolylineXY([QgsPointXY(*p0), QgsPointXY(*p1)]))
+        feats.append(feat)
+    layer.dataProvider().addFeatures(feats)
+
+    splitted = inprocess_geometry_ops.split_lines(layer, layer)
+    # bottom and top edges cut in two, the vertical line in three, the others untouched
+    assert splitted.featureCount() == 2 + 2 + 1 + 1 + 3
+
+    polygons = inprocess_geometry_ops.polygonize_lines(layer)
+    assert polygons.featureCount() == 2
+    assert sum(f.geometry().area() for f in polygons.getFeatures()) == pytest.approx(
+        100
+    )
+
+
+def test_inprocess_buffer_dissolve():
+    from osm_sidewalkreator import inprocess_geometry_ops
+
+    buffered = inprocess_geometry_ops.generate_buffer(_square_polygons_layer(), 1)
+    assert buffered.featureCount() == 1
+    assert next(buffered.getFeatures()).geometry().isMultipart()
+
+
+def test_inprocess_difference_has_the_native_type():
+    from qgis.core import QgsWkbTypes
+    from osm_sidewalkreator import generic_functions
+
+    overlay = QgsVectorLayer("Polygon?crs=EPSG:31983", "overlay", "memory")
+    feat = QgsFeature()
+    feat.setGeometry(QgsGeometry.fromWkt("POLYGON((5 -1, 6 -1, 6 11, 5 11, 5 -1))"))
+    overlay.dataProvider().addFeatures([feat])
+
+    types = {}
+    try:
+        for backend in ("inprocess", "processing"):
+            generic_functions.set_geometry_backend(backend)
+            difference = generic_functions.compute_difference_layer(
+                _square_polygons_layer(), overlay
+            )
+            types[backend] = difference.wkbType()
+    finally:
+        generic_functions.set_geometry_backend(generic_functions.geometry_backend)
+
+    assert types["inprocess"] == types["processing"]
+    assert QgsWkbTypes.isMultiType(types["inprocess"])
+
+
+def test_run_processing_step_stops_when_canceled():
+    from qgis.core import QgsProcessingException, QgsProcessingFeedback
+    from osm_sidewalkreator.generic_functions import dissolve_tosinglegeom
+
+    feedback = QgsProcessingFeedback()
+    feedback.cancel()
+
+    with pytest.raises(QgsProcessingException):
+        dissolve_tosinglegeom(_square_polygons_layer(), feedback=feedback)
+
+
+def test_swap_features_layer_another_in_bulk():
+    from osm_sidewalkreator.generic_functions import (
+        layer_from_featlist,
+        swap_features_layer_another,
+    )
+
+    target = _square_polygons_layer()
+    source = layer_from_featlist(
+        [f for f in _square_polygons_layer().getFeatures()][:1],
+        geomtype="MultiPolygon",
+    )
+
+    swap_features_layer_another(target, source)
+
+    assert target.featureCount() == 1
+    assert not target.isModified()
+    assert not next(target.getFeatures()).geometry().isMultipart()
+
+
+def test_field_helpers_write_without_edit_session():
+    from osm_sidewalkreator.generic_functions import (
+        create_area_field,
+        create_fill_id_field,
+        create_filled_newlayerfield,
+        remove_biggest_polygon,
+    )
+    from qgis.PyQt.QtCore import QVariant
+
+    layer = _square_polygons_layer()
+    first_id, second_id = [f.id() for f in layer.getFeatures()]
+
+    area_idx = create_area_field(layer, "area")
+    create_fill_id_field(layer)
+    create_filled_newlayerfield(
+        layer, "tag", {"attr_by_id": {second_id: "b", 99999: "x"}}, QVariant.String
+    )
+
+    assert not layer.isEditable()
+    assert [f[area_idx] for f in layer.getFeatures()] == [100, 100]
+    assert [f["id_on_layer"] for f in layer.getFeatures()] == [first_id, second_id]
+    assert [f["tag"] for f in layer.getFeatures()][1] == "b"
+
+    remove_biggest_polygon(layer)
+    assert layer.featureCount() == 1
+
+
+def test_highway_values_stats_and_width_filling():
+    from osm_sidewalkreator.generic_functions import (
+        fill_empty_from_mapping,
+        value_counts_and_lengths,
+    )
+
+    layer = QgsVectorLayer(
+        "LineString?crs=EPSG:31983&field=highway:string&field=width:double",
+        "streets",
+        "memory",
+    )
+    feats = []
+    for highway, width, length in (
+        ("residential", None, 10),
+        ("primary", None, 30),
+        ("residential", 4.0, 15),
+    ):
+        feat = QgsFeature(layer.fields())
+        feat.setGeometry(
+            QgsGeometry.fromPolylineXY([QgsPointXY(0, 0), QgsPointXY(length, 0)])
+        )
+        feat.setAttributes([highway, width])
+        feats.append(feat)
+    layer.dataProvider().addFeatures(feats)
+    ids = [f.id() for f in layer.getFeatures()]
+
+    stats = value_counts_and_lengths(layer, "highway")
+    assert list(stats) == ["primary", "residential"]
+    assert stats["residential"] == (2, 25)
+
+    filled = fill_empty_from_mapping(
+        layer, "width", "highway", {"residential": 6.0, "primary": 10.0}
+    )
+    assert filled == {ids[0]: 6.0, ids[1]: 10.0}
+    assert [f["width"] for f in layer.getFeatures()] == [6.0, 10.0, 4.0]
+
+
+def test_write_layers_to_geojson_mixed_types(tmp_path):
+    import json
+
+    from osm_sidewalkreator.generic_functions import write_layers_to_geojson
+
+    outpath = str(tmp_path / "merged.geojson")
+
+    n_written = write_layers_to_geojson(
+        [_crossings_layer(), _square_polygons_layer()], outpath, precision=7
+    )
+    assert n_written == 5
+
+    with open(outpath) as reader:
+        collection = json.load(reader)
+
+    assert "crs" not in collection
+    assert [f["geometry"]["type"] for f in collection["features"]] == (
+        ["LineString"] * 3 + ["Polygon"] * 2
+    )
+
+    # RFC 7946: WGS84 coordinates and counterclockwise exterior rings
+    ring = collection["features"][-1]["geometry"]["coordinates"][0]
+    assert all(-180 <= x <= 180 and -90 <= y <= 90 for x, y in ring)
+    signed_area = sum(
+        x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(ring[:-1], ring[1:])
+    )
+    assert signed_area > 0
+
+
+def test_export_layer_geopackage_holds_many_layers(tmp_path):
+    from osm_sidewalkreator.generic_functions import export_layer, sink_destination
+
+    outpath = str(tmp_path / "layers.gpkg")
+
+    export_layer(_crossings_layer(), outpath, "crossings", "GeoPackage")
+    export_layer(_square_polygons_layer(), outpath, "protoblocks", "GeoPackage")
+
+    for layername, count in (("crossings", 3), ("protoblocks", 2)):
+        layer = QgsVectorLayer(f"{outpath}|layername={layername}", layername, "ogr")
+        assert layer.isValid()
+        assert layer.featureCount() == count
+        assert layer.crs().authid() == "EPSG:4326"
+
+    assert sink_destination("/out/sw.geojson", "kerbs", "FlatGeobuf") == "/out/sw.fgb"
+    assert sink_destination("memory:", "kerbs", "GeoPackage") == "memory:"
+
+
+def test_compact_features_stable_and_rounded(tmp_path):
+    from osm_sidewalkreator.generic_functions import (
+        compact_features,
+        write_layers_to_geojson,
+    )
+
+    def points_layer(coords):
+        layer = QgsVectorLayer(
+            "Point?crs=EPSG:4326&field=osm_id:integer", "p", "memory"
+        )
+        feats = []
+        for osm_id, (x, y) in coords:
+            feat = QgsFeature(layer.fields())
+            feat.setAttributes([osm_id])
+            feat.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+            feats.append(feat)
+        layer.dataProvider().addFeatures(feats)
+        return layer
+
+    coords = [(2, (-49.123456789, -25.5)), (1, (-49.2, -25.4)), (2, (-49.1, -25.3))]
+
+    compacted = list(compact_features(points_layer(coords), decimals=3))
+    assert [f["osm_id"] for f in compacted] == [1, 2, 2]
+    assert -49.123 in [round(f.geometry().asPoint().x(), 9) for f in compacted]
+
+    outputs = []
+    for i, ordering in enumerate((coords, coords[::-1])):
+        outpath = tmp_path / f"out{i}.geojson"
+        write_layers_to_geojson(
+            [points_layer(ordering)], str(outpath), precision=7, sort_features=True
+        )
+        outputs.append(outpath.read_bytes())
+
+    assert outputs[0] == outputs[1]
+
+
+def test_validate_and_repair_layer_records_validity():
+    from osm_sidewalkreator.generic_functions import (
+        dissolve_tosinglegeom,
+        geometry_validated,
+        geometry_validity_records,
+        validate_and_repair_layer,
+    )
+
+    layer = QgsVectorLayer("Polygon?crs=EPSG:31983", "polygons", "memory")
+    feats = []
+    for wkt in (
+        "POLYGON((0 0, 10 0, 10 10, 0 10, 0 0))",
+        # self-intersecting "bowtie", repaired into two triangles
+        "POLYGON((20 0, 30 10, 30 0, 20 10, 20 0))",
+        # collapsed into a line, nothing left to keep as a polygon
+        "POLYGON((40 0, 50 0, 40 0))",
+    ):
+        feat = QgsFeature()
+        feat.setGeometry(QgsGeometry.fromWkt(wkt))
+        feats.append(feat)
+    layer.dataProvider().addFeatures(feats)
+
+    validated, record = validate_and_repair_layer(layer)
+
+    assert sorted(record.values()) == ["dropped", "repaired", "valid"]
+    assert validated.featureCount() == 2
+    assert all(f.geometry().isGeosValid() for f in validated.getFeatures())
+
+    assert geometry_validated(validated)
+    assert not geometry_validated(layer)
+    assert geometry_validated(dissolve_tosinglegeom(validated))
+
+    # the record goes away with the layer:
+    layer_id = validated.id()
+    sip.delete(validated)
+    assert layer_id not in geometry_validity_records
+
+
+def test_protoblocks_around_and_patch_features():
+    from osm_sidewalkreator.generic_functions import (
+        feature_ids_in_region,
+        patch_features,
+        protoblocks_around,
+    )
+
+    # a row of four 10x10 protoblocks
+    layer = QgsVectorLayer("Polygon?crs=EPSG:31983", "protoblocks", "memory")
+    feats = []
+    for i in range(4):
+        feat = QgsFeature()
+        feat.setGeometry(
+            QgsGeometry.fromWkt(
+                f"POLYGON(({i*10} 0, {i*10+10} 0, {i*10+10} 10, {i*10} 10, {i*10} 0))"
+            )
+        )
+        feats.append(feat)
+    layer.dataProvider().addFeatures(feats)
+    ids = [f.id() for f in layer.getFeatures()]
+
+    # the street between the first two
+    street = QgsGeometry.fromPolylineXY([QgsPointXY(10, 0), QgsPointXY(10, 10)])
+
+    core_ids, halo_ids = protoblocks_around(layer, [street])
+    assert core_ids == {ids[0], ids[1]}
+    assert halo_ids == {ids[2]}
+
+    assert protoblocks_around(layer, [street], halo=2)[1] == {ids[2], ids[3]}
+
+    region = QgsGeometry.fromWkt("POLYGON((-1 -1, 21 -1, 21 11, -1 11, -1 -1))")
+    assert sorted(feature_ids_in_region(layer, region, within=True)) == ids[:2]
+
+    patch_features(layer, ids[:2], feats[3:])
+    assert layer.featureCount() == 3
+
+
+def test_clipped_lengths_by_polygon_counts_only_the_inner_parts():
+    from osm_sidewalkreator.generic_functions import (
+        already_mapped_ratios,
+        clipped_lengths_by_polygon,
+    )
+
+    protoblocks = QgsVectorLayer("Polygon?crs=EPSG:31983", "protoblocks", "memory")
+    feats = []
+    for wkt in (
+        "POLYGON((0 0, 10 0, 10 10, 0 10, 0 0))",
+        "POLYGON((10 0, 20 0, 20 10, 10 10, 10 0))",
+    ):
+        feat = QgsFeature()
+        feat.setGeometry(QgsGeometry.fromWkt(wkt))
+        feats.append(feat)
+    protoblocks.dataProvider().addFeatures(feats)
+    ids = [f.id() for f in protoblocks.getFeatures()]
+
+    sidewalks = QgsVectorLayer("LineString?crs=EPSG:31983", "sidewalks", "memory")
+    feats = []
+    # one inside the first, one crossing from it into the second
+    for wkt in ("LINESTRING(1 1, 1 9)", "LINESTRING(5 5, 15 5)"):
+        feat = QgsFeature()
+        feat.setGeometry(QgsGeometry.fromWkt(wkt))
+        feats.append(feat)
+    sidewalks.dataProvider().addFeatures(feats)
+
+    lengths = clipped_lengths_by_polygon(protoblocks, sidewalks)
+    assert lengths[ids[0]] == pytest.approx(13)
+    assert lengths[ids[1]] == pytest.approx(5)
+
+    ratios = already_mapped_ratios(protoblocks, sidewalks)
+    assert ratios[ids[1]] == pytest.approx((5 / 4) ** 2)
@@ -2,20 +2,21 @@ import json
 import os
 import sys
 import unittest
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 # Ensure the project root is on the Python path so osm_fetch can be imported
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.insert(0, project_root)
 
 try:
-    from osm_fetch import get_osm_data, join_to_a_outfolder
+    from osm_fetch import ScratchWorkspace, get_osm_data, join_to_a_outfolder
 
     GDAL_AVAILABLE = True
 except ImportError as e:  # pragma: no cover - executed when GDAL isn't installed
     print(f"Failed to import osm_fetch or GDAL: {e}. Some tests may be skipped.")
     get_osm_data = None
     join_to_a_outfolder = None
+    ScratchWorkspace = None
     GDAL_AVAILABLE = False
 
 DATA_PATH = os.path.join(os.path.dirname(__file__), "data", "curitiba_sample.osm")
@@ -83,6 +84,60 @@ class TestJoinToAOutfolder(unittest.TestCase):
             pass
 
 
+@unittest.skipIf(ScratchWorkspace is None, "osm_fetch not available")
+class TestScratchWorkspace(unittest.TestCase):
+    def test_unique_folders_removed_at_exit(self):
+        with ScratchWorkspace() as first, ScratchWorkspace() as second:
+            self.assertNotEqual(first.path, second.path)
+            filepath = first.write_file("streets_osm.geojson", "{}")
+            self.assertTrue(os.path.isfile(filepath))
+
+        self.assertFalse(os.path.exists(first.path))
+        self.assertFalse(os.path.exists(second.path))
+
+    def test_kept_on_failure(self):
+        with self.assertRaises(RuntimeError):
+            with ScratchWorkspace(keep_on_failure=True) as workspace:
+                workspace.write_file("partial.osm", "<osm/>")
+                raise RuntimeError("failed run")
+
+        self.assertTrue(os.path.isdir(workspace.path))
+        workspace.cleanup()
+        self.assertFalse(os.path.exists(workspace.path))
+
+    def test_kept_files_reported_to_feedback(self):
+        feedback = Mock()
+
+        workspace = ScratchWorkspace(keep_on_failure=True, feedback=feedback)
+
+        with self.assertRaises(RuntimeError):
+            with workspace:
+                raise RuntimeError("failed run")
+
+        feedback.reportError.assert_called_once()
+        self.assertIn(workspace.path, feedback.reportError.call_args[0][0])
+        self.assertTrue(os.path.isdir(workspace.path))
+        workspace.cleanup()
+
+    def test_get_osm_data_writes_into_workspace(self):
+        with open(DATA_PATH, "r", encoding="utf-8") as f:
+            osm_xml = f.read()
+
+        with ScratchWorkspace() as workspace:
+            with patch("osm_fetch.requests.get") as mock_get:
+                mock_get.return_value.status_code = 200
+                mock_get.return_value.text = osm_xml
+                geojson_path = get_osm_data(
+                    querystring="",
+                    tempfilesname="streets",
+                    workspace=workspace,
+                )
+
+            self.assertEqual(os.path.dirname(geojson_path), workspace.path)
+            with open(geojson_path, encoding="utf-8") as reader:
+                self.assertEqual(json.load(reader)["type"], "FeatureCollection")
+
+
 if __name__ == "__main__":  # pragma: no cover - manual execution
     unittest.main()
 
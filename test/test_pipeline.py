@@ -0,0 +1,146 @@
+import pytest
+
+pytest.importorskip("qgis")
+
+from qgis.core import QgsProcessingException
+
+from osm_sidewalkreator.pipeline import (
+    PipelineResult,
+    SidewalkPipeline,
+    results_changed_by,
+)
+
+pytestmark = pytest.mark.qgis
+
+
+def _pipeline(calls):
+    pipeline = SidewalkPipeline()
+
+    def fetch(params, feedback):
+        calls.append("fetch")
+        pipeline["roads"] = "roads"
+
+    def protoblocks(params, feedback):
+        calls.append("protoblocks")
+        pipeline["protoblocks"] = "protoblocks"
+        pipeline["streets"] = "streets"
+
+    pipeline.register("fetch", fetch)
+    pipeline.register("protoblocks", protoblocks)
+
+    return pipeline
+
+
+def test_pipeline_checks_inputs_and_invalidates_downstream():
+    calls = []
+    pipeline = _pipeline(calls)
+
+    with pytest.raises(QgsProcessingException):
+        pipeline.run("protoblocks")
+
+    pipeline.run("fetch", {"timeout_box": 60})
+    pipeline.run("protoblocks")
+
+    assert calls == ["fetch", "protoblocks"]
+    assert pipeline.completed == ["fetch", "protoblocks"]
+    assert pipeline.stage_params["fetch"] == {"timeout_box": 60}
+
+    # re-running a stage makes the downstream ones stale, keeping the upstream ones
+    pipeline.run("fetch")
+    assert pipeline.completed == ["fetch"]
+    assert "protoblocks" in pipeline
+
+
+def test_pipeline_result_attributes():
+    class Driver:
+        roads = PipelineResult("roads")
+
+        def __init__(self):
+            self.pipeline = SidewalkPipeline()
+
+    driver = Driver()
+    assert driver.roads is None
+
+    driver.roads = "roads"
+    assert driver.pipeline["roads"] == "roads"
+
+
+def test_pipeline_result_attributes_follow_the_running_pipeline():
+    class Driver:
+        roads = PipelineResult("roads")
+
+        def __init__(self):
+            self.pipeline = SidewalkPipeline()
+
+        def fetch(self, params, feedback):
+            self.roads = self.roads + " (local)"
+
+    driver = Driver()
+    driver.roads = "roads"
+
+    local = SidewalkPipeline()
+    local.results = dict(driver.pipeline.results)
+    local.register("fetch", driver.fetch)
+    local.run("fetch")
+
+    assert local["roads"] == "roads (local)"
+    assert driver.roads == "roads"
+
+
+def test_pipeline_reruns_from_the_first_changed_parameter():
+    calls = []
+    pipeline = _pipeline(calls)
+
+    pipeline.run("fetch")
+    pipeline.run("protoblocks", {"dead_end_iters_box": 0, "d_to_add_box": 1.0})
+
+    # nothing changed: just the requested stage, up to the last one done
+    assert pipeline.stages_to_run(("sidewalks",), {"dead_end_iters_box": 0}) == (
+        "sidewalks",
+    )
+    assert pipeline.stages_to_run(("protoblocks",), {"dead_end_iters_box": 0}) == (
+        "protoblocks",
+    )
+
+    # a parameter of an upstream stage changed: from it on
+    assert pipeline.first_changed_stage({"dead_end_iters_box": 2}) == "protoblocks"
+    assert pipeline.stages_to_run(("sidewalks",), {"dead_end_iters_box": 2}) == (
+        "protoblocks",
+        "sidewalks",
+    )
+
+    # parameters of stages not run yet do not count
+    assert pipeline.first_changed_stage({"d_to_add_box": 2.0}) is None
+
+
+def test_pipeline_patched_stages_leave_the_export_stale():
+    pipeline = SidewalkPipeline()
+
+    for stagename in ("fetch", "clean", "protoblocks", "sidewalks", "crossings"):
+        pipeline.record(stagename, {"d_to_add_box": 1.0})
+    pipeline.record("export")
+
+    # the split was not done, so it's not patched; the export never is
+    stagenames = pipeline.patchable_stages("sidewalks")
+    assert stagenames == ("sidewalks", "crossings")
+
+    pipeline.patched(stagenames)
+
+    assert pipeline.completed == [
+        "fetch",
+        "clean",
+        "protoblocks",
+        "sidewalks",
+        "crossings",
+    ]
+    assert pipeline.stage_params["crossings"] == {"d_to_add_box": 1.0}
+
+
+def test_results_changed_by_include_the_ones_changed_in_place():
+    changed = results_changed_by(("clean", "sidewalks"))
+
+    assert "roads" in changed
+    assert "streets" in changed
+    assert "sidewalks" in changed
+    assert "crossings" not in changed
+    assert len(changed) == len(set(changed))
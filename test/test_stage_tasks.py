@@ -0,0 +1,104 @@
+import threading
+
+import pytest
+
+pytest.importorskip("qgis")
+
+from qgis.core import QgsApplication, QgsProcessingException, QgsVectorLayer
+
+from .utilities import get_qgis_app
+from osm_sidewalkreator.pipeline import SidewalkPipeline
+from osm_sidewalkreator.stage_tasks import StageTask, hand_layers_to_main_thread
+
+pytestmark = pytest.mark.qgis
+
+
+@pytest.fixture(scope="module", autouse=True)
+def qgis_env():
+    app, _, _, _ = get_qgis_app()
+    assert app is not None
+    return app
+
+
+def _task(work):
+    calls = []
+
+    task = StageTask(
+        "test stage",
+        work,
+        lambda: calls.append("finished"),
+        lambda exception: calls.append(exception),
+    )
+
+    return task, calls
+
+
+def test_stage_task_success():
+    def work(feedback):
+        feedback.setProgress(50)
+
+    task, calls = _task(work)
+
+    result = task.run()
+    task.finished(result)
+
+    assert result
+    assert task.exception is None
+    assert task.progress() == 50
+    assert calls == ["finished"]
+
+
+def test_stage_task_failure():
+    def work(feedback):
+        raise ValueError("broken stage")
+
+    task, calls = _task(work)
+
+    result = task.run()
+    task.finished(result)
+
+    assert not result
+    assert isinstance(task.exception, ValueError)
+    assert calls == [task.exception]
+
+
+def test_stage_task_cancel():
+    def work(feedback):
+        if feedback.isCanceled():
+            raise QgsProcessingException("canceled")
+
+    task, calls = _task(work)
+
+    task.cancel()
+    result = task.run()
+    task.finished(result)
+
+    assert not result
+    assert task.exception is None
+    # a cancellation is not an error
+    assert calls == [None]
+
+
+def test_hand_layers_to_main_thread():
+    main_thread = QgsApplication.instance().thread()
+
+    pipeline = SidewalkPipeline()
+
+    class Owner:
+        pass
+
+    owner = Owner()
+
+    def worker():
+        pipeline["sidewalks"] = QgsVectorLayer("LineString", "sidewalks", "memory")
+        owner.crossings = QgsVectorLayer("LineString", "crossings", "memory")
+
+        hand_layers_to_main_thread(pipeline)
+        hand_layers_to_main_thread(owner)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+
+    assert pipeline["sidewalks"].thread() == main_thread
+    assert owner.crossings.thread() == main_thread